@@ -4,14 +4,33 @@ EXIF Agent 命令列介面
 用於批次處理，不需要 GUI
 """
 import argparse
+import itertools
 import os
 import sys
+from dataclasses import dataclass, replace
+from typing import List, Optional, Tuple
 
 # 將 src 目錄加入路徑
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.database.access_db import AccessDB
-from src.database.csv_excel_writer import CSVExcelWriter
+from src.batch import (
+    SUMMARY_FILE_NAME,
+    BatchJob,
+    BatchJobTable,
+    JobStats,
+    batch_id_for,
+    load_batch_jobs,
+    run_batch,
+    write_batch_summary,
+)
+from src.database.output_sinks import (
+    AccessSink,
+    SinkResult,
+    SQLiteSink,
+    build_output_sinks,
+    stream_outputs,
+    write_outputs,
+)
 from src.database.sqlite_db import SQLiteDB
 from src.processor import PhotoProcessor
 from src.utils.config import cfg
@@ -24,8 +43,17 @@ def main():
         description="EXIF Agent - 照片資訊管理系統 (命令列版)"
     )
 
-    parser.add_argument("-i", "--input", required=True, help="輸入資料夾路徑")
-    parser.add_argument("-o", "--output", required=True, help="輸出資料夾路徑")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("-i", "--input", help="輸入資料夾路徑")
+    source.add_argument(
+        "--batch",
+        metavar="MANIFEST_OR_GLOB",
+        help="批次處理多個資料夾：manifest (.yaml) 或資料夾 glob，如 \"D:/Season/*\"",
+    )
+    parser.add_argument(
+        "-o", "--output", required=True,
+        help="輸出資料夾路徑（批次處理時為輸出根目錄，每個資料夾各自一個子資料夾）",
+    )
     parser.add_argument(
         "-t", "--time-interval", type=int, default=30, help="時間間隔(分鐘)，預設 30"
     )
@@ -38,6 +66,65 @@ def main():
     parser.add_argument(
         "--skip-access", action="store_true", help="跳過 Access DB 儲存"
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=cfg.processing.num_workers,
+        help="平行讀取 EXIF 的 worker 數，1 為依序處理 (預設取自 config)",
+    )
+    parser.add_argument(
+        "--worker-mode",
+        choices=["thread", "process"],
+        default=cfg.processing.worker_mode,
+        help="worker 類型，thread 或 process (預設取自 config)",
+    )
+    parser.add_argument(
+        "--no-exif-cache", action="store_true", help="不使用 EXIF 快取，重新讀取所有檔案"
+    )
+    parser.add_argument(
+        "--no-ocr-cache", action="store_true", help="不使用 OCR 快取，重新辨識所有照片"
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="由上次中斷的檢查點繼續，略過已處理的檔案 (需啟用 config: checkpoint)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action=argparse.BooleanOptionalAction,
+        default=cfg.processing.incremental,
+        help="增量處理，只匯入 SQLite 中尚未記錄的新檔案 (預設取自 config)",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="PATTERN",
+        help="只處理符合 glob 樣式的檔案，可重複指定 (預設取自 config)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="PATTERN",
+        help="略過符合 glob 樣式的檔案與資料夾，可重複指定 (預設取自 config)",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=cfg.processing.scan_max_depth,
+        help="最多進入幾層子資料夾，0 只掃描輸入資料夾，-1 不限制 (預設取自 config)",
+    )
+    parser.add_argument(
+        "--batch-reset",
+        action="store_true",
+        help="批次處理時重新處理所有資料夾，忽略先前已完成的狀態",
+    )
+    parser.add_argument(
+        "--stream",
+        action=argparse.BooleanOptionalAction,
+        default=cfg.processing.stream,
+        help="串流處理，邊處理邊寫入輸出，記憶體中不保留所有記錄 (預設取自 config)",
+    )
 
     args = parser.parse_args()
 
@@ -48,7 +135,7 @@ def main():
     logger.info("=" * 50)
 
     # 驗證輸入
-    if not os.path.exists(args.input):
+    if args.input and not os.path.exists(args.input):
         logger.error(f"輸入資料夾不存在: {args.input}")
         sys.exit(1)
 
@@ -56,72 +143,313 @@ def main():
     os.makedirs(args.output, exist_ok=True)
 
     # 建立處理器
-    logger.info(f"輸入路徑: {args.input}")
+    logger.info(f"輸入路徑: {args.input or args.batch}")
     logger.info(f"輸出路徑: {args.output}")
     logger.info(f"時間間隔: {args.time_interval} 分鐘")
     logger.info(f"OCR 引擎: {args.ocr}")
+    logger.info(f"Worker: {args.workers} ({args.worker_mode})")
+
+    # Access DB、SQLite 與 EXIF/OCR 快取都存放在 db/ 目錄
+    db_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db")
+    exif_cache_path = None
+    if cfg.processing.exif_cache and not args.no_exif_cache:
+        exif_cache_path = os.path.join(db_dir, cfg.database.exif_cache_name)
+    ocr_cache_path = None
+    if cfg.processing.ocr_cache and not args.no_ocr_cache:
+        ocr_cache_path = os.path.join(db_dir, cfg.database.ocr_cache_name)
+    checkpoint_path = None
+    if cfg.processing.checkpoint:
+        checkpoint_path = os.path.join(db_dir, cfg.database.checkpoint_name)
+    elif args.resume:
+        logger.warning("檢查點未啟用 (config: checkpoint)，無法繼續上次的處理")
 
     processor = PhotoProcessor(
         time_interval=args.time_interval,
         ocr_engine=args.ocr,
         oi_max_one=cfg.processing.oi_max_one,
+        num_workers=args.workers,
+        worker_mode=args.worker_mode,
+        fast_exif=cfg.processing.fast_exif,
+        exif_cache_path=exif_cache_path,
+        exif_cache_max_entries=cfg.processing.exif_cache_max_entries,
+        ocr_options=cfg.processing.ocr_options(),
+        ocr_batch_size=cfg.processing.ocr_batch_size,
+        ocr_prewarm=cfg.processing.ocr_prewarm,
+        ocr_cache_path=ocr_cache_path,
+        ocr_cache_max_entries=cfg.processing.ocr_cache_max_entries,
+        scan_options={
+            "include": args.include or cfg.processing.scan_include,
+            "exclude": args.exclude or cfg.processing.scan_exclude,
+            "max_depth": args.max_depth if args.max_depth >= 0 else None,
+        },
+        stream_chunk_size=cfg.processing.stream_chunk_size,
+        spool_dir=db_dir,
+        checkpoint_path=checkpoint_path,
+        checkpoint_interval=cfg.processing.checkpoint_interval,
     )
 
-    # 處理照片
-    logger.info("開始處理照片...")
-    records = processor.process_directory(args.input)
+    incremental = args.incremental
+    if incremental and not cfg.database.save_sqlite:
+        logger.warning("增量處理需要啟用 SQLite (config: save_sqlite)，改為完整處理")
+        incremental = False
+    if incremental and args.stream:
+        logger.warning("串流處理不支援增量處理，改為完整處理")
+        incremental = False
 
-    if not records:
+    # Access DB、SQLite 直接寫入 db/ 目錄
+    access_db_path = None
+    if cfg.database.save_access_db and not args.skip_access:
+        access_db_path = os.path.join(db_dir, cfg.database.access_db_name)
+    outputs = DirectoryOutputs(
+        sqlite_db_path=os.path.join(db_dir, cfg.database.sqlite_db_name),
+        access_db_path=access_db_path,
+        incremental=incremental,
+        stream=args.stream,
+        resume=args.resume,
+    )
+
+    if args.batch:
+        failed = _run_batch(processor, args, outputs, db_dir, logger)
+        sys.exit(1 if failed else 0)
+
+    processed = run_directory(processor, args.input, args.output, outputs, logger)
+    if processed is None:
         logger.warning("沒有找到任何可處理的檔案")
         sys.exit(0)
 
-    logger.info(f"處理完成，共 {len(records)} 筆記錄")
+    _log_warnings(logger, processor.get_warnings())
 
-    # 儲存資料
-    writer = CSVExcelWriter()
+    logger.info("\n" + "=" * 50)
+    logger.info("處理完成!")
+    if processor.ocr_cache_stats:
+        hits, misses = processor.ocr_cache_stats
+        logger.info(f"OCR 快取: 命中 {hits} 筆，未命中 {misses} 筆 (命中率 {hits / (hits + misses):.1%})")
+    logger.info("=" * 50)
 
-    # CSV
-    csv_path = os.path.join(args.output, cfg.database.csv_file_name)
-    logger.info(f"儲存到 CSV: {csv_path}")
-    writer.write_to_csv(records, csv_path)
 
-    # Excel
-    excel_path = os.path.join(args.output, cfg.database.excel_file_name)
-    logger.info(f"儲存到 Excel: {excel_path}")
-    writer.write_to_excel(records, excel_path)
+@dataclass
+class DirectoryOutputs:
+    """每個資料夾共用的輸出設定"""
 
-    # Access DB (直接寫入 db/ 目錄)
-    db_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "db")
-    if cfg.database.save_access_db and not args.skip_access:
-        access_db_path = os.path.join(db_dir, cfg.database.access_db_name)
-        logger.info(f"儲存到 Access DB: {access_db_path}")
+    sqlite_db_path: str
+    access_db_path: Optional[str]
+    incremental: bool
+    stream: bool
+    resume: bool = False
+    # 增量處理時 CSV/Excel 匯出 SQLite 中的全部記錄；
+    # False 則只匯出本次新記錄所屬相機的記錄（批次處理時每個資料夾各自輸出）
+    export_all: bool = True
+
+    @property
+    def output_sqlite_path(self) -> Optional[str]:
+        """處理完後寫入的 SQLite（增量處理時已在處理中寫入）"""
+        if cfg.database.save_sqlite and not self.incremental:
+            return self.sqlite_db_path
+        return None
+
+
+def run_directory(
+    processor: PhotoProcessor, input_dir: str, output_dir: str,
+    outputs: DirectoryOutputs, logger
+) -> Optional[Tuple[int, List[SinkResult]]]:
+    """
+    處理單一資料夾並寫入所有輸出
+
+    Args:
+        processor: 處理器（批次處理時共用）
+        input_dir: 輸入資料夾
+        output_dir: CSV、Excel 輸出資料夾
+        outputs: 輸出設定
+        logger: logger
+
+    Returns:
+        (本次處理的記錄數, 各輸出的寫入結果)，沒有任何記錄時返回 None
+    """
+    processed = _process_directory(processor, input_dir, output_dir, outputs, logger)
+    if not processor.cancelled and (
+        processed is None or all(result.ok for result in processed[1])
+    ):
+        # 輸出都已寫入，不再需要檢查點；有輸出失敗時保留，--resume 可直接重新輸出
+        processor.clear_checkpoint(input_dir)
+    return processed
 
-        try:
-            with AccessDB(access_db_path) as db:
-                db.insert_records_batch(records)
-            logger.info("Access DB 儲存完成")
-        except Exception as e:
-            logger.error(f"Access DB 儲存失敗: {str(e)}")
-            logger.warning("請確認已安裝 Microsoft Access Database Engine")
-    elif not cfg.database.save_access_db:
-        logger.info("Access DB 儲存已停用 (config: save_access_db = false)")
 
-    # SQLite (儲存到 db/ 目錄)
-    if cfg.database.save_sqlite:
-        sqlite_db_path = os.path.join(db_dir, cfg.database.sqlite_db_name)
-        logger.info(f"儲存到 SQLite: {sqlite_db_path}")
+def _process_directory(
+    processor: PhotoProcessor, input_dir: str, output_dir: str,
+    outputs: DirectoryOutputs, logger
+) -> Optional[Tuple[int, List[SinkResult]]]:
+    """run_directory 的實作"""
+    os.makedirs(output_dir, exist_ok=True)
 
-        try:
-            with SQLiteDB(sqlite_db_path) as db:
+    # CSV、Excel 輸出到 output
+    csv_path = os.path.join(output_dir, cfg.database.csv_file_name)
+    excel_path = os.path.join(output_dir, cfg.database.excel_file_name)
+    access_db_path = outputs.access_db_path
+    output_sqlite_path = outputs.output_sqlite_path
+    sqlite_db_path = outputs.sqlite_db_path
+
+    if outputs.stream:
+        # 串流處理：記錄逐筆送進各輸出，不等全部處理完
+        logger.info("串流處理模式，邊處理邊寫入輸出")
+        records = processor.iter_process(input_dir, resume=outputs.resume)
+        # 第一筆記錄產生時檔案已全部處理完，此時才知道是否被停止
+        first = next(records, None)
+        if first is None:
+            return None
+        if processor.cancelled:
+            access_db_path = output_sqlite_path = None
+            _log_cancelled(logger)
+        _log_output_paths(logger, csv_path, excel_path, access_db_path,
+                          output_sqlite_path, outputs.incremental)
+        results = stream_outputs(
+            itertools.chain([first], records),
+            csv_path,
+            excel_path,
+            access_db_path=access_db_path,
+            access_options=cfg.database.access_options(),
+            sqlite_db_path=output_sqlite_path,
+            sqlite_chunk_size=cfg.database.sqlite_chunk_size,
+        )
+        record_count = results[0].rows
+        if not record_count:
+            return None
+        logger.info(f"處理完成，共 {record_count} 筆記錄")
+        _log_sink_results(logger, results)
+
+        sqlite_ok = output_sqlite_path and all(
+            result.ok for result in results if result.name == SQLiteSink.name
+        )
+        if sqlite_ok:
+            # 產生器走訪完後才知道實際處理的檔案
+            with SQLiteDB(
+                sqlite_db_path, chunk_size=cfg.database.sqlite_chunk_size
+            ) as db:
+                db.mark_files_processed(processor.processed_files)
+        return record_count, results
+
+    # 處理照片
+    logger.info("開始處理照片...")
+    if outputs.incremental:
+        # 增量處理：新記錄直接寫入 SQLite，並更新受影響相機的既有記錄
+        logger.info(f"增量處理模式，SQLite: {sqlite_db_path}")
+        with SQLiteDB(
+            sqlite_db_path, chunk_size=cfg.database.sqlite_chunk_size
+        ) as db:
+            records, updated_records = processor.process_directory_incremental(
+                input_dir, db, resume=outputs.resume
+            )
+            if records:
                 db.insert_records_batch(records)
-            logger.info("SQLite 儲存完成")
-        except Exception as e:
-            logger.error(f"SQLite 儲存失敗: {str(e)}")
+                db.update_derived_fields(updated_records)
+            db.mark_files_processed(processor.processed_files)
+            # CSV/Excel 匯出 SQLite 中的完整資料（或本次相機的資料）
+            if not records:
+                export_records = []
+            elif outputs.export_all:
+                export_records = db.get_all_records()
+            else:
+                export_records = db.get_records_by_cameras(
+                    {record.Camera_ID for record in records}
+                )
     else:
-        logger.info("SQLite 儲存已停用 (config: save_sqlite = false)")
+        records = processor.process_directory(input_dir, resume=outputs.resume)
+        export_records = records
+        updated_records = []
+        if records and processor.cancelled:
+            access_db_path = output_sqlite_path = None
+            _log_cancelled(logger)
+
+    if not records:
+        return None
+
+    logger.info(f"處理完成，共 {len(records)} 筆記錄")
+    _log_output_paths(logger, csv_path, excel_path, access_db_path,
+                      output_sqlite_path, outputs.incremental)
+
+    # 各輸出同時寫入，某個輸出失敗不影響其他輸出
+    sinks = build_output_sinks(
+        records,
+        export_records,
+        csv_path,
+        excel_path,
+        access_db_path=access_db_path,
+        access_options=cfg.database.access_options(),
+        sqlite_db_path=output_sqlite_path,
+        sqlite_chunk_size=cfg.database.sqlite_chunk_size,
+        processed_files=processor.processed_files,
+        updated_records=updated_records,
+    )
+    results = write_outputs(sinks)
+    _log_sink_results(logger, results)
+    return len(records), results
+
+
+def _run_batch(processor: PhotoProcessor, args, outputs: DirectoryOutputs,
+               db_dir: str, logger) -> int:
+    """
+    批次處理 manifest 或 glob 中的所有資料夾
+
+    所有資料夾共用同一個處理器（OCR 引擎只載入一次）與 worker pool，
+    狀態記錄在 db/ 的工作表，中斷後重新執行會略過已完成的資料夾
+
+    Returns:
+        失敗的資料夾數
+    """
+    jobs = load_batch_jobs(args.batch, args.output)
+    if not jobs:
+        logger.warning(f"批次中沒有任何資料夾: {args.batch}")
+        return 0
+    logger.info(f"批次處理 {len(jobs)} 個資料夾")
+
+    # 每個資料夾的 CSV/Excel 只輸出自己的記錄
+    job_outputs = replace(outputs, export_all=False)
+
+    def run_job(job: BatchJob) -> JobStats:
+        if not os.path.isdir(job.input):
+            raise FileNotFoundError(f"輸入資料夾不存在: {job.input}")
+        processed = run_directory(
+            processor, job.input, job.output, job_outputs, logger
+        )
+        stats = JobStats(
+            files=len(processor.processed_files),
+            warnings=len(processor.get_warnings()),
+            ocr_files=processor.ocr_file_count,
+        )
+        if processed is None:
+            logger.warning(f"沒有找到任何可處理的檔案: {job.input}")
+            return stats
+        stats.records, results = processed
+        errors = [f"{result.name}: {result.error}" for result in results if not result.ok]
+        if errors:
+            stats.error = "; ".join(errors)
+        _log_warnings(logger, processor.get_warnings())
+        return stats
 
-    # 顯示警告訊息
-    warnings = processor.get_warnings()
+    batch_id = batch_id_for(args.batch)
+    table_path = os.path.join(db_dir, cfg.database.batch_db_name)
+    with BatchJobTable(table_path) as table, processor.shared_workers():
+        if args.batch_reset:
+            table.reset(batch_id)
+        rows = run_batch(jobs, table, batch_id, run_job)
+
+    summary_path = os.path.join(args.output, SUMMARY_FILE_NAME)
+    write_batch_summary(rows, summary_path)
+
+    failed = [row for row in rows if row["status"] != "done"]
+    logger.info("\n" + "=" * 50)
+    logger.info(
+        f"批次處理完成: {len(rows) - len(failed)}/{len(rows)} 個資料夾成功，"
+        f"共 {sum(row['records'] or 0 for row in rows)} 筆記錄"
+    )
+    for row in failed:
+        logger.error(f"失敗: {row['input']}: {row['error']}")
+    logger.info(f"摘要: {summary_path}")
+    logger.info("=" * 50)
+    return len(failed)
+
+
+def _log_warnings(logger, warnings: List[str]):
+    """顯示警告訊息"""
     if warnings:
         logger.info("\n" + "=" * 50)
         logger.info("警告訊息:")
@@ -129,9 +457,43 @@ def main():
         for warning in warnings:
             logger.warning(warning)
 
-    logger.info("\n" + "=" * 50)
-    logger.info("處理完成!")
-    logger.info("=" * 50)
+
+def _log_cancelled(logger):
+    """停止時只寫入 CSV/Excel，資料庫留到 --resume 完成後一次寫入"""
+    logger.warning(
+        "處理已停止，只寫入 CSV/Excel；--resume 處理完其餘檔案後才寫入資料庫"
+    )
+
+
+def _log_output_paths(logger, csv_path, excel_path, access_db_path,
+                      output_sqlite_path, incremental):
+    """顯示各輸出的路徑"""
+    logger.info(f"儲存到 CSV: {csv_path}")
+    logger.info(f"儲存到 Excel: {excel_path}")
+    if access_db_path:
+        logger.info(f"儲存到 Access DB: {access_db_path}")
+    elif not cfg.database.save_access_db:
+        logger.info("Access DB 儲存已停用 (config: save_access_db = false)")
+
+    if incremental:
+        logger.info("SQLite 已於增量處理時更新")
+    elif output_sqlite_path:
+        logger.info(f"儲存到 SQLite: {output_sqlite_path}")
+    elif not cfg.database.save_sqlite:
+        logger.info("SQLite 儲存已停用 (config: save_sqlite = false)")
+
+
+def _log_sink_results(logger, results):
+    """顯示各輸出的寫入結果"""
+    for result in results:
+        if result.ok:
+            logger.info(f"{result.name} 儲存完成 ({result.seconds:.1f} 秒)")
+            if result.failed_rows:
+                logger.warning(f"{result.name} 有 {result.failed_rows} 筆記錄寫入失敗")
+        else:
+            logger.error(f"{result.name} 儲存失敗: {result.error}")
+            if result.name == AccessSink.name:
+                logger.warning("請確認已安裝 Microsoft Access Database Engine")
 
 
 if __name__ == "__main__":
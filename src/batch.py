@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+多資料夾批次處理模組
+
+依 manifest (YAML) 或資料夾 glob 建立工作，以同一個 PhotoProcessor 依序處理，
+每個資料夾的狀態記錄在本機 SQLite 工作表中，中斷後重新執行會略過已完成的資料夾，
+最後輸出整批的摘要 CSV。
+
+manifest 格式:
+    output: D:/Results          # 可省略，預設使用命令列的輸出資料夾
+    jobs:
+      - D:/Season/JC38          # 只有輸入資料夾
+      - D:/Season/JC4*          # glob，符合的每個資料夾各為一個工作
+      - input: D:/Season/JC50
+        output: D:/Results/JC50_recheck
+"""
+import csv
+import glob
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set
+
+from ruamel.yaml import YAML
+
+from src.utils.logger import getUniqueLogger
+
+logger = getUniqueLogger()
+
+SUMMARY_FILE_NAME = "batch_summary.csv"
+
+# 工作狀態
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class BatchJob:
+    """單一資料夾的批次工作"""
+
+    input: str
+    output: str
+
+
+@dataclass
+class JobStats:
+    """單一工作的處理結果"""
+
+    files: int = 0
+    records: int = 0
+    warnings: int = 0
+    # 缺少日期、排入 OCR 的檔案數
+    ocr_files: int = 0
+    # 部分輸出失敗時的訊息，工作會標記為失敗
+    error: Optional[str] = None
+
+
+def load_batch_jobs(spec: str, output_root: str) -> List[BatchJob]:
+    """
+    由 manifest 或 glob 建立批次工作
+
+    Args:
+        spec: manifest 檔案路徑 (.yaml/.yml)，或資料夾的 glob 樣式
+        output_root: 預設輸出根目錄，每個工作輸出到其下與輸入資料夾同名的子資料夾
+
+    Returns:
+        工作列表（依 manifest 順序，glob 依名稱排序，重複的資料夾只保留一次）
+    """
+    base_dir = os.getcwd()
+    if os.path.isfile(spec) and spec.lower().endswith((".yaml", ".yml")):
+        yaml = YAML(typ="safe")
+        with open(spec, "r", encoding="utf-8") as f:
+            data = yaml.load(f) or {}
+        if isinstance(data, list):
+            data = {"jobs": data}
+        entries = data.get("jobs") or []
+        output_root = data.get("output") or output_root
+        # manifest 中的相對路徑以 manifest 所在資料夾為準
+        base_dir = os.path.dirname(os.path.abspath(spec))
+    else:
+        entries = [spec]
+
+    jobs = []
+    seen_inputs: Set[str] = set()
+    used_outputs: Set[str] = set()
+    for entry in entries:
+        if isinstance(entry, dict):
+            pattern = entry.get("input")
+            output = entry.get("output")
+        else:
+            pattern, output = entry, None
+        if not pattern:
+            logger.warning(f"Batch entry without input: {entry}")
+            continue
+
+        pattern = os.path.join(base_dir, os.path.expanduser(str(pattern)))
+        if glob.has_magic(pattern):
+            inputs = sorted(path for path in glob.glob(pattern) if os.path.isdir(path))
+            if not inputs:
+                logger.warning(f"No directories match batch pattern: {pattern}")
+        else:
+            inputs = [pattern]
+
+        for input_dir in inputs:
+            input_dir = os.path.normpath(os.path.abspath(input_dir))
+            if input_dir in seen_inputs:
+                continue
+            seen_inputs.add(input_dir)
+
+            if output and len(inputs) == 1:
+                job_output = os.path.join(base_dir, os.path.expanduser(str(output)))
+            else:
+                job_output = _unique_output(
+                    os.path.join(output_root, os.path.basename(input_dir)), used_outputs
+                )
+            job_output = os.path.normpath(os.path.abspath(job_output))
+            used_outputs.add(job_output)
+            jobs.append(BatchJob(input_dir, job_output))
+
+    return jobs
+
+
+def _unique_output(path: str, used: Set[str]) -> str:
+    """不同來源的同名資料夾加上 _2、_3 以免輸出互相覆蓋"""
+    candidate = path
+    suffix = 2
+    while os.path.normpath(os.path.abspath(candidate)) in used:
+        candidate = f"{path}_{suffix}"
+        suffix += 1
+    return candidate
+
+
+def batch_id_for(spec: str) -> str:
+    """批次識別字串：manifest 或 glob 樣式的絕對路徑"""
+    return os.path.normpath(os.path.abspath(spec))
+
+
+class BatchJobTable:
+    """批次工作狀態表 (SQLite)"""
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: 工作表 SQLite 檔案路徑
+        """
+        self.db_path = db_path
+        self.connection = None
+        self.logger = logger
+
+    def connect(self):
+        """連接工作表資料庫"""
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(self.db_path)
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS batch_job (
+                    batch_id TEXT,
+                    input TEXT,
+                    output TEXT,
+                    position INTEGER,
+                    status TEXT,
+                    files INTEGER,
+                    records INTEGER,
+                    warnings INTEGER,
+                    ocr_files INTEGER,
+                    seconds REAL,
+                    error TEXT,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    PRIMARY KEY (batch_id, input)
+                )
+                """
+            )
+            # 舊版建立的工作表沒有 ocr_files 欄位
+            columns = {row[1] for row in self.connection.execute("PRAGMA table_info(batch_job)")}
+            if "ocr_files" not in columns:
+                self.connection.execute("ALTER TABLE batch_job ADD COLUMN ocr_files INTEGER")
+            self.connection.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to open batch job table: {str(e)}")
+            raise
+
+    def register(self, batch_id: str, jobs: List[BatchJob]):
+        """加入工作（已存在的工作保留狀態，只更新輸出路徑與順序）"""
+        self.connection.executemany(
+            "INSERT INTO batch_job (batch_id, input, output, position, status) "
+            "VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (batch_id, input) DO UPDATE SET "
+            "output = excluded.output, position = excluded.position",
+            (
+                (batch_id, job.input, job.output, position, PENDING)
+                for position, job in enumerate(jobs)
+            ),
+        )
+        self.connection.commit()
+
+    def completed_inputs(self, batch_id: str) -> Set[str]:
+        """已完成的輸入資料夾"""
+        cursor = self.connection.execute(
+            "SELECT input FROM batch_job WHERE batch_id = ? AND status = ?",
+            (batch_id, DONE),
+        )
+        return {row[0] for row in cursor}
+
+    def reset(self, batch_id: str):
+        """將整批工作重設為待處理"""
+        self.connection.execute(
+            "UPDATE batch_job SET status = ?, error = NULL WHERE batch_id = ?",
+            (PENDING, batch_id),
+        )
+        self.connection.commit()
+
+    def start(self, batch_id: str, job: BatchJob):
+        """標記工作開始"""
+        self.connection.execute(
+            "UPDATE batch_job SET status = ?, error = NULL, started_at = ?, "
+            "finished_at = NULL WHERE batch_id = ? AND input = ?",
+            (RUNNING, _now(), batch_id, job.input),
+        )
+        self.connection.commit()
+
+    def finish(self, batch_id: str, job: BatchJob, stats: JobStats, seconds: float):
+        """記錄工作結果，有錯誤訊息時標記為失敗"""
+        self.connection.execute(
+            "UPDATE batch_job SET status = ?, files = ?, records = ?, warnings = ?, "
+            "ocr_files = ?, seconds = ?, error = ?, finished_at = ? WHERE batch_id = ? AND input = ?",
+            (
+                FAILED if stats.error else DONE,
+                stats.files,
+                stats.records,
+                stats.warnings,
+                stats.ocr_files,
+                round(seconds, 3),
+                stats.error,
+                _now(),
+                batch_id,
+                job.input,
+            ),
+        )
+        self.connection.commit()
+
+    def jobs(self, batch_id: str, inputs: Optional[List[str]] = None) -> List[Dict]:
+        """
+        取得工作狀態
+
+        Args:
+            batch_id: 批次識別字串
+            inputs: 只取這些輸入資料夾，None 表示全部
+
+        Returns:
+            依 manifest 順序排列的工作字典
+        """
+        cursor = self.connection.execute(
+            "SELECT * FROM batch_job WHERE batch_id = ? ORDER BY position", (batch_id,)
+        )
+        columns = [desc[0] for desc in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor]
+        if inputs is not None:
+            wanted = set(inputs)
+            rows = [row for row in rows if row["input"] in wanted]
+        return rows
+
+    def close(self):
+        """關閉資料庫連接"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        """支援 with 語句"""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """支援 with 語句"""
+        self.close()
+
+
+def run_batch(jobs: List[BatchJob], table: BatchJobTable, batch_id: str,
+              run_job: Callable[[BatchJob], JobStats]) -> List[Dict]:
+    """
+    依序執行批次工作，略過先前已完成的資料夾
+
+    某個工作拋出例外時標記為失敗並繼續下一個；程式中斷時工作維持 running，
+    下次執行會重新處理。
+
+    Args:
+        jobs: 工作列表
+        table: 已連接的工作表
+        batch_id: 批次識別字串
+        run_job: 處理單一工作的函式
+
+    Returns:
+        本批所有工作的狀態（見 BatchJobTable.jobs）
+    """
+    table.register(batch_id, jobs)
+    completed = table.completed_inputs(batch_id)
+    total = len(jobs)
+    if completed:
+        logger.info(f"Resuming batch: {len(completed)}/{total} jobs already done")
+
+    for i, job in enumerate(jobs, 1):
+        if job.input in completed:
+            logger.info(f"Batch job {i}/{total} already done, skipping: {job.input}")
+            continue
+
+        logger.info(f"Batch job {i}/{total}: {job.input} -> {job.output}")
+        table.start(batch_id, job)
+        start = time.perf_counter()
+        try:
+            stats = run_job(job)
+        except Exception as e:
+            logger.error(f"Batch job failed: {job.input}: {str(e)}")
+            stats = JobStats(error=str(e) or type(e).__name__)
+        table.finish(batch_id, job, stats, time.perf_counter() - start)
+
+    rows = table.jobs(batch_id, [job.input for job in jobs])
+    done = [row for row in rows if row["status"] == DONE]
+    no_ocr = sum(1 for row in done if not row["ocr_files"])
+    logger.info(f"{no_ocr} of {len(done)} folders needed no OCR")
+    return rows
+
+
+SUMMARY_FIELDS = (
+    "input",
+    "output",
+    "status",
+    "files",
+    "records",
+    "warnings",
+    "ocr_files",
+    "seconds",
+    "error",
+    "started_at",
+    "finished_at",
+)
+
+
+def write_batch_summary(rows: List[Dict], summary_path: str):
+    """
+    輸出整批的摘要 CSV
+
+    Args:
+        rows: run_batch 返回的工作狀態
+        summary_path: CSV 檔案路徑
+    """
+    directory = os.path.dirname(summary_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(summary_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(SUMMARY_FIELDS)
+        for row in rows:
+            writer.writerow([row.get(field) for field in SUMMARY_FIELDS])
+    logger.info(f"Wrote batch summary: {summary_path}")
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
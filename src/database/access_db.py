@@ -2,12 +2,15 @@
 """
 Access DB 資料庫操作模組
 """
+import itertools
 import os
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Iterable, List, Optional, Tuple
 
 import pyodbc
 
+from src.database.schema import CREATE_DATE_INDEX, PhotoRecord, RecordLike, record_to_row
 from src.utils.logger import getUniqueLogger
 
 logger = getUniqueLogger()
@@ -16,32 +19,66 @@ logger = getUniqueLogger()
 class AccessDB:
     """Access 資料庫管理類別"""
 
-    def __init__(self, db_path: str):
+    INSERT_SQL = """
+    INSERT INTO file_record
+    (SourceFile, DateTimeOriginal, [Date], [Time], Site, Plot_ID, Camera_ID,
+     [Group], Species, [Number], Note, IndependentPhoto, CreateDate,
+     period_start, period_end)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    # Access 的記錄與 SQLite 的 ID 無關，以照片、相機、物種與時間對應
+    UPDATE_SQL = """
+    UPDATE file_record SET IndependentPhoto = ?, period_start = ?, period_end = ?
+    WHERE SourceFile = ? AND Camera_ID {camera} AND Species {species}
+    AND DateTimeOriginal = ?
+    """
+
+    # 批次寫入時每個交易的筆數
+    DEFAULT_CHUNK_SIZE = 1000
+    # 驅動程式不支援參數陣列時 executemany 返回的 SQLSTATE
+    FAST_EXECUTEMANY_REJECTED_STATES = ("HY090", "HYC00")
+
+    def __init__(self, db_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 fast_executemany: bool = True, conn_str: Optional[str] = None,
+                 connection=None):
         """
         初始化 Access DB
 
         Args:
             db_path: Access DB 檔案路徑
+            chunk_size: 批次寫入時每個交易的筆數
+            fast_executemany: 是否使用 pyodbc 的參數陣列 (fast_executemany) 批次寫入
+            conn_str: 自訂 ODBC 連接字串（如在 Linux 上改用其他 ODBC 資料來源），
+                None 則使用 Microsoft Access Driver
+            connection: 已建立、與 pyodbc 相容的連接物件，提供時不再自行連接
+                （不會建立資料庫檔案，關閉時也會一併關閉）
         """
         self.db_path = db_path
-        self.connection = None
+        self.chunk_size = max(1, chunk_size)
+        self.fast_executemany = fast_executemany
+        self.conn_str = conn_str
+        self.connection = connection
         self.cursor = None
         self.logger = logger
 
     def connect(self):
         """連接到 Access 資料庫"""
         try:
-            # 如果資料庫不存在，建立新的
-            if not os.path.exists(self.db_path):
-                self._create_new_database()
-
-            # 建立連接字串
-            conn_str = (
-                r"Driver={Microsoft Access Driver (*.mdb, *.accdb)};"
-                f"DBQ={self.db_path};"
-            )
+            if self.connection is None:
+                conn_str = self.conn_str
+                if conn_str is None:
+                    # 如果資料庫不存在，建立新的
+                    if not os.path.exists(self.db_path):
+                        self._create_new_database()
+
+                    # 建立連接字串
+                    conn_str = (
+                        r"Driver={Microsoft Access Driver (*.mdb, *.accdb)};"
+                        f"DBQ={self.db_path};"
+                    )
 
-            self.connection = pyodbc.connect(conn_str)
+                self.connection = pyodbc.connect(conn_str)
             self.cursor = self.connection.cursor()
             self.logger.info(f"Connected to Access DB: {self.db_path}")
 
@@ -105,60 +142,177 @@ class AccessDB:
         except pyodbc.Error as e:
             self.logger.error(f"Failed to create file_record table: {str(e)}")
 
-    def insert_record(self, record: Dict):
+    def insert_record(self, record: RecordLike):
         """
         插入一筆記錄
 
         Args:
-            record: 記錄字典
+            record: PhotoRecord 或記錄字典
         """
         try:
-            # 準備插入語句
-            sql = """
-            INSERT INTO file_record
-            (SourceFile, DateTimeOriginal, [Date], [Time], Site, Plot_ID, Camera_ID,
-             [Group], Species, [Number], Note, IndependentPhoto, CreateDate,
-             period_start, period_end)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-
-            # 準備資料
-            values = (
-                record.get("SourceFile"),
-                record.get("DateTimeOriginal"),
-                record.get("Date"),
-                record.get("Time"),
-                record.get("Site"),
-                record.get("Plot_ID"),
-                record.get("Camera_ID"),
-                record.get("Group"),
-                record.get("Species"),
-                record.get("Number", 1),
-                record.get("Note", ""),
-                record.get("IndependentPhoto", 0),
-                datetime.now(),  # CreateDate
-                record.get("period_start"),
-                record.get("period_end"),
-            )
+            values = self._to_db_row(record_to_row(record), datetime.now())
 
-            self.cursor.execute(sql, values)
+            self.cursor.execute(self.INSERT_SQL, values)
             self.connection.commit()
 
         except pyodbc.Error as e:
             self.logger.error(f"Failed to insert record: {str(e)}")
             raise
 
-    def insert_records_batch(self, records: List[Dict]):
+    def insert_records_batch(self, records: Iterable[RecordLike],
+                             chunk_size: Optional[int] = None) -> List[RecordLike]:
         """
         批次插入多筆記錄
 
+        每 chunk_size 筆以參數陣列 (fast_executemany) 寫入並 commit 一次；
+        某一段失敗時只 rollback 該段並逐筆重試，壞掉的記錄不會拖累整批
+
         Args:
             records: 記錄列表
+            chunk_size: 每個交易的筆數，None 則使用 self.chunk_size
+
+        Returns:
+            無法寫入的記錄列表
+        """
+        create_date = datetime.now()
+        return self._insert_batch(
+            records,
+            lambda record: self._to_db_row(record_to_row(record), create_date),
+            chunk_size,
+        )
+
+    def insert_rows(self, rows: Iterable[Tuple],
+                    chunk_size: Optional[int] = None) -> List[Tuple]:
+        """
+        批次插入依 RECORD_FIELDS 順序排列的列（見 insert_records_batch）
+
+        Args:
+            rows: schema.record_to_row 格式的列
+            chunk_size: 每個交易的筆數，None 則使用 self.chunk_size
+
+        Returns:
+            無法寫入的列
+        """
+        create_date = datetime.now()
+        return self._insert_batch(
+            rows, lambda row: self._to_db_row(row, create_date), chunk_size
+        )
+
+    def _insert_batch(self, items: Iterable, to_db_row: Callable,
+                      chunk_size: Optional[int]) -> List:
+        """分段寫入，返回無法寫入的項目"""
+        chunk_size = max(1, chunk_size or self.chunk_size)
+        self._set_fast_executemany(self.fast_executemany)
+
+        start = time.perf_counter()
+        inserted = 0
+        failed = []
+        iterator = iter(items)
+        while True:
+            chunk = list(itertools.islice(iterator, chunk_size))
+            if not chunk:
+                break
+            rows = [to_db_row(item) for item in chunk]
+            failed_indices = self._insert_chunk(rows)
+            inserted += len(rows) - len(failed_indices)
+            failed.extend(chunk[i] for i in failed_indices)
+
+        elapsed = time.perf_counter() - start
+        rate = f" ({inserted / elapsed:.0f} rows/s)" if elapsed > 0 and inserted else ""
+        self.logger.info(f"Inserted {inserted} records{rate}")
+        if failed:
+            self.logger.error(f"Failed to insert {len(failed)} records")
+
+        return failed
+
+    def _insert_chunk(self, rows: List[Tuple]) -> List[int]:
         """
+        在一個交易中寫入一段記錄，失敗時 rollback 並逐筆重試
+
+        驅動程式拒絕參數陣列時停用 fast_executemany，以一般 executemany 重新寫入
+
+        Returns:
+            逐筆重試仍失敗的列索引
+        """
+        try:
+            self.cursor.executemany(self.INSERT_SQL, rows)
+            self.connection.commit()
+            return []
+        except pyodbc.Error as e:
+            self.connection.rollback()
+            sqlstate = e.args[0] if e.args else None
+            if (self._fast_executemany_enabled()
+                    and sqlstate in self.FAST_EXECUTEMANY_REJECTED_STATES):
+                self.logger.warning(
+                    f"ODBC driver rejected fast_executemany ({sqlstate}), disabling it"
+                )
+                self._set_fast_executemany(False)
+                return self._insert_chunk(rows)
+            self.logger.warning(
+                f"Batch insert of {len(rows)} rows failed, retrying row by row: {str(e)}"
+            )
+
+        failed_indices = []
+        for i, row in enumerate(rows):
+            try:
+                self.cursor.execute(self.INSERT_SQL, row)
+            except pyodbc.Error as e:
+                failed_indices.append(i)
+                self.logger.error(f"Failed to insert record {row[0]}: {str(e)}")
+        self.connection.commit()
+        return failed_indices
+
+    def update_derived_fields(self, records: List[PhotoRecord]):
+        """
+        更新既有記錄的 IndependentPhoto 與 period_start/period_end（增量處理用）
+
+        Args:
+            records: 衍生欄位有變動的既有記錄
+        """
+        if not records:
+            return
+
+        # NULL 須以 IS NULL 比對，依 Camera_ID、Species 是否為空分組
+        groups = {}
         for record in records:
-            self.insert_record(record)
+            key = (record.Camera_ID is None, record.Species is None)
+            groups.setdefault(key, []).append(record)
+        try:
+            for (no_camera, no_species), group in groups.items():
+                sql = self.UPDATE_SQL.format(
+                    camera="IS NULL" if no_camera else "= ?",
+                    species="IS NULL" if no_species else "= ?",
+                )
+                self.cursor.executemany(sql, [
+                    (record.IndependentPhoto, record.period_start, record.period_end,
+                     record.SourceFile)
+                    + (() if no_camera else (record.Camera_ID,))
+                    + (() if no_species else (record.Species,))
+                    + (record.DateTimeOriginal,)
+                    for record in group
+                ])
+            self.connection.commit()
+            self.logger.info(f"Updated {len(records)} existing records")
+        except pyodbc.Error as e:
+            self.connection.rollback()
+            self.logger.error(f"Failed to update records: {str(e)}")
+            raise
+
+    def _fast_executemany_enabled(self) -> bool:
+        """目前 cursor 是否啟用 fast_executemany"""
+        return bool(getattr(self.cursor, "fast_executemany", False))
+
+    def _set_fast_executemany(self, enabled: bool):
+        """設定 cursor 的 fast_executemany（不支援的連接物件則略過）"""
+        try:
+            self.cursor.fast_executemany = enabled
+        except AttributeError:
+            pass
 
-        self.logger.info(f"Inserted {len(records)} records")
+    @staticmethod
+    def _to_db_row(row: Tuple, create_date: datetime) -> Tuple:
+        """將 RECORD_FIELDS 順序的列轉為 INSERT_SQL 的參數（插入 CreateDate）"""
+        return row[:CREATE_DATE_INDEX] + (create_date,) + row[CREATE_DATE_INDEX:]
 
     def clear_table(self, table_name: str = "file_record"):
         """
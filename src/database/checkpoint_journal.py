@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+處理檢查點模組
+
+長時間處理時，每處理一批檔案就將這些檔案與其記錄（日期時間皆已決定）寫入本機
+SQLite journal。程式中斷後以 resume 重新處理同一資料夾時，讀回 journal 的記錄並略過
+已完成的檔案，時間範圍、有效照片等跨檔案的計算仍在全部檔案處理完後進行，
+結果與未中斷時相同。
+"""
+import json
+import os
+import sqlite3
+from datetime import datetime
+from typing import List, Tuple
+
+from src.database.schema import PhotoRecord
+from src.utils.logger import getUniqueLogger
+
+logger = getUniqueLogger()
+
+# 一個檔案的處理結果: (絕對路徑, 記錄, 處理時產生的警告)
+FileResult = Tuple[str, List[PhotoRecord], List[str]]
+
+
+class CheckpointJournal:
+    """以資料夾為單位的處理檢查點"""
+
+    # 資料表格式版本，不同時捨棄舊的檢查點
+    SCHEMA_VERSION = 2
+
+    # 保存的欄位（IndependentPhoto、period_start/period_end 於處理完後才計算）
+    FIELDS = (
+        "SourceFile",
+        "DateTimeOriginal",
+        "Site",
+        "Plot_ID",
+        "Camera_ID",
+        "Group",
+        "Species",
+        "Number",
+        "Note",
+    )
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: journal SQLite 檔案路徑
+        """
+        self.db_path = db_path
+        self.connection = None
+        self.directory = None
+        # 本資料夾目前已保存的檔案、記錄數
+        self.file_count = 0
+        self.record_count = 0
+        self.logger = logger
+
+    def connect(self):
+        """連接 journal 資料庫"""
+        try:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(self.db_path)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("PRAGMA synchronous=NORMAL")
+            self._create_tables()
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to open checkpoint journal: {str(e)}")
+            raise
+
+    def _create_tables(self):
+        """建立 journal 資料表"""
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            # 舊格式的檢查點無法讀回，直接捨棄
+            self.connection.executescript(
+                """
+                DROP TABLE IF EXISTS checkpoint_run;
+                DROP TABLE IF EXISTS checkpoint_file;
+                DROP TABLE IF EXISTS checkpoint_record;
+                DROP TABLE IF EXISTS checkpoint_warning;
+                """
+            )
+            self.connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+        columns = ", ".join(f'"{field}"' for field in self.FIELDS)
+        self.connection.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS checkpoint_run (
+                directory TEXT PRIMARY KEY,
+                signature TEXT,
+                files INTEGER,
+                records INTEGER,
+                updated_at TEXT
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint_file (
+                directory TEXT,
+                seq INTEGER,
+                path TEXT,
+                warnings TEXT,
+                PRIMARY KEY (directory, seq)
+            );
+            CREATE TABLE IF NOT EXISTS checkpoint_record (
+                directory TEXT,
+                seq INTEGER,
+                file_seq INTEGER,
+                {columns},
+                PRIMARY KEY (directory, seq)
+            );
+            """
+        )
+        self.connection.commit()
+
+    def start(self, directory: str, signature: str, resume: bool = False) -> bool:
+        """
+        開始（或繼續）一個資料夾的檢查點
+
+        Args:
+            directory: 處理的資料夾
+            signature: 影響單檔結果的設定（掃描條件、EXIF/OCR 讀取方式），
+                與 journal 中的不同時不繼續
+            resume: 是否繼續 journal 中的進度，False 則清除舊的檢查點
+
+        Returns:
+            是否繼續先前的進度（之後以 load 讀回）
+        """
+        self.directory = os.path.normpath(os.path.abspath(directory))
+        row = self.connection.execute(
+            "SELECT signature, files, records FROM checkpoint_run "
+            "WHERE directory = ?",
+            (self.directory,),
+        ).fetchone()
+
+        if resume and row is not None:
+            if row[0] == signature:
+                _, self.file_count, self.record_count = row
+                return True
+            self.logger.warning(
+                "Checkpoint was created with different scan/EXIF/OCR settings, "
+                "starting over"
+            )
+        elif resume:
+            self.logger.info(f"No checkpoint found for {self.directory}")
+
+        self._delete(self.directory)
+        self.file_count = self.record_count = 0
+        self.connection.execute(
+            "INSERT INTO checkpoint_run VALUES (?, ?, 0, 0, ?)",
+            (self.directory, signature, _now()),
+        )
+        self.connection.commit()
+        return False
+
+    def load(self) -> List[FileResult]:
+        """
+        讀回已保存的進度
+
+        Returns:
+            依檔案順序排列的 (絕對路徑, 記錄, 警告)
+        """
+        files = {}
+        for seq, path, warnings in self.connection.execute(
+            "SELECT seq, path, warnings FROM checkpoint_file WHERE directory = ? "
+            "ORDER BY seq",
+            (self.directory,),
+        ):
+            files[seq] = (path, [], json.loads(warnings))
+        for row in self.connection.execute(
+            "SELECT * FROM checkpoint_record WHERE directory = ? ORDER BY seq",
+            (self.directory,),
+        ):
+            files[row[2]][1].append(self._to_record(row))
+        return list(files.values())
+
+    def append(self, results: List[FileResult]):
+        """
+        保存一批處理完成的檔案（單一交易，中斷時不會只寫入一部分）
+
+        Args:
+            results: 依檔案順序排列的 (絕對路徑, 記錄, 警告)，
+                包含沒有產生記錄的檔案，記錄的 DateTimeOriginal 皆已決定
+        """
+        directory = self.directory
+        file_rows = []
+        record_rows = []
+        for file_seq, (path, records, warnings) in enumerate(results, self.file_count):
+            file_rows.append(
+                (directory, file_seq, path, json.dumps(warnings, ensure_ascii=False))
+            )
+            for record in records:
+                record_rows.append((
+                    directory,
+                    self.record_count + len(record_rows),
+                    file_seq,
+                    record.SourceFile,
+                    record.DateTimeOriginal.isoformat(),
+                    record.Site,
+                    record.Plot_ID,
+                    record.Camera_ID,
+                    record.Group,
+                    record.Species,
+                    record.Number,
+                    record.Note,
+                ))
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO checkpoint_file VALUES (?, ?, ?, ?)", file_rows
+            )
+            self.connection.executemany(
+                f"INSERT INTO checkpoint_record "
+                f"VALUES (?, ?, ?{', ?' * len(self.FIELDS)})",
+                record_rows,
+            )
+            self.connection.execute(
+                "UPDATE checkpoint_run SET files = ?, records = ?, updated_at = ? "
+                "WHERE directory = ?",
+                (
+                    self.file_count + len(file_rows),
+                    self.record_count + len(record_rows),
+                    _now(),
+                    directory,
+                ),
+            )
+        self.file_count += len(file_rows)
+        self.record_count += len(record_rows)
+
+    def clear(self, directory: str):
+        """刪除資料夾的檢查點（輸出都寫入完成後呼叫）"""
+        with self.connection:
+            self._delete(os.path.normpath(os.path.abspath(directory)))
+
+    def _delete(self, directory: str):
+        for table in ("checkpoint_run", "checkpoint_file", "checkpoint_record"):
+            self.connection.execute(
+                f"DELETE FROM {table} WHERE directory = ?", (directory,)
+            )
+
+    @staticmethod
+    def _to_record(row: Tuple) -> PhotoRecord:
+        """(directory, seq, file_seq, FIELDS...) 轉回 PhotoRecord"""
+        (_, _, _, source_file, dt, site, plot_id, camera_id, group, species,
+         number, note) = row
+        return PhotoRecord(
+            SourceFile=source_file,
+            DateTimeOriginal=datetime.fromisoformat(dt),
+            Site=site,
+            Plot_ID=plot_id,
+            Camera_ID=camera_id,
+            Group=group,
+            Species=species,
+            Number=number,
+            Note=note,
+        )
+
+    def close(self):
+        """關閉資料庫連接"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        """支援 with 語句"""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """支援 with 語句"""
+        self.close()
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
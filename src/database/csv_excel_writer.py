@@ -2,128 +2,428 @@
 """
 CSV 和 Excel 資料寫入模組
 """
+import csv
 import os
-from typing import Dict, List
+from datetime import date, datetime, time
+from typing import Dict, Iterable, Optional, Sequence
 
 import pandas as pd
 
+from src.database.schema import RecordLike, record_to_dict
+from src.utils.datetime_parser import parse_datetime_column
 from src.utils.logger import getUniqueLogger
 
 logger = getUniqueLogger()
 
 
+class StreamingCSVWriter:
+    """
+    逐筆寫入 CSV，不建立 DataFrame
+
+    欄位順序固定：指定 columns，或使用第一筆記錄的欄位；
+    追加模式下沿用既有檔案的標題列，只有新檔案才寫入標題
+    """
+
+    def __init__(self, csv_path: str, columns: Optional[Sequence[str]] = None,
+                 append: bool = False):
+        """
+        初始化 CSV 寫入器
+
+        Args:
+            csv_path: CSV 檔案路徑
+            columns: 欄位順序，None 則使用第一筆記錄的欄位
+            append: 是否追加到既有檔案
+        """
+        self.csv_path = csv_path
+        self.columns = list(columns) if columns is not None else None
+        self.append = append
+        self.rows_written = 0
+        self.logger = logger
+
+        self._file = None
+        self._writer = None
+        self._header_pending = False
+        self._warned_extra = False
+
+    def open(self):
+        """開啟檔案；追加到既有檔案時讀取其標題列作為欄位順序"""
+        directory = os.path.dirname(self.csv_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        existing = (
+            self.append
+            and os.path.exists(self.csv_path)
+            and os.path.getsize(self.csv_path) > 0
+        )
+        if existing:
+            with open(self.csv_path, "r", encoding="utf-8-sig", newline="") as f:
+                header = next(csv.reader(f), None)
+            if header:
+                if self.columns is not None and list(self.columns) != header:
+                    self.logger.warning(
+                        f"Column order differs from existing CSV header, "
+                        f"using existing header: {self.csv_path}"
+                    )
+                self.columns = header
+            # 既有檔案已有 BOM，追加時不再寫入
+            self._file = open(self.csv_path, "a", encoding="utf-8", newline="")
+            self._header_pending = not header
+        else:
+            self._file = open(self.csv_path, "w", encoding="utf-8-sig", newline="")
+            self._header_pending = True
+
+        self._writer = csv.writer(self._file, lineterminator=os.linesep)
+        if self._header_pending and self.columns is not None:
+            self._write_header()
+
+    def _write_header(self):
+        """寫入標題列"""
+        self._writer.writerow(self.columns)
+        self._header_pending = False
+
+    def write(self, record: RecordLike):
+        """
+        寫入一筆記錄
+
+        Args:
+            record: PhotoRecord 或記錄字典，缺少的欄位寫入空白，多餘的欄位忽略
+        """
+        record = record_to_dict(record)
+        if self._writer is None:
+            self.open()
+        if self.columns is None:
+            self.columns = list(record.keys())
+        if self._header_pending:
+            self._write_header()
+
+        if not self._warned_extra and len(record) > len(self.columns):
+            extra = set(record) - set(self.columns)
+            if extra:
+                self.logger.warning(f"Ignoring columns not in CSV header: {sorted(extra)}")
+                self._warned_extra = True
+
+        # csv 模組會將 None 寫為空白，其他值以 str() 轉換
+        self._writer.writerow([record.get(column) for column in self.columns])
+        self.rows_written += 1
+
+    def write_row(self, row: Sequence):
+        """
+        寫入一列已依 columns 順序排列的值
+
+        Args:
+            row: 值的序列，順序需與 columns 相同
+        """
+        if self._writer is None:
+            self.open()
+        if self._header_pending:
+            self._write_header()
+        self._writer.writerow(row)
+        self.rows_written += 1
+
+    def write_rows(self, records: Iterable[RecordLike]):
+        """寫入多筆記錄"""
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        """關閉檔案"""
+        if self._file:
+            self._file.close()
+        self._file = None
+        self._writer = None
+
+    def __enter__(self):
+        """支援 with 語句"""
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """支援 with 語句"""
+        self.close()
+
+
+class StreamingExcelWriter:
+    """
+    以 openpyxl write-only 模式逐筆寫入 Excel
+
+    儲存格不會保留在記憶體中，記憶體用量與記錄數無關；
+    超過單一工作表的列數上限時自動新增工作表 (file_record_2, file_record_3, ...)
+    """
+
+    # Excel 單一工作表最多 1,048,576 列，扣除標題列
+    MAX_DATA_ROWS = 1048575
+
+    # 與 pandas.to_excel 相同的日期時間格式
+    DATETIME_FORMAT = "YYYY-MM-DD HH:MM:SS"
+    DATE_FORMAT = "YYYY-MM-DD"
+
+    def __init__(self, excel_path: str, columns: Optional[Sequence[str]] = None,
+                 sheet_name: str = "file_record",
+                 rows_per_sheet: int = MAX_DATA_ROWS):
+        """
+        初始化 Excel 寫入器
+
+        Args:
+            excel_path: Excel 檔案路徑
+            columns: 欄位順序，None 則使用第一筆記錄的欄位
+            sheet_name: 工作表名稱，分頁時依序加上 _2、_3
+            rows_per_sheet: 每個工作表的資料列數上限
+        """
+        self.excel_path = excel_path
+        self.columns = list(columns) if columns is not None else None
+        self.sheet_name = sheet_name
+        self.rows_per_sheet = max(1, min(rows_per_sheet, self.MAX_DATA_ROWS))
+        self.rows_written = 0
+        self.sheet_count = 0
+        self.logger = logger
+
+        self._workbook = None
+        self._sheet = None
+        self._sheet_rows = 0
+        # 每個欄位的數字格式，第一次遇到日期時間值時決定
+        self._formats: Dict[int, str] = {}
+
+    def open(self):
+        """建立 write-only 活頁簿"""
+        from openpyxl import Workbook
+
+        directory = os.path.dirname(self.excel_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._workbook = Workbook(write_only=True)
+        self._sheet = None
+        self._sheet_rows = 0
+        self.sheet_count = 0
+
+    def _new_sheet(self):
+        """新增工作表並寫入標題列"""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Alignment, Border, Font, Side
+
+        self.sheet_count += 1
+        title = self.sheet_name
+        if self.sheet_count > 1:
+            title = f"{self.sheet_name}_{self.sheet_count}"
+        self._sheet = self._workbook.create_sheet(title)
+        self._sheet_rows = 0
+
+        # 與 pandas.to_excel 相同的標題樣式
+        thin = Side(style="thin")
+        font = Font(bold=True)
+        border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        alignment = Alignment(horizontal="center", vertical="top")
+        header = []
+        for column in self.columns:
+            cell = WriteOnlyCell(self._sheet, value=column)
+            cell.font = font
+            cell.border = border
+            cell.alignment = alignment
+            header.append(cell)
+        self._sheet.append(header)
+
+    def write(self, record: RecordLike):
+        """
+        寫入一筆記錄
+
+        Args:
+            record: PhotoRecord 或記錄字典，缺少的欄位寫入空白，多餘的欄位忽略
+        """
+        record = record_to_dict(record)
+        if self._workbook is None:
+            self.open()
+        if self.columns is None:
+            self.columns = list(record.keys())
+        self.write_row([record.get(column) for column in self.columns])
+
+    def write_row(self, row: Sequence):
+        """
+        寫入一列已依 columns 順序排列的值
+
+        Args:
+            row: 值的序列，順序需與 columns 相同
+        """
+        if self._workbook is None:
+            self.open()
+        if self._sheet is None or self._sheet_rows >= self.rows_per_sheet:
+            self._new_sheet()
+
+        row = list(row)
+        for i, value in enumerate(row):
+            if isinstance(value, (datetime, date, time)):
+                row[i] = self._format_cell(i, value)
+
+        self._sheet.append(row)
+        self._sheet_rows += 1
+        self.rows_written += 1
+
+    def _format_cell(self, index: int, value):
+        """為日期時間值建立帶數字格式的儲存格，格式依欄位只決定一次"""
+        from openpyxl.cell import WriteOnlyCell
+
+        number_format = self._formats.get(index)
+        if number_format is None:
+            if isinstance(value, datetime):
+                number_format = self.DATETIME_FORMAT
+            elif isinstance(value, date):
+                number_format = self.DATE_FORMAT
+            else:
+                number_format = "HH:MM:SS"
+            self._formats[index] = number_format
+
+        cell = WriteOnlyCell(self._sheet, value=value)
+        cell.number_format = number_format
+        return cell
+
+    def write_rows(self, records: Iterable[RecordLike]):
+        """寫入多筆記錄"""
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        """儲存並關閉活頁簿"""
+        if self._workbook is None:
+            return
+        if self._sheet is None and self.columns is not None:
+            # 沒有任何資料時仍輸出標題列
+            self._new_sheet()
+        self._workbook.save(self.excel_path)
+        self._workbook = None
+        self._sheet = None
+
+    def __enter__(self):
+        """支援 with 語句"""
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """支援 with 語句，發生例外時不儲存不完整的檔案"""
+        if exc_type is not None:
+            self._workbook = None
+            self._sheet = None
+            return
+        self.close()
+
+
 class CSVExcelWriter:
     """CSV 和 Excel 資料寫入器"""
 
     def __init__(self):
         self.logger = logger
 
-    def write_to_csv(self, records: List[Dict], csv_path: str):
+    def write_to_csv(self, records: Iterable[RecordLike], csv_path: str,
+                     columns: Optional[Sequence[str]] = None):
         """
-        寫入資料到 CSV 檔案
+        寫入資料到 CSV 檔案（逐筆寫入，不建立 DataFrame）
 
         Args:
-            records: 記錄列表
+            records: 記錄列表或逐筆產生記錄的 iterable
             csv_path: CSV 檔案路徑
+            columns: 欄位順序，None 則使用第一筆記錄的欄位
         """
         try:
-            if not records:
+            records = iter(records)
+            first = next(records, None)
+            if first is None:
                 self.logger.warning("No records to write to CSV")
                 return
 
-            # 轉換為 DataFrame
-            df = pd.DataFrame(records)
-
-            # 確保目錄存在
-            os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+            with StreamingCSVWriter(csv_path, columns) as writer:
+                writer.write(first)
+                writer.write_rows(records)
 
-            # 寫入 CSV
-            df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-            self.logger.info(f"Written {len(records)} records to CSV: {csv_path}")
+            self.logger.info(
+                f"Written {writer.rows_written} records to CSV: {csv_path}"
+            )
 
         except Exception as e:
             self.logger.error(f"Failed to write CSV: {str(e)}")
             raise
 
-    def write_to_excel(self, records: List[Dict], excel_path: str):
+    def write_to_excel(self, records: Iterable[RecordLike], excel_path: str,
+                       columns: Optional[Sequence[str]] = None):
         """
-        寫入資料到 Excel 檔案
+        寫入資料到 Excel 檔案（write-only 模式逐筆寫入，超過列數上限時分頁）
 
         Args:
-            records: 記錄列表
+            records: 記錄列表或逐筆產生記錄的 iterable
             excel_path: Excel 檔案路徑
+            columns: 欄位順序，None 則使用第一筆記錄的欄位
         """
         try:
-            if not records:
+            records = iter(records)
+            first = next(records, None)
+            if first is None:
                 self.logger.warning("No records to write to Excel")
                 return
 
-            # 轉換為 DataFrame
-            df = pd.DataFrame(records)
-
-            # 確保目錄存在
-            os.makedirs(os.path.dirname(excel_path), exist_ok=True)
+            with StreamingExcelWriter(excel_path, columns) as writer:
+                writer.write(first)
+                writer.write_rows(records)
 
-            # 寫入 Excel
-            with pd.ExcelWriter(excel_path, engine="openpyxl") as writer:
-                df.to_excel(writer, sheet_name="file_record", index=False)
-
-            self.logger.info(f"Written {len(records)} records to Excel: {excel_path}")
+            self.logger.info(
+                f"Written {writer.rows_written} records to Excel "
+                f"({writer.sheet_count} sheets): {excel_path}"
+            )
 
         except Exception as e:
             self.logger.error(f"Failed to write Excel: {str(e)}")
             raise
 
-    def append_to_csv(self, records: List[Dict], csv_path: str):
+    def append_to_csv(self, records: Iterable[RecordLike], csv_path: str,
+                      columns: Optional[Sequence[str]] = None):
         """
         追加資料到 CSV 檔案
 
+        以追加模式開啟檔案，不讀取既有資料；只有新檔案才寫入標題列
+
         Args:
-            records: 記錄列表
+            records: 記錄列表或逐筆產生記錄的 iterable
             csv_path: CSV 檔案路徑
+            columns: 新檔案的欄位順序，既有檔案則沿用其標題列
         """
         try:
-            if not records:
+            records = iter(records)
+            first = next(records, None)
+            if first is None:
                 return
 
-            df_new = pd.DataFrame(records)
-
-            # 如果檔案存在，讀取並合併
-            if os.path.exists(csv_path):
-                df_existing = pd.read_csv(csv_path, encoding="utf-8-sig")
-                df = pd.concat([df_existing, df_new], ignore_index=True)
-            else:
-                df = df_new
+            with StreamingCSVWriter(csv_path, columns, append=True) as writer:
+                writer.write(first)
+                writer.write_rows(records)
 
-            # 寫入
-            df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-            self.logger.info(f"Appended {len(records)} records to CSV: {csv_path}")
+            self.logger.info(
+                f"Appended {writer.rows_written} records to CSV: {csv_path}"
+            )
 
         except Exception as e:
             self.logger.error(f"Failed to append to CSV: {str(e)}")
             raise
 
-    def read_csv_datetime(self, csv_path: str) -> Dict[str, str]:
+    def read_csv_datetime(self, csv_path: str) -> Dict[str, datetime]:
         """
         從 CSV 檔案讀取檔名與時間的對應
 
+        只讀取檔名與時間兩欄，時間欄一次解析完成，
+        處理照片時直接查表，不需再逐檔解析
+
         Args:
             csv_path: CSV 檔案路徑
 
         Returns:
-            檔名 -> CreateDate 的對應字典
+            檔名 -> 日期時間的對應字典（無法解析的時間不列入）
         """
         try:
             if not os.path.exists(csv_path):
                 return {}
 
-            df = pd.read_csv(csv_path, encoding="utf-8-sig")
-
-            # 尋找 Filename 和 CreateDate 欄位
+            # 先只讀標題列，尋找 Filename 和 CreateDate 欄位
+            columns = pd.read_csv(csv_path, encoding="utf-8-sig", nrows=0).columns
             filename_col = None
             datetime_col = None
 
-            for col in df.columns:
+            for col in columns:
                 col_lower = col.lower()
                 if "filename" in col_lower or "檔名" in col_lower:
                     filename_col = col
@@ -138,17 +438,31 @@ class CSVExcelWriter:
                 self.logger.warning(f"CSV {csv_path} missing required columns")
                 return {}
 
-            # 建立對應字典
-            result = {}
-            for _, row in df.iterrows():
-                filename = str(row[filename_col])
-                datetime_str = str(row[datetime_col])
-                if filename and datetime_str and datetime_str != "nan":
-                    result[filename] = datetime_str
+            df = pd.read_csv(
+                csv_path,
+                encoding="utf-8-sig",
+                usecols=list({filename_col, datetime_col}),
+                dtype=str,
+            )
+            df = df[df[datetime_col].notna()]
+            filenames = df[filename_col].astype(str).tolist()
+            datetimes = parse_datetime_column(df[datetime_col].tolist())
+
+            # 同一檔名出現多次時以最後一筆為準（即使最後一筆無法解析）
+            result = {
+                filename: dt
+                for filename, dt in dict(zip(filenames, datetimes)).items()
+                if dt is not None
+            }
 
             self.logger.info(
                 f"Read {len(result)} datetime entries from CSV: {csv_path}"
             )
+            skipped = len(set(filenames)) - len(result)
+            if skipped:
+                self.logger.warning(
+                    f"Ignored {skipped} unparseable datetime entries in CSV: {csv_path}"
+                )
             return result
 
         except Exception as e:
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+CSV 時間參考檔索引模組
+
+每個資料夾可以有自己的時間參考 CSV（例如每台相機一個）。
+所有參考檔載入同一個 (資料夾, 檔名) -> 日期時間 索引，
+照片先查所在資料夾的參考檔，沒有對應時再依序往上層資料夾查找。
+"""
+import os
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+def choose_reference_csv(folder: str, filenames: List[str]) -> Optional[str]:
+    """
+    選擇資料夾的時間參考 CSV
+
+    優先使用與資料夾同名的 CSV，否則使用第一個 CSV 檔
+
+    Args:
+        folder: 資料夾路徑
+        filenames: 資料夾中的檔名（依列出順序）
+
+    Returns:
+        CSV 檔名，沒有 CSV 則返回 None
+    """
+    folder_csv = f"{os.path.basename(os.path.normpath(folder))}.csv"
+    if folder_csv in filenames:
+        return folder_csv
+    for filename in filenames:
+        if filename.lower().endswith(".csv"):
+            return filename
+    return None
+
+
+class CSVDatetimeIndex:
+    """(資料夾, 檔名) -> 日期時間 索引"""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: 掃描的根目錄，往上層查找時不超過此目錄
+        """
+        self.root = os.path.normpath(root)
+        self._index: Dict[Tuple[str, str], datetime] = {}
+        self._folders = set()
+        # 資料夾 -> 由近到遠有參考檔的資料夾
+        self._chains: Dict[str, Tuple[str, ...]] = {}
+        self.hits = 0
+
+    def add(self, folder: str, datetime_map: Dict[str, datetime]):
+        """
+        加入一個資料夾的參考檔內容
+
+        Args:
+            folder: 參考檔所在資料夾
+            datetime_map: 檔名 -> 日期時間
+        """
+        folder = os.path.normpath(folder)
+        self._folders.add(folder)
+        self._chains.clear()
+        for filename, dt in datetime_map.items():
+            self._index[(folder, filename)] = dt
+
+    def lookup(self, file_path: str) -> Optional[datetime]:
+        """
+        查詢檔案的參考時間
+
+        Args:
+            file_path: 檔案路徑
+
+        Returns:
+            最近一層參考檔中的日期時間，沒有則返回 None
+        """
+        if not self._index:
+            return None
+
+        folder, filename = os.path.split(file_path)
+        for reference_folder in self._chain(os.path.normpath(folder)):
+            dt = self._index.get((reference_folder, filename))
+            if dt is not None:
+                self.hits += 1
+                return dt
+        return None
+
+    def _chain(self, folder: str) -> Tuple[str, ...]:
+        """folder 本身及其上層（到 root 為止）中有參考檔的資料夾"""
+        chain = self._chains.get(folder)
+        if chain is None:
+            folders = []
+            current = folder
+            while True:
+                if current in self._folders:
+                    folders.append(current)
+                parent = os.path.dirname(current)
+                if current == self.root or parent == current:
+                    break
+                current = parent
+            chain = self._chains[folder] = tuple(folders)
+        return chain
+
+    @property
+    def folder_count(self) -> int:
+        """有參考檔的資料夾數"""
+        return len(self._folders)
+
+    def __len__(self) -> int:
+        return len(self._index)
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+輸出階段模組
+
+將處理結果同時寫入所有啟用的輸出 (CSV、Excel、Access DB、SQLite)，
+每個輸出在各自的 worker 執行緒中寫入，總時間接近最慢的輸出而非全部相加；
+某個輸出失敗不會中止其他輸出。
+"""
+import itertools
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from src.database.schema import (
+    RECORD_FIELDS,
+    PhotoRecord,
+    RecordLike,
+    RecordTable,
+    record_to_row,
+)
+from src.utils.logger import getUniqueLogger
+
+logger = getUniqueLogger()
+
+
+@dataclass
+class SinkResult:
+    """單一輸出的寫入結果"""
+
+    name: str
+    rows: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    failed_rows: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class OutputSink:
+    """輸出目的地基底類別"""
+
+    name = "output"
+
+    def __init__(self, table: RecordTable):
+        """
+        Args:
+            table: 要寫入的記錄
+        """
+        self.table = table
+        # 寫入失敗的列數（只有能逐筆略過錯誤的輸出會設定）
+        self.failed_rows = 0
+
+    def write(self):
+        """寫入所有記錄，失敗時拋出例外"""
+        raise NotImplementedError
+
+
+class CSVSink(OutputSink):
+    """CSV 輸出"""
+
+    name = "CSV"
+
+    def __init__(self, table: RecordTable, csv_path: str):
+        super().__init__(table)
+        self.csv_path = csv_path
+
+    def write(self):
+        from src.database.csv_excel_writer import StreamingCSVWriter
+
+        with StreamingCSVWriter(self.csv_path, self.table.columns) as writer:
+            for row in self.table.rows:
+                writer.write_row(row)
+
+
+class ExcelSink(OutputSink):
+    """Excel 輸出"""
+
+    name = "Excel"
+
+    def __init__(self, table: RecordTable, excel_path: str):
+        super().__init__(table)
+        self.excel_path = excel_path
+
+    def write(self):
+        from src.database.csv_excel_writer import StreamingExcelWriter
+
+        with StreamingExcelWriter(self.excel_path, self.table.columns) as writer:
+            for row in self.table.rows:
+                writer.write_row(row)
+
+
+class AccessSink(OutputSink):
+    """Access DB 輸出"""
+
+    name = "Access DB"
+
+    def __init__(self, table: RecordTable, db_path: str,
+                 options: Optional[Dict] = None,
+                 updated_records: Sequence[PhotoRecord] = ()):
+        """
+        Args:
+            table: 要寫入的記錄
+            db_path: Access DB 檔案路徑
+            options: 傳給 AccessDB 的其他參數（如 chunk_size）
+            updated_records: 衍生欄位有變動的既有記錄（增量處理用）
+        """
+        super().__init__(table)
+        self.db_path = db_path
+        self.options = options or {}
+        self.updated_records = updated_records
+
+    def write(self):
+        from src.database.access_db import AccessDB
+
+        with AccessDB(self.db_path, **self.options) as db:
+            failed = db.insert_rows(self.table.rows)
+            db.update_derived_fields(list(self.updated_records))
+        self.failed_rows = len(failed)
+
+
+class SQLiteSink(OutputSink):
+    """SQLite 輸出"""
+
+    name = "SQLite"
+
+    def __init__(self, table: RecordTable, db_path: str, chunk_size: int = 10000,
+                 processed_files: Sequence[str] = ()):
+        """
+        Args:
+            table: 要寫入的記錄
+            db_path: SQLite 檔案路徑
+            chunk_size: 每次 executemany 的筆數
+            processed_files: 寫入後標記為已匯入的檔案（增量處理用）
+        """
+        super().__init__(table)
+        self.db_path = db_path
+        self.chunk_size = chunk_size
+        self.processed_files = processed_files
+
+    def write(self):
+        from src.database.sqlite_db import SQLiteDB
+
+        with SQLiteDB(self.db_path, chunk_size=self.chunk_size) as db:
+            db.insert_rows(self.table.rows)
+            db.mark_files_processed(self.processed_files)
+
+
+def build_output_sinks(records: List[RecordLike], export_records: List[RecordLike],
+                       csv_path: str, excel_path: str,
+                       access_db_path: Optional[str] = None,
+                       access_options: Optional[Dict] = None,
+                       sqlite_db_path: Optional[str] = None,
+                       sqlite_chunk_size: int = 10000,
+                       processed_files: Sequence[str] = (),
+                       updated_records: Sequence[PhotoRecord] = ()) -> List[OutputSink]:
+    """
+    建立所有啟用的輸出，記錄只轉換一次
+
+    Args:
+        records: 本次處理的記錄（寫入 Access DB、SQLite）
+        export_records: 匯出到 CSV/Excel 的記錄（增量處理時為 SQLite 的完整資料）
+        csv_path: CSV 檔案路徑
+        excel_path: Excel 檔案路徑
+        access_db_path: Access DB 路徑，None 表示不寫入
+        access_options: 傳給 AccessDB 的其他參數
+        sqlite_db_path: SQLite 路徑，None 表示不寫入
+        sqlite_chunk_size: SQLite 每次 executemany 的筆數
+        processed_files: 寫入 SQLite 後標記為已匯入的檔案
+        updated_records: 衍生欄位有變動的既有記錄，更新到 Access DB
+            （增量處理時 SQLite 已在處理中更新）
+
+    Returns:
+        輸出列表
+    """
+    table = RecordTable.from_records(records)
+    if export_records is records:
+        export_table = table
+    else:
+        export_table = RecordTable.from_records(export_records)
+
+    sinks = [CSVSink(export_table, csv_path), ExcelSink(export_table, excel_path)]
+    if access_db_path:
+        sinks.append(
+            AccessSink(table, access_db_path, access_options, updated_records)
+        )
+    if sqlite_db_path:
+        sinks.append(
+            SQLiteSink(table, sqlite_db_path, sqlite_chunk_size, processed_files)
+        )
+    return sinks
+
+
+def write_outputs(sinks: List[OutputSink],
+                  on_result: Optional[Callable[[SinkResult], None]] = None,
+                  max_workers: Optional[int] = None) -> List[SinkResult]:
+    """
+    同時寫入所有輸出
+
+    Args:
+        sinks: 輸出列表
+        on_result: 每個輸出完成時呼叫（在 worker 執行緒中）
+        max_workers: 同時寫入的輸出數，None 表示每個輸出一個 worker
+
+    Returns:
+        與 sinks 順序相同的寫入結果
+    """
+    if not sinks:
+        return []
+
+    start = time.perf_counter()
+    workers = max_workers or len(sinks)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sink") as executor:
+        results = list(
+            executor.map(lambda sink: _run_sink(sink, on_result), sinks)
+        )
+
+    logger.info(
+        f"Wrote {len(sinks)} outputs in {time.perf_counter() - start:.2f}s "
+        f"(sum of outputs {sum(r.seconds for r in results):.2f}s)"
+    )
+    return results
+
+
+def _run_sink(sink: OutputSink,
+              on_result: Optional[Callable[[SinkResult], None]] = None) -> SinkResult:
+    """寫入單一輸出並記錄結果"""
+    result = SinkResult(sink.name)
+    start = time.perf_counter()
+    try:
+        sink.write()
+        result.failed_rows = sink.failed_rows
+    except Exception as e:
+        logger.error(f"Failed to write {sink.name}: {str(e)}")
+        result.error = str(e)
+        if isinstance(sink.table.rows, RowFeed):
+            # 不再讀取，避免產生資料的一方卡住
+            sink.table.rows.discard()
+    result.rows = len(sink.table)
+    result.seconds = time.perf_counter() - start
+    logger.info(f"{sink.name} output finished in {result.seconds:.2f}s")
+    if on_result:
+        on_result(result)
+    return result
+
+
+class RowFeed:
+    """
+    串流輸出時餵給單一輸出的列
+
+    產生資料的一方以 put 分批放入，輸出在自己的 worker 執行緒中逐列讀取；
+    佇列有上限，輸出寫得比較慢時產生端會等待，記憶體中只保留少數幾批。
+    """
+
+    _END = object()
+
+    def __init__(self, max_chunks: int = 4):
+        """
+        Args:
+            max_chunks: 佇列中最多等待的批數
+        """
+        self._queue = queue.Queue(maxsize=max(1, max_chunks))
+        self._discarded = False
+        # 已讀出的列數
+        self.count = 0
+
+    def put(self, chunk: List[Sequence]):
+        """放入一批列（輸出已失敗時直接丟棄）"""
+        if not self._discarded:
+            self._queue.put(chunk)
+
+    def close(self):
+        """所有列都已放入"""
+        if not self._discarded:
+            self._queue.put(self._END)
+
+    def discard(self):
+        """輸出失敗，丟棄之後的列"""
+        self._discarded = True
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def __iter__(self):
+        while True:
+            chunk = self._queue.get()
+            if chunk is self._END:
+                return
+            self.count += len(chunk)
+            yield from chunk
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def stream_outputs(records: Iterable[RecordLike], csv_path: str, excel_path: str,
+                   access_db_path: Optional[str] = None,
+                   access_options: Optional[Dict] = None,
+                   sqlite_db_path: Optional[str] = None,
+                   sqlite_chunk_size: int = 10000,
+                   on_result: Optional[Callable[[SinkResult], None]] = None,
+                   chunk_size: int = 1000) -> List[SinkResult]:
+    """
+    邊處理邊寫入所有啟用的輸出（搭配 PhotoProcessor.iter_process）
+
+    records 只走訪一次，每 chunk_size 筆轉為列後分送給各輸出，
+    各輸出仍在各自的 worker 執行緒中寫入，記憶體中不保留全部記錄。
+    records 拋出例外時，已產生的記錄仍會寫完並關閉輸出，之後再拋出。
+    records 為產生器時，已匯入檔案要在走訪完後才知道，由呼叫端另外標記。
+
+    Args:
+        records: 記錄（可為產生器）
+        csv_path: CSV 檔案路徑
+        excel_path: Excel 檔案路徑
+        access_db_path: Access DB 路徑，None 表示不寫入
+        access_options: 傳給 AccessDB 的其他參數
+        sqlite_db_path: SQLite 路徑，None 表示不寫入
+        sqlite_chunk_size: SQLite 每次 executemany 的筆數
+        on_result: 每個輸出完成時呼叫（在 worker 執行緒中）
+        chunk_size: 每批分送的記錄數
+
+    Returns:
+        寫入結果，順序與 build_output_sinks 相同
+    """
+    sinks = [
+        CSVSink(RecordTable(RowFeed()), csv_path),
+        ExcelSink(RecordTable(RowFeed()), excel_path),
+    ]
+    if access_db_path:
+        sinks.append(
+            AccessSink(RecordTable(RowFeed()), access_db_path, access_options)
+        )
+    if sqlite_db_path:
+        sinks.append(
+            SQLiteSink(RecordTable(RowFeed()), sqlite_db_path, sqlite_chunk_size)
+        )
+    feeds = [sink.table.rows for sink in sinks]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(sinks), thread_name_prefix="sink") as executor:
+        futures = [executor.submit(_run_sink, sink, on_result) for sink in sinks]
+        try:
+            rows = (record_to_row(record, RECORD_FIELDS) for record in records)
+            while True:
+                chunk = list(itertools.islice(rows, max(1, chunk_size)))
+                if not chunk:
+                    break
+                for feed in feeds:
+                    feed.put(chunk)
+        finally:
+            for feed in feeds:
+                feed.close()
+        results = [future.result() for future in futures]
+
+    logger.info(
+        f"Streamed {len(sinks)} outputs in {time.perf_counter() - start:.2f}s"
+    )
+    return results
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+記錄暫存模組
+
+串流處理時，記錄先依檔案順序寫入暫存 SQLite，之後再逐台相機讀回計算
+時間範圍與有效照片，最後依原本順序讀出，記憶體中只需保留一台相機的記錄。
+處理過的檔案路徑也以 PathSpool 暫存，不隨資料夾大小佔用記憶體。
+"""
+import os
+import sqlite3
+import tempfile
+import weakref
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.database.schema import PhotoRecord
+from src.utils.logger import getUniqueLogger
+
+logger = getUniqueLogger()
+
+
+class RecordSpool:
+    """依檔案順序暫存 PhotoRecord 的 SQLite 檔案，關閉時刪除"""
+
+    # 依序讀出時每次 fetchmany 的筆數
+    FETCH_SIZE = 10000
+
+    # 暫存的欄位（period_start/period_end 每台相機相同，另外保存在記憶體中）
+    FIELDS = (
+        "SourceFile",
+        "DateTimeOriginal",
+        "Site",
+        "Plot_ID",
+        "Camera_ID",
+        "Group",
+        "Species",
+        "Number",
+        "Note",
+        "IndependentPhoto",
+    )
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: 暫存檔所在目錄，None 則使用系統暫存目錄
+        """
+        self.directory = directory
+        self.path = None
+        self.connection = None
+        self.count = 0
+        # Camera_ID -> (period_start, period_end)，依首次出現順序
+        self._periods: Dict[Optional[str], Tuple] = {}
+        self.logger = logger
+
+    def open(self):
+        """建立暫存檔"""
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(
+            prefix="record_spool_", suffix=".sqlite", dir=self.directory
+        )
+        os.close(fd)
+        self.connection = sqlite3.connect(self.path)
+        # 暫存資料不需在當機後保留
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        columns = ", ".join(f'"{field}"' for field in self.FIELDS)
+        self.connection.execute(
+            f"CREATE TABLE spool (seq INTEGER PRIMARY KEY, {columns})"
+        )
+        self.logger.debug(f"Opened record spool: {self.path}")
+
+    def append(self, records: Iterable[PhotoRecord]):
+        """
+        依序加入記錄
+
+        Args:
+            records: 記錄（DateTimeOriginal 皆已決定）
+        """
+        rows = []
+        for seq, record in enumerate(records, self.count):
+            # datetime 以 ISO 字串保存，讀回時完整還原（含微秒）
+            rows.append((
+                seq,
+                record.SourceFile,
+                record.DateTimeOriginal.isoformat(),
+                record.Site,
+                record.Plot_ID,
+                record.Camera_ID,
+                record.Group,
+                record.Species,
+                record.Number,
+                record.Note,
+                record.IndependentPhoto,
+            ))
+            self._periods.setdefault(record.Camera_ID, (None, None))
+        self.connection.executemany(
+            f"INSERT INTO spool VALUES (?{', ?' * len(self.FIELDS)})", rows
+        )
+        self.connection.commit()
+        self.count += len(rows)
+
+    def camera_ids(self) -> List[Optional[str]]:
+        """所有 Camera_ID，依首次出現順序"""
+        # 全部寫入後才建立索引，逐台相機讀回時使用
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS spool_camera ON spool (Camera_ID, seq)"
+        )
+        return list(self._periods)
+
+    def camera_records(
+        self, camera_id: Optional[str]
+    ) -> Tuple[List[int], List[PhotoRecord]]:
+        """
+        取得一台相機的記錄
+
+        Args:
+            camera_id: Camera_ID，可為 None
+
+        Returns:
+            (序號列表, 依檔案順序排列的記錄列表)
+        """
+        cursor = self.connection.execute(
+            "SELECT * FROM spool WHERE Camera_ID IS ? ORDER BY seq", (camera_id,)
+        )
+        seqs = []
+        records = []
+        for row in cursor:
+            seqs.append(row[0])
+            records.append(self._to_record(row))
+        return seqs, records
+
+    def update_derived(self, seqs: List[int], records: List[PhotoRecord]):
+        """
+        保存一台相機重新計算的 IndependentPhoto 與 period_start/period_end
+
+        Args:
+            seqs: camera_records 返回的序號
+            records: 對應的記錄
+        """
+        if not records:
+            return
+        self.connection.executemany(
+            "UPDATE spool SET IndependentPhoto = ? WHERE seq = ?",
+            (
+                (record.IndependentPhoto, seq)
+                for seq, record in zip(seqs, records)
+            ),
+        )
+        self.connection.commit()
+        first = records[0]
+        self._periods[first.Camera_ID] = (first.period_start, first.period_end)
+
+    def cap_independent_per_file(self) -> int:
+        """
+        限制同一張照片的 OI 貢獻最大值為 1（結果與 postprocess 的 OI 上限相同）
+
+        同一檔名依加入順序只保留第一筆 IndependentPhoto=1，於資料庫中處理，
+        不需在記憶體中記住所有檔名
+
+        Returns:
+            改為 0 的記錄數
+        """
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS spool_independent "
+            "ON spool (IndependentPhoto, SourceFile, seq)"
+        )
+        cursor = self.connection.execute(
+            "SELECT SourceFile, COUNT(*) FROM spool WHERE IndependentPhoto = 1 "
+            "GROUP BY SourceFile HAVING COUNT(*) > 1 ORDER BY MIN(seq)"
+        )
+        for source_file, count in cursor:
+            self.logger.info(
+                f"{source_file}: {count} independent records found, capping OI to 1"
+            )
+        cursor = self.connection.execute(
+            """
+            UPDATE spool SET IndependentPhoto = 0 WHERE seq IN (
+                SELECT seq FROM (
+                    SELECT seq, ROW_NUMBER() OVER (
+                        PARTITION BY SourceFile ORDER BY seq
+                    ) AS n
+                    FROM spool WHERE IndependentPhoto = 1
+                ) WHERE n > 1
+            )
+            """
+        )
+        self.connection.commit()
+        return cursor.rowcount
+
+    def __iter__(self) -> Iterator[PhotoRecord]:
+        """依加入順序讀出所有記錄"""
+        cursor = self.connection.execute("SELECT * FROM spool ORDER BY seq")
+        while True:
+            rows = cursor.fetchmany(self.FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                record = self._to_record(row)
+                record.period_start, record.period_end = self._periods[
+                    record.Camera_ID
+                ]
+                yield record
+
+    @staticmethod
+    def _to_record(row: Tuple) -> PhotoRecord:
+        """(seq, FIELDS...) 轉回 PhotoRecord"""
+        (_, source_file, dt, site, plot_id, camera_id, group, species,
+         number, note, independent) = row
+        return PhotoRecord(
+            SourceFile=source_file,
+            DateTimeOriginal=datetime.fromisoformat(dt),
+            Site=site,
+            Plot_ID=plot_id,
+            Camera_ID=camera_id,
+            Group=group,
+            Species=species,
+            Number=number,
+            Note=note,
+            IndependentPhoto=independent,
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        """關閉並刪除暫存檔"""
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                self.logger.warning(f"Failed to remove record spool {self.path}: {e}")
+            self.path = None
+
+    def __enter__(self):
+        """支援 with 語句"""
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """支援 with 語句"""
+        self.close()
+
+
+class PathSpool:
+    """
+    依加入順序暫存檔案路徑的 SQLite 檔案（串流處理的 processed_files）
+
+    支援 list 的 append、len、依序讀出與 del spool[start:]，
+    關閉或不再使用時刪除暫存檔
+    """
+
+    # 累積多少筆路徑才寫入一次
+    FLUSH_SIZE = 10000
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        Args:
+            directory: 暫存檔所在目錄，None 則使用系統暫存目錄
+        """
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(
+            prefix="path_spool_", suffix=".sqlite", dir=directory
+        )
+        os.close(fd)
+        # 處理完後可能在其他執行緒讀出（如介面顯示處理的檔案數）
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=OFF")
+        self.connection.execute("PRAGMA synchronous=OFF")
+        self.connection.execute("CREATE TABLE path (seq INTEGER PRIMARY KEY, path TEXT)")
+        self._pending: List[str] = []
+        self._count = 0
+        self._finalizer = weakref.finalize(
+            self, _remove_spool, self.connection, self.path
+        )
+
+    def append(self, path: str):
+        self._pending.append(path)
+        if len(self._pending) >= self.FLUSH_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        self.connection.executemany(
+            "INSERT INTO path VALUES (?, ?)",
+            enumerate(self._pending, self._count),
+        )
+        self.connection.commit()
+        self._count += len(self._pending)
+        self._pending = []
+
+    def __len__(self) -> int:
+        return self._count + len(self._pending)
+
+    def __iter__(self) -> Iterator[str]:
+        """依加入順序讀出所有路徑"""
+        self._flush()
+        cursor = self.connection.execute("SELECT path FROM path ORDER BY seq")
+        while True:
+            rows = cursor.fetchmany(RecordSpool.FETCH_SIZE)
+            if not rows:
+                return
+            for (path,) in rows:
+                yield path
+
+    def __delitem__(self, index: slice):
+        """只支援 del spool[start:]（捨棄預先讀取但未處理的檔案）"""
+        if not isinstance(index, slice) or index.stop is not None or index.step:
+            raise TypeError("PathSpool only supports del spool[start:]")
+        self._flush()
+        start = index.start or 0
+        if start >= self._count:
+            return
+        self.connection.execute("DELETE FROM path WHERE seq >= ?", (start,))
+        self.connection.commit()
+        self._count = start
+
+    def close(self):
+        """關閉並刪除暫存檔"""
+        self._finalizer()
+
+
+def _remove_spool(connection: sqlite3.Connection, path: str):
+    connection.close()
+    try:
+        os.remove(path)
+    except OSError as e:
+        logger.warning(f"Failed to remove spool {path}: {e}")
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+記錄欄位定義
+
+PhotoProcessor 產生的記錄型別、欄位順序，以及各輸出共用的列 (tuple) 表示法
+"""
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+# PhotoProcessor 記錄的欄位順序
+RECORD_FIELDS = (
+    "SourceFile",
+    "DateTimeOriginal",
+    "Date",
+    "Time",
+    "Site",
+    "Plot_ID",
+    "Camera_ID",
+    "Group",
+    "Species",
+    "Number",
+    "Note",
+    "IndependentPhoto",
+    "period_start",
+    "period_end",
+)
+
+# 欄位缺少時的預設值（與資料庫寫入時相同）
+FIELD_DEFAULTS = {
+    "Number": 1,
+    "Note": "",
+    "IndependentPhoto": 0,
+}
+
+# 資料庫中 CreateDate 插入在 IndependentPhoto 之後
+CREATE_DATE_INDEX = RECORD_FIELDS.index("IndependentPhoto") + 1
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """重複出現的字串 (Site、Camera_ID、Species...) 共用同一個物件"""
+    return sys.intern(value) if type(value) is str else value
+
+
+@dataclass(slots=True)
+class PhotoRecord:
+    """
+    一張照片中一種動物的記錄
+
+    以 __slots__ 儲存，比 14 個欄位的字典省下大部分記憶體；
+    Date/Time 由 DateTimeOriginal 衍生（Access DB 需要完整的 datetime 物件），
+    不另外儲存。寫入 CSV/Excel/資料庫時才以 to_row / to_dict 轉換。
+    """
+
+    SourceFile: str
+    DateTimeOriginal: Optional[datetime] = None
+    Site: Optional[str] = None
+    Plot_ID: Optional[str] = None
+    Camera_ID: Optional[str] = None
+    Group: Optional[str] = None
+    Species: Optional[str] = None
+    Number: int = 1
+    Note: str = ""
+    IndependentPhoto: int = 0
+    period_start: Optional[datetime] = None
+    period_end: Optional[datetime] = None
+    # SQLite 中的記錄 ID（增量處理時由資料庫讀回的記錄才有）
+    ID: Optional[int] = None
+
+    def __post_init__(self):
+        self.Site = _intern(self.Site)
+        self.Plot_ID = _intern(self.Plot_ID)
+        self.Camera_ID = _intern(self.Camera_ID)
+        self.Group = _intern(self.Group)
+        self.Species = _intern(self.Species)
+
+    @property
+    def Date(self) -> Optional[datetime]:
+        return self.DateTimeOriginal
+
+    @property
+    def Time(self) -> Optional[datetime]:
+        return self.DateTimeOriginal
+
+    def get(self, field: str, default=None):
+        """與字典相同的取值方式，方便既有以 record.get 存取的程式"""
+        return getattr(self, field, default)
+
+    def to_row(self) -> Tuple:
+        """依 RECORD_FIELDS 順序轉為 tuple"""
+        dt = self.DateTimeOriginal
+        return (
+            self.SourceFile,
+            dt,
+            dt,
+            dt,
+            self.Site,
+            self.Plot_ID,
+            self.Camera_ID,
+            self.Group,
+            self.Species,
+            self.Number,
+            self.Note,
+            self.IndependentPhoto,
+            self.period_start,
+            self.period_end,
+        )
+
+    def to_dict(self) -> Dict:
+        """轉為依 RECORD_FIELDS 順序的字典"""
+        return dict(zip(RECORD_FIELDS, self.to_row()))
+
+    @classmethod
+    def from_dict(cls, record: Dict) -> "PhotoRecord":
+        """由字典建立（Date/Time 與 CreateDate 等資料庫欄位會被忽略）"""
+        get = record.get
+        return cls(
+            SourceFile=get("SourceFile"),
+            DateTimeOriginal=get("DateTimeOriginal"),
+            Site=get("Site"),
+            Plot_ID=get("Plot_ID"),
+            Camera_ID=get("Camera_ID"),
+            Group=get("Group"),
+            Species=get("Species"),
+            Number=get("Number", 1),
+            Note=get("Note", ""),
+            IndependentPhoto=get("IndependentPhoto", 0),
+            period_start=get("period_start"),
+            period_end=get("period_end"),
+            ID=get("ID"),
+        )
+
+
+RecordLike = Union[PhotoRecord, Dict]
+
+
+def record_to_row(record: RecordLike, fields: Sequence[str] = RECORD_FIELDS) -> Tuple:
+    """將記錄（PhotoRecord 或字典）轉為依 fields 順序排列的 tuple"""
+    if isinstance(record, PhotoRecord):
+        if fields is RECORD_FIELDS:
+            return record.to_row()
+        return tuple(getattr(record, field, None) for field in fields)
+    get = record.get
+    return tuple(get(field, FIELD_DEFAULTS.get(field)) for field in fields)
+
+
+def record_to_dict(record: RecordLike) -> Dict:
+    """將記錄轉為字典（字典則原樣返回）"""
+    if isinstance(record, PhotoRecord):
+        return record.to_dict()
+    return record
+
+
+class RecordTable:
+    """
+    以 tuple 列表示的記錄集合
+
+    記錄只轉換一次，各輸出 (CSV、Excel、Access、SQLite) 共用同一份資料
+    """
+
+    def __init__(self, rows: List[Tuple], columns: Sequence[str] = RECORD_FIELDS):
+        """
+        Args:
+            rows: 依 columns 順序排列的列
+            columns: 欄位名稱
+        """
+        self.columns = tuple(columns)
+        self.rows = rows
+
+    @classmethod
+    def from_records(cls, records: Iterable[RecordLike],
+                     columns: Sequence[str] = RECORD_FIELDS) -> "RecordTable":
+        """由記錄字典建立"""
+        return cls([record_to_row(record, columns) for record in records], columns)
+
+    def column_index(self, name: str) -> int:
+        """欄位位置"""
+        return self.columns.index(name)
+
+    def __len__(self) -> int:
+        return len(self.rows)
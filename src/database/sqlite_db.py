@@ -2,11 +2,20 @@
 """
 SQLite 資料庫操作模組
 """
+import itertools
 import os
 import sqlite3
+import time
 from datetime import datetime
-from typing import Dict, List
+from typing import Callable, Iterable, List, Optional, Set, Tuple
 
+from src.database.schema import (
+    CREATE_DATE_INDEX,
+    RECORD_FIELDS,
+    PhotoRecord,
+    RecordLike,
+    record_to_row,
+)
 from src.utils.logger import getUniqueLogger
 
 logger = getUniqueLogger()
@@ -15,14 +24,37 @@ logger = getUniqueLogger()
 class SQLiteDB:
     """SQLite 資料庫管理類別"""
 
-    def __init__(self, db_path: str):
+    # 以文字格式儲存的日期時間欄位
+    DATETIME_FIELDS = (
+        "DateTimeOriginal",
+        "Date",
+        "Time",
+        "CreateDate",
+        "period_start",
+        "period_end",
+    )
+
+    INSERT_SQL = """
+    INSERT INTO file_record
+    (SourceFile, DateTimeOriginal, Date, Time, Site, Plot_ID, Camera_ID,
+     "Group", Species, Number, Note, IndependentPhoto, CreateDate,
+     period_start, period_end)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+
+    # 批次寫入時每次 executemany 的筆數
+    DEFAULT_CHUNK_SIZE = 10000
+
+    def __init__(self, db_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE):
         """
         初始化 SQLite DB
 
         Args:
             db_path: SQLite DB 檔案路徑
+            chunk_size: 批次寫入時每次 executemany 的筆數
         """
         self.db_path = db_path
+        self.chunk_size = max(1, chunk_size)
         self.connection = None
         self.cursor = None
         self.logger = logger
@@ -35,6 +67,11 @@ class SQLiteDB:
 
             self.connection = sqlite3.connect(self.db_path)
             self.cursor = self.connection.cursor()
+            # WAL 讓寫入只需附加到日誌，synchronous=NORMAL 在 WAL 下只於 checkpoint 時 fsync
+            self.cursor.execute("PRAGMA journal_mode=WAL")
+            self.cursor.execute("PRAGMA synchronous=NORMAL")
+            self.cursor.execute("PRAGMA temp_store=MEMORY")
+            self.cursor.execute("PRAGMA cache_size=-65536")
             self.logger.info(f"Connected to SQLite DB: {self.db_path}")
 
             # 確保資料表存在
@@ -47,6 +84,7 @@ class SQLiteDB:
     def _ensure_tables_exist(self):
         """確保所有需要的資料表都存在"""
         self._create_file_record_table()
+        self._create_processed_file_table()
 
     def _create_file_record_table(self):
         """建立 file_record 資料表"""
@@ -76,58 +114,291 @@ class SQLiteDB:
         except sqlite3.Error as e:
             self.logger.error(f"Failed to create file_record table: {str(e)}")
 
-    def insert_record(self, record: Dict):
+    def _create_processed_file_table(self):
+        """
+        建立 processed_file 資料表（增量處理用，記錄已匯入的檔案路徑）
+
+        在沒有 processed_file 的舊資料庫上建立時，file_record 只有檔名而沒有完整路徑，
+        將既有記錄的 (Camera_ID, SourceFile) 存入 legacy_import，增量處理時據此略過
+        """
+        create_table_sql = """
+        CREATE TABLE IF NOT EXISTS processed_file (
+            path TEXT PRIMARY KEY,
+            processed_at TEXT
+        )
+        """
+        try:
+            self.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                "AND name = 'processed_file'"
+            )
+            exists = self.cursor.fetchone() is not None
+            self.cursor.execute(create_table_sql)
+            self.cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS legacy_import (
+                    Camera_ID TEXT,
+                    SourceFile TEXT,
+                    UNIQUE (Camera_ID, SourceFile)
+                )
+                """
+            )
+            if not exists:
+                self.cursor.execute(
+                    "INSERT OR IGNORE INTO legacy_import (Camera_ID, SourceFile) "
+                    "SELECT DISTINCT Camera_ID, SourceFile FROM file_record"
+                )
+                if self.cursor.rowcount > 0:
+                    self.logger.info(
+                        f"Backfilled {self.cursor.rowcount} files imported "
+                        f"before incremental processing"
+                    )
+            self.connection.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to create processed_file table: {str(e)}")
+
+    def insert_record(self, record: RecordLike):
         """
         插入一筆記錄
 
         Args:
-            record: 記錄字典
+            record: PhotoRecord 或記錄字典
         """
         try:
-            sql = """
-            INSERT INTO file_record
-            (SourceFile, DateTimeOriginal, Date, Time, Site, Plot_ID, Camera_ID,
-             "Group", Species, Number, Note, IndependentPhoto, CreateDate,
-             period_start, period_end)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-
-            values = (
-                record.get("SourceFile"),
-                self._format_datetime(record.get("DateTimeOriginal")),
-                self._format_datetime(record.get("Date")),
-                self._format_datetime(record.get("Time")),
-                record.get("Site"),
-                record.get("Plot_ID"),
-                record.get("Camera_ID"),
-                record.get("Group"),
-                record.get("Species"),
-                record.get("Number", 1),
-                record.get("Note", ""),
-                record.get("IndependentPhoto", 0),
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                self._format_datetime(record.get("period_start")),
-                self._format_datetime(record.get("period_end")),
+            create_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            values = self._to_db_row(
+                record_to_row(record), create_date, self._cached_formatter()
             )
 
-            self.cursor.execute(sql, values)
+            self.cursor.execute(self.INSERT_SQL, values)
             self.connection.commit()
 
         except sqlite3.Error as e:
             self.logger.error(f"Failed to insert record: {str(e)}")
             raise
 
-    def insert_records_batch(self, records: List[Dict]):
+    def insert_records_batch(self, records: Iterable[RecordLike],
+                             chunk_size: Optional[int] = None):
         """
         批次插入多筆記錄
 
+        所有記錄在同一個交易中以 executemany 分段寫入，最後只 commit 一次；
+        任何一段失敗時整批 rollback
+
         Args:
             records: 記錄列表
+            chunk_size: 每次 executemany 的筆數，None 則使用 self.chunk_size
+        """
+        self.insert_rows((record_to_row(record) for record in records), chunk_size)
+
+    def insert_rows(self, rows: Iterable[Tuple], chunk_size: Optional[int] = None):
+        """
+        批次插入依 RECORD_FIELDS 順序排列的列（見 insert_records_batch）
+
+        Args:
+            rows: schema.record_to_row 格式的列
+            chunk_size: 每次 executemany 的筆數，None 則使用 self.chunk_size
+        """
+        chunk_size = max(1, chunk_size or self.chunk_size)
+        create_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        format_datetime = self._cached_formatter()
+        rows = (self._to_db_row(row, create_date, format_datetime) for row in rows)
+
+        start = time.perf_counter()
+        inserted = 0
+        try:
+            while True:
+                chunk = list(itertools.islice(rows, chunk_size))
+                if not chunk:
+                    break
+                self.cursor.executemany(self.INSERT_SQL, chunk)
+                inserted += len(chunk)
+            self.connection.commit()
+        except sqlite3.Error as e:
+            self.connection.rollback()
+            self.logger.error(f"Failed to insert records: {str(e)}")
+            raise
+
+        elapsed = time.perf_counter() - start
+        rate = f" ({inserted / elapsed:.0f} rows/s)" if elapsed > 0 and inserted else ""
+        self.logger.info(f"Inserted {inserted} records into SQLite{rate}")
+
+    # RECORD_FIELDS 中以文字儲存的日期時間欄位位置
+    _DATETIME_INDICES = (
+        RECORD_FIELDS.index("DateTimeOriginal"),
+        RECORD_FIELDS.index("Date"),
+        RECORD_FIELDS.index("Time"),
+        RECORD_FIELDS.index("period_start"),
+        RECORD_FIELDS.index("period_end"),
+    )
+
+    @classmethod
+    def _to_db_row(cls, row: Tuple, create_date: str,
+                   format_datetime: Callable) -> Tuple:
+        """將 RECORD_FIELDS 順序的列轉為 INSERT_SQL 的參數"""
+        values = list(row)
+        for i in cls._DATETIME_INDICES:
+            values[i] = format_datetime(values[i])
+        values.insert(CREATE_DATE_INDEX, create_date)
+        return tuple(values)
+
+    @classmethod
+    def _cached_formatter(cls) -> Callable:
+        """
+        返回會記住結果的 _format_datetime
+
+        同一筆記錄的 Date/Time 與 DateTimeOriginal 相同，period_start/period_end
+        則整個資料夾共用，記住結果可省去大部分的 strftime
+        """
+        cache = {}
+
+        def format_datetime(dt):
+            if dt is None:
+                return None
+            try:
+                return cache[dt]
+            except KeyError:
+                value = cache[dt] = cls._format_datetime(dt)
+                return value
+            except TypeError:
+                # 無法雜湊的值
+                return cls._format_datetime(dt)
+
+        return format_datetime
+
+    def get_processed_files(self) -> Set[str]:
+        """
+        取得已匯入的檔案路徑
+
+        Returns:
+            絕對路徑集合
+        """
+        try:
+            self.cursor.execute("SELECT path FROM processed_file")
+            return {row[0] for row in self.cursor.fetchall()}
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to read processed files: {str(e)}")
+            raise
+
+    def get_legacy_imports(self) -> Set[Tuple[Optional[str], str]]:
+        """
+        取得 processed_file 建立前已匯入的檔案
+
+        Returns:
+            (Camera_ID, 檔名) 集合
+        """
+        try:
+            self.cursor.execute("SELECT Camera_ID, SourceFile FROM legacy_import")
+            return set(self.cursor.fetchall())
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to read legacy imports: {str(e)}")
+            raise
+
+    def mark_files_processed(self, paths: Iterable[str]):
+        """
+        記錄已匯入的檔案路徑
+
+        Args:
+            paths: 檔案絕對路徑
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        try:
+            self.cursor.executemany(
+                "INSERT OR REPLACE INTO processed_file (path, processed_at) VALUES (?, ?)",
+                ((path, now) for path in paths),
+            )
+            self.connection.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to mark processed files: {str(e)}")
+            raise
+
+    def get_records_by_cameras(
+        self, camera_ids: Iterable[Optional[str]]
+    ) -> List[PhotoRecord]:
+        """
+        取得指定相機的所有記錄（日期時間欄位轉回 datetime）
+
+        Args:
+            camera_ids: Camera_ID 集合，可包含 None
+
+        Returns:
+            記錄列表，ID 為資料庫的記錄 ID
+        """
+        camera_ids = set(camera_ids)
+        records = []
+        try:
+            for camera_id in camera_ids:
+                if camera_id is None:
+                    self.cursor.execute(
+                        "SELECT * FROM file_record WHERE Camera_ID IS NULL ORDER BY ID"
+                    )
+                else:
+                    self.cursor.execute(
+                        "SELECT * FROM file_record WHERE Camera_ID = ? ORDER BY ID",
+                        (camera_id,),
+                    )
+                records.extend(self._rows_to_records(self.cursor))
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to read records: {str(e)}")
+            raise
+
+        return records
+
+    def get_all_records(self) -> List[PhotoRecord]:
+        """
+        取得所有記錄（日期時間欄位轉回 datetime），用於匯出 CSV/Excel
+
+        Returns:
+            記錄列表，與 PhotoProcessor 產生的記錄相同（CreateDate 不保留）
+        """
+        try:
+            self.cursor.execute("SELECT * FROM file_record ORDER BY ID")
+            return self._rows_to_records(self.cursor)
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to read records: {str(e)}")
+            raise
+
+    def update_derived_fields(self, records: List[PhotoRecord]):
         """
-        for record in records:
-            self.insert_record(record)
+        更新既有記錄的 IndependentPhoto 與 period_start/period_end
 
-        self.logger.info(f"Inserted {len(records)} records into SQLite")
+        Args:
+            records: 由資料庫讀回（ID 不為 None）的記錄列表
+        """
+        if not records:
+            return
+
+        format_datetime = self._cached_formatter()
+        try:
+            self.cursor.executemany(
+                "UPDATE file_record SET IndependentPhoto = ?, "
+                "period_start = ?, period_end = ? WHERE ID = ?",
+                (
+                    (
+                        record.IndependentPhoto,
+                        format_datetime(record.period_start),
+                        format_datetime(record.period_end),
+                        record.ID,
+                    )
+                    for record in records
+                ),
+            )
+            self.connection.commit()
+            self.logger.info(f"Updated {len(records)} existing records in SQLite")
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to update records: {str(e)}")
+            raise
+
+    def _rows_to_records(self, cursor) -> List[PhotoRecord]:
+        """將查詢結果轉為 PhotoRecord"""
+        columns = [desc[0] for desc in cursor.description]
+        records = []
+        for row in cursor.fetchall():
+            record = dict(zip(columns, row))
+            for field in self.DATETIME_FIELDS:
+                record[field] = self._parse_datetime(record.get(field))
+            records.append(PhotoRecord.from_dict(record))
+        return records
 
     def clear_table(self, table_name: str = "file_record"):
         """
@@ -139,6 +410,10 @@ class SQLiteDB:
         try:
             sql = f"DELETE FROM {table_name}"
             self.cursor.execute(sql)
+            if table_name == "file_record":
+                # 記錄清空後，已匯入的檔案也要重新匯入
+                self.cursor.execute("DELETE FROM processed_file")
+                self.cursor.execute("DELETE FROM legacy_import")
             self.connection.commit()
             self.logger.info(f"Cleared table: {table_name}")
         except sqlite3.Error as e:
@@ -169,3 +444,13 @@ class SQLiteDB:
         if isinstance(dt, datetime):
             return dt.strftime("%Y-%m-%d %H:%M:%S")
         return str(dt)
+
+    @staticmethod
+    def _parse_datetime(value) -> Optional[datetime]:
+        """將 _format_datetime 產生的字串轉回 datetime 物件"""
+        if value is None or isinstance(value, datetime):
+            return value
+        try:
+            return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            return None
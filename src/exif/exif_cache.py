@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+EXIF 資訊快取模組
+
+將 ExifReader.read_exif 的結果存入 SQLite，
+以 (絕對路徑, 檔案大小, mtime_ns) 判斷檔案是否變更，
+未變更的檔案再次處理時不需重新讀取 EXIF。
+"""
+import json
+import os
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from src.utils.logger import getUniqueLogger
+
+logger = getUniqueLogger()
+
+
+def _encode_value(value):
+    """JSON 無法直接表示 datetime，轉為帶標記的字典"""
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode_object(obj: Dict):
+    """還原 _encode_value 轉換的 datetime"""
+    if "__datetime__" in obj and len(obj) == 1:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+class ExifCache:
+    """EXIF 資訊快取"""
+
+    # 每累積多少筆寫入就 commit 一次，避免中斷時遺失過多快取
+    COMMIT_INTERVAL = 1000
+
+    def __init__(self, db_path: str, max_entries: int = 1000000, variant: str = ""):
+        """
+        初始化 EXIF 快取
+
+        Args:
+            db_path: 快取 SQLite 檔案路徑
+            max_entries: 最多保留的筆數，超過時淘汰最久未使用的項目
+            variant: 讀取方式識別字串，讀取方式不同的快取項目視為無效
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.variant = variant
+        self.connection = None
+        self.cursor = None
+        self.logger = logger
+
+        self.hits = 0
+        self.misses = 0
+        self._pending_writes = 0
+
+    def connect(self):
+        """連接快取資料庫"""
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+            self.connection = sqlite3.connect(self.db_path)
+            self.cursor = self.connection.cursor()
+            self.cursor.execute("PRAGMA journal_mode=WAL")
+            self.cursor.execute("PRAGMA synchronous=NORMAL")
+            self._create_table()
+            self.logger.info(f"Opened EXIF cache: {self.db_path}")
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to open EXIF cache: {str(e)}")
+            raise
+
+    def _create_table(self):
+        """建立快取資料表"""
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS exif_cache (
+                path TEXT PRIMARY KEY,
+                size INTEGER,
+                mtime_ns INTEGER,
+                variant TEXT,
+                data TEXT,
+                last_used INTEGER
+            )
+            """
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_exif_cache_last_used "
+            "ON exif_cache (last_used)"
+        )
+        self.connection.commit()
+
+    def get(self, file_path: str, stat: Optional[os.stat_result] = None) -> Optional[Dict]:
+        """
+        取得快取的 EXIF 資訊
+
+        Args:
+            file_path: 檔案路徑
+            stat: 已取得的 os.stat 結果，None 則在此取得
+
+        Returns:
+            快取的 exif_data，檔案不在快取中或已變更則返回 None
+        """
+        path = os.path.abspath(file_path)
+        try:
+            if stat is None:
+                stat = os.stat(path)
+            row = self.cursor.execute(
+                "SELECT size, mtime_ns, variant, data FROM exif_cache WHERE path = ?",
+                (path,),
+            ).fetchone()
+        except (OSError, sqlite3.Error) as e:
+            self.logger.debug(f"EXIF cache lookup failed for {path}: {str(e)}")
+            self.misses += 1
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        size, mtime_ns, variant, data = row
+        if size != stat.st_size or mtime_ns != stat.st_mtime_ns or variant != self.variant:
+            # 檔案已變更，移除過期的項目
+            self.cursor.execute("DELETE FROM exif_cache WHERE path = ?", (path,))
+            self.misses += 1
+            return None
+
+        self.cursor.execute(
+            "UPDATE exif_cache SET last_used = ? WHERE path = ?",
+            (time.time_ns(), path),
+        )
+        self.hits += 1
+
+        exif_data = json.loads(data, object_hook=_decode_object)
+        # 快取命中時不需讀取檔案
+        exif_data["BytesRead"] = 0
+        return exif_data
+
+    def put(self, file_path: str, exif_data: Dict, stat: Optional[os.stat_result] = None):
+        """
+        存入 EXIF 資訊
+
+        Args:
+            file_path: 檔案路徑
+            exif_data: read_exif 的結果，讀取失敗 (空字典或含 "Error") 的不快取，
+                下次重新讀取
+            stat: 已取得的 os.stat 結果，None 則在此取得
+        """
+        if not exif_data or "Error" in exif_data:
+            return
+
+        path = os.path.abspath(file_path)
+        try:
+            if stat is None:
+                stat = os.stat(path)
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO exif_cache "
+                "(path, size, mtime_ns, variant, data, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    path,
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                    self.variant,
+                    json.dumps(exif_data, default=_encode_value, ensure_ascii=False),
+                    time.time_ns(),
+                ),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= self.COMMIT_INTERVAL:
+                self.connection.commit()
+                self._pending_writes = 0
+        except (OSError, TypeError, sqlite3.Error) as e:
+            self.logger.debug(f"Failed to cache EXIF for {path}: {str(e)}")
+
+    def invalidate(self, file_path: str):
+        """移除指定檔案的快取"""
+        path = os.path.abspath(file_path)
+        self.cursor.execute("DELETE FROM exif_cache WHERE path = ?", (path,))
+        self.connection.commit()
+
+    def clear(self):
+        """清空快取"""
+        self.cursor.execute("DELETE FROM exif_cache")
+        self.connection.commit()
+        self.logger.info("Cleared EXIF cache")
+
+    def evict(self):
+        """超過 max_entries 時，淘汰最久未使用的項目"""
+        count = self.cursor.execute("SELECT COUNT(*) FROM exif_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+
+        self.cursor.execute(
+            "DELETE FROM exif_cache WHERE path IN "
+            "(SELECT path FROM exif_cache ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self.connection.commit()
+        self.logger.info(f"Evicted {excess} entries from EXIF cache")
+
+    def close(self):
+        """寫入變更、淘汰多餘項目並關閉連接"""
+        if self.connection:
+            try:
+                self.connection.commit()
+                self.evict()
+            except sqlite3.Error as e:
+                self.logger.error(f"Failed to flush EXIF cache: {str(e)}")
+        if self.cursor:
+            self.cursor.close()
+        if self.connection:
+            self.connection.close()
+        self.cursor = None
+        self.connection = None
+
+    def __enter__(self):
+        """支援 with 語句"""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """支援 with 語句"""
+        self.close()
@@ -2,18 +2,73 @@
 """
 EXIF 資訊讀取模組
 """
+import fnmatch
 import os
 import re
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
 
 import exifread
 
+from src.database.csv_reference import choose_reference_csv
+from src.exif.jpeg_header import CountingReader, read_jpeg_header
+from src.utils.datetime_parser import parse_exif_datetime
 from src.utils.logger import getUniqueLogger
 
 logger = getUniqueLogger()
 
 
+class ScanEntry(NamedTuple):
+    """掃描到的檔案"""
+
+    path: str
+    # os.scandir 的項目，stat 結果會快取（Windows 上掃描時已一併取得）
+    dir_entry: Optional[os.DirEntry] = None
+
+    def stat(self) -> Optional[os.stat_result]:
+        """檔案的 stat 結果（大小、修改時間），無法取得時返回 None"""
+        try:
+            if self.dir_entry is not None:
+                return self.dir_entry.stat()
+            return os.stat(self.path)
+        except OSError:
+            return None
+
+
+def _extension(name: str) -> str:
+    """小寫副檔名，與 os.path.splitext 相同（開頭的 . 不算副檔名）"""
+    stem = name.lstrip(".")
+    dot = stem.rfind(".")
+    return stem[dot:].lower() if dot > 0 else ""
+
+
+def _compile_patterns(patterns: Optional[Sequence[str]]) -> List[Tuple[bool, re.Pattern]]:
+    """
+    編譯 glob 樣式（不分大小寫）
+
+    含 / 的樣式比對相對於掃描根目錄的路徑，否則只比對名稱
+
+    Returns:
+        (是否比對路徑, 正規表示式) 列表
+    """
+    compiled = []
+    for pattern in patterns or ():
+        pattern = pattern.replace("\\", "/").strip("/")
+        if pattern:
+            compiled.append(
+                ("/" in pattern, re.compile(fnmatch.translate(pattern), re.IGNORECASE))
+            )
+    return compiled
+
+
+def _matches(patterns: List[Tuple[bool, re.Pattern]], name: str, rel_path: str) -> bool:
+    """名稱或相對路徑是否符合任一樣式"""
+    for match_path, regex in patterns:
+        if regex.match(rel_path if match_path else name):
+            return True
+    return False
+
+
 class ExifReader:
     """EXIF 資訊讀取器"""
 
@@ -21,13 +76,22 @@ class ExifReader:
     IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp"}
     # 支援的影片格式
     VIDEO_EXTENSIONS = {".avi", ".mov", ".mp4", ".mpg", ".mpeg"}
+    # 可使用標頭快速讀取的格式
+    JPEG_EXTENSIONS = {".jpg", ".jpeg"}
+
+    def __init__(self, fast_path: bool = True):
+        """
+        初始化 EXIF 讀取器
 
-    def __init__(self):
+        Args:
+            fast_path: JPEG 是否先嘗試只讀取標頭的快速路徑，失敗時才改用 exifread
+        """
         self.logger = logger
+        self.fast_path = fast_path
 
     def is_supported_file(self, file_path: str) -> bool:
         """檢查檔案是否為支援的格式"""
-        ext = os.path.splitext(file_path)[1].lower()
+        ext = _extension(os.path.basename(file_path))
         return ext in self.IMAGE_EXTENSIONS or ext in self.VIDEO_EXTENSIONS
 
     def read_exif(self, file_path: str) -> Dict:
@@ -38,7 +102,7 @@ class ExifReader:
             file_path: 檔案路徑
 
         Returns:
-            包含 EXIF 資訊的字典
+            包含 EXIF 資訊的字典；讀取失敗時含 "Error"（錯誤訊息），不應快取
         """
         if not os.path.exists(file_path):
             self.logger.error(f"File not found: {file_path}")
@@ -57,12 +121,30 @@ class ExifReader:
             "Group": None,
             "Species": None,
             "Number": 1,
+            "BytesRead": 0,
         }
 
+        # 快速路徑：只讀 JPEG 標頭的 APP1 EXIF / XMP
+        ext = os.path.splitext(file_path)[1].lower()
+        if self.fast_path and ext in self.JPEG_EXTENSIONS:
+            try:
+                header = read_jpeg_header(file_path)
+            except Exception as e:
+                self.logger.debug(f"Fast EXIF path failed for {file_path}: {str(e)}")
+                header = None
+
+            if header is not None:
+                self._apply_jpeg_header(header, exif_data)
+                return exif_data
+
+            self.logger.debug(f"Fast EXIF path unavailable, using exifread: {file_path}")
+
         try:
             # 使用 exifread 讀取更完整的 EXIF 資訊
             with open(file_path, "rb") as f:
-                tags = exifread.process_file(f, details=False)
+                counting_file = CountingReader(f)
+                tags = exifread.process_file(counting_file, details=False)
+                exif_data["BytesRead"] = counting_file.bytes_read
 
             # 提取日期時間
             datetime_original = self._extract_datetime(tags)
@@ -75,9 +157,28 @@ class ExifReader:
 
         except Exception as e:
             self.logger.error(f"Error reading EXIF from {file_path}: {str(e)}")
+            exif_data["Error"] = str(e)
 
         return exif_data
 
+    def _apply_jpeg_header(self, header: Dict, exif_data: Dict):
+        """將快速路徑讀到的標頭資訊填入 exif_data"""
+        exif_data["BytesRead"] = header["bytes_read"]
+
+        datetime_original = self._extract_datetime(header["tags"])
+        if datetime_original:
+            exif_data["DateTimeOriginal"] = datetime_original
+            exif_data["CreateDate"] = datetime_original
+
+        if header["Subject"]:
+            exif_data["Subject"] = ", ".join(header["Subject"])
+
+        if header["HierarchicalSubject"]:
+            # 與 HierarchicalSubject 字串格式相同，以 ", " 串接各項目
+            hierarchical_subject = ", ".join(header["HierarchicalSubject"])
+            exif_data["HierarchicalSubject"] = hierarchical_subject
+            self._parse_hierarchical_subject(hierarchical_subject, exif_data)
+
     def _extract_datetime(self, tags: Dict) -> Optional[datetime]:
         """提取日期時間資訊"""
         # 嘗試多個可能的日期時間標籤
@@ -90,14 +191,10 @@ class ExifReader:
 
         for tag_name in datetime_tags:
             if tag_name in tags:
-                try:
-                    dt_str = str(tags[tag_name])
-                    # 將 EXIF 格式轉換為標準格式
-                    # 格式: 2020:03:15 15:38:10
-                    dt = datetime.strptime(dt_str, "%Y:%m:%d %H:%M:%S")
+                # 格式: 2020:03:15 15:38:10
+                dt = parse_exif_datetime(str(tags[tag_name]))
+                if dt is not None:
                     return dt
-                except ValueError:
-                    continue
 
         return None
 
@@ -215,22 +312,105 @@ class ExifReader:
         except Exception as e:
             self.logger.warning(f"Error parsing HierarchicalSubject: {str(e)}")
 
-    def scan_directory(self, directory: str) -> List[str]:
+    def scan_directory(
+        self, directory: str, csv_references: Optional[Dict[str, str]] = None
+    ) -> List[str]:
         """
         掃描目錄下所有支援的多媒體檔案
 
         Args:
             directory: 目錄路徑
+            csv_references: 若提供，同時收集每個資料夾的時間參考 CSV
+                (資料夾 -> CSV 路徑)，見 choose_reference_csv
 
         Returns:
             檔案路徑列表
         """
-        files = []
-        for root, dirs, filenames in os.walk(directory):
-            for filename in filenames:
-                file_path = os.path.join(root, filename)
-                if self.is_supported_file(file_path):
-                    files.append(file_path)
-
-        self.logger.info(f"Found {len(files)} supported files in {directory}")
-        return files
+        on_csv_reference = None
+        if csv_references is not None:
+            on_csv_reference = csv_references.__setitem__
+        return [
+            entry.path
+            for entry in self.iter_directory(directory, on_csv_reference=on_csv_reference)
+        ]
+
+    def iter_directory(
+        self,
+        directory: str,
+        include: Optional[Sequence[str]] = None,
+        exclude: Optional[Sequence[str]] = None,
+        max_depth: Optional[int] = None,
+        on_csv_reference: Optional[Callable[[str, str], None]] = None,
+    ) -> Iterator[ScanEntry]:
+        """
+        以 os.scandir 逐一產生支援的多媒體檔案，找到第一個檔案即可開始處理
+
+        順序與 os.walk 相同：先產生資料夾中的檔案，再依序進入子資料夾；
+        副檔名直接由項目名稱判斷，不另外組合路徑或呼叫 stat。
+
+        Args:
+            directory: 目錄路徑
+            include: 只處理符合任一 glob 樣式的檔案（不分大小寫，含 / 時比對相對路徑）
+            exclude: 略過符合任一 glob 樣式的檔案與資料夾
+            max_depth: 最多進入幾層子資料夾，0 表示只掃描 directory 本身，None 不限制
+            on_csv_reference: 資料夾有時間參考 CSV 時呼叫 (資料夾, CSV 路徑)，
+                在產生該資料夾的檔案之前呼叫
+
+        Yields:
+            ScanEntry
+        """
+        include_patterns = _compile_patterns(include)
+        exclude_patterns = _compile_patterns(exclude)
+        supported = self.IMAGE_EXTENSIONS | self.VIDEO_EXTENSIONS
+
+        count = 0
+        # (資料夾, 相對路徑前綴, 深度)；子資料夾反向放入，取出時維持原本順序
+        stack = [(directory, "", 0)]
+        while stack:
+            folder, prefix, depth = stack.pop()
+            try:
+                with os.scandir(folder) as iterator:
+                    entries = list(iterator)
+            except OSError as e:
+                self.logger.warning(f"Cannot scan directory {folder}: {str(e)}")
+                continue
+
+            files = []
+            subdirs = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                (subdirs if is_dir else files).append(entry)
+
+            if on_csv_reference is not None:
+                csv_name = choose_reference_csv(folder, [entry.name for entry in files])
+                if csv_name:
+                    on_csv_reference(folder, os.path.join(folder, csv_name))
+
+            for entry in files:
+                name = entry.name
+                if _extension(name) not in supported:
+                    continue
+                if include_patterns and not _matches(
+                    include_patterns, name, prefix + name
+                ):
+                    continue
+                if exclude_patterns and _matches(exclude_patterns, name, prefix + name):
+                    continue
+                count += 1
+                yield ScanEntry(entry.path, entry)
+
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for entry in reversed(subdirs):
+                # 與 os.walk 相同，不進入符號連結的資料夾
+                if entry.is_symlink():
+                    continue
+                rel_path = prefix + entry.name
+                if exclude_patterns and _matches(exclude_patterns, entry.name, rel_path):
+                    continue
+                stack.append((entry.path, rel_path + "/", depth + 1))
+
+        self.logger.info(f"Found {count} supported files in {directory}")
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+JPEG 標頭快速讀取模組
+
+只解析 SOS (影像資料開始) 之前的 marker segments，並在取得所需的 APP1 後停止，
+從 APP1 EXIF 取得日期時間標籤、從 APP1 XMP 取得
+lr:hierarchicalSubject / dc:subject，不讀取影像資料本體。
+"""
+import html
+import re
+import struct
+from typing import Dict, List, Optional
+
+# APP1 segment 的識別字首
+EXIF_PREFIX = b"Exif\x00\x00"
+XMP_PREFIX = b"http://ns.adobe.com/xap/1.0/\x00"
+
+# 不帶長度欄位的 marker (TEM, RST0~RST7)
+_STANDALONE_MARKERS = {0x01} | set(range(0xD0, 0xD8))
+
+# TIFF 標籤
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_DATETIME_DIGITIZED = 0x9004
+
+# TIFF 型別 2 = ASCII
+_TYPE_ASCII = 2
+
+
+class CountingReader:
+    """包裝檔案物件並累計實際讀取的位元組數"""
+
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def read_exact(self, size: int) -> Optional[bytes]:
+        """讀取剛好 size 個位元組，檔案提前結束則返回 None"""
+        chunks = []
+        remaining = size
+        while remaining > 0:
+            chunk = self.read(remaining)
+            if not chunk:
+                return None
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b"".join(chunks)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def read_jpeg_header(file_path: str) -> Optional[Dict]:
+    """
+    讀取 JPEG 標頭中的日期時間與 XMP 標籤
+
+    Args:
+        file_path: 檔案路徑
+
+    Returns:
+        {
+            "tags": exifread 風格的日期時間標籤 (如 "EXIF DateTimeOriginal"),
+            "HierarchicalSubject": lr:hierarchicalSubject 項目列表,
+            "Subject": dc:subject 項目列表,
+            "bytes_read": 實際讀取的位元組數,
+        }
+        若不是 JPEG、結構損壞或找不到任何 EXIF/XMP segment，返回 None
+    """
+    # 不使用緩衝，讓 seek 跳過的資料真的不會被讀取
+    with open(file_path, "rb", buffering=0) as raw:
+        f = CountingReader(raw)
+        if f.read_exact(2) != b"\xff\xd8":
+            return None
+
+        exif_payload = None
+        xmp_payload = None
+
+        while True:
+            byte = f.read_exact(1)
+            if byte is None:
+                return None
+            if byte != b"\xff":
+                # marker 之間不應有其他資料
+                return None
+
+            # 略過填充用的 0xFF
+            marker = 0xFF
+            while marker == 0xFF:
+                byte = f.read_exact(1)
+                if byte is None:
+                    return None
+                marker = byte[0]
+
+            if marker in _STANDALONE_MARKERS:
+                continue
+            if marker in (0xDA, 0xD9):
+                # SOS / EOI：後面是影像資料，停止
+                break
+
+            length_bytes = f.read_exact(2)
+            if length_bytes is None:
+                return None
+            length = struct.unpack(">H", length_bytes)[0] - 2
+            if length < 0:
+                return None
+
+            if marker == 0xE1 and (exif_payload is None or xmp_payload is None):
+                payload = f.read_exact(length)
+                if payload is None:
+                    return None
+                if exif_payload is None and payload.startswith(EXIF_PREFIX):
+                    exif_payload = payload[len(EXIF_PREFIX):]
+                elif xmp_payload is None and payload.startswith(XMP_PREFIX):
+                    xmp_payload = payload[len(XMP_PREFIX):]
+                if exif_payload is not None and xmp_payload is not None:
+                    # 需要的 APP1 都已取得，不必再往後讀
+                    break
+            else:
+                f.seek(length, 1)
+
+        bytes_read = f.bytes_read
+
+    if exif_payload is None and xmp_payload is None:
+        return None
+
+    result = {
+        "tags": {},
+        "HierarchicalSubject": [],
+        "Subject": [],
+        "bytes_read": bytes_read,
+    }
+
+    if exif_payload is not None:
+        result["tags"] = _parse_tiff_datetimes(exif_payload)
+
+    if xmp_payload is not None:
+        xmp = xmp_payload.decode("utf-8", errors="replace")
+        result["HierarchicalSubject"] = _read_xmp_bag(xmp, "lr:hierarchicalSubject")
+        result["Subject"] = _read_xmp_bag(xmp, "dc:subject")
+
+    return result
+
+
+def _parse_tiff_datetimes(tiff: bytes) -> Dict[str, str]:
+    """
+    從 TIFF 結構讀取日期時間標籤
+
+    返回的 key 與 exifread 相同，方便沿用既有的解析邏輯
+    """
+    tags = {}
+    if len(tiff) < 8:
+        return tags
+
+    if tiff[:2] == b"II":
+        endian = "<"
+    elif tiff[:2] == b"MM":
+        endian = ">"
+    else:
+        return tags
+
+    ifd0_offset = struct.unpack(endian + "I", tiff[4:8])[0]
+    ifd0 = _read_ifd(tiff, ifd0_offset, endian)
+
+    if _TAG_DATETIME in ifd0:
+        value = _read_ascii(tiff, ifd0[_TAG_DATETIME], endian)
+        if value:
+            tags["Image DateTime"] = value
+
+    if _TAG_EXIF_IFD in ifd0:
+        _, _, exif_ifd_offset = ifd0[_TAG_EXIF_IFD]
+        exif_ifd = _read_ifd(tiff, exif_ifd_offset, endian)
+        for tag_id, tag_name in (
+            (_TAG_DATETIME_ORIGINAL, "EXIF DateTimeOriginal"),
+            (_TAG_DATETIME_DIGITIZED, "EXIF DateTimeDigitized"),
+        ):
+            if tag_id in exif_ifd:
+                value = _read_ascii(tiff, exif_ifd[tag_id], endian)
+                if value:
+                    tags[tag_name] = value
+
+    return tags
+
+
+def _read_ifd(tiff: bytes, offset: int, endian: str) -> Dict[int, tuple]:
+    """讀取一個 IFD，返回 tag -> (type, count, value/offset)"""
+    entries = {}
+    if offset + 2 > len(tiff):
+        return entries
+
+    count = struct.unpack(endian + "H", tiff[offset:offset + 2])[0]
+    pos = offset + 2
+    for _ in range(count):
+        if pos + 12 > len(tiff):
+            break
+        tag, typ, n, value = struct.unpack(endian + "HHII", tiff[pos:pos + 12])
+        entries[tag] = (typ, n, value)
+        pos += 12
+    return entries
+
+
+def _read_ascii(tiff: bytes, entry: tuple, endian: str) -> Optional[str]:
+    """讀取 ASCII 型別的標籤值"""
+    typ, count, value = entry
+    if typ != _TYPE_ASCII or count == 0:
+        return None
+
+    if count <= 4:
+        # 值直接存放在 entry 內
+        raw = struct.pack(endian + "I", value)[:count]
+    else:
+        if value + count > len(tiff):
+            return None
+        raw = tiff[value:value + count]
+
+    return raw.split(b"\x00", 1)[0].decode("ascii", errors="replace").strip()
+
+
+def _read_xmp_bag(xmp: str, element: str) -> List[str]:
+    """讀取 XMP 中指定元素 rdf:Bag 的所有 rdf:li 項目"""
+    match = re.search(
+        rf"<{re.escape(element)}\b[^>]*>(.*?)</{re.escape(element)}>", xmp, re.S
+    )
+    if not match:
+        return []
+
+    items = re.findall(r"<rdf:li\b[^>]*>(.*?)</rdf:li>", match.group(1), re.S)
+    return [html.unescape(item).strip() for item in items]
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 結果快取模組
+
+以影像內容的雜湊值為 key 儲存 OCR 辨識的文字與日期時間。
+JPEG 只雜湊影像資料（略過 APPn/COM 等 metadata segment），
+在 Adobe Bridge 等軟體修改標籤後，檔案 mtime 改變但影像不變，仍可命中快取。
+"""
+import hashlib
+import os
+import sqlite3
+import struct
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+from src.utils.logger import getUniqueLogger
+
+logger = getUniqueLogger()
+
+# 非 JPEG 檔案分段讀取的大小
+_CHUNK_SIZE = 1 << 20
+
+
+def image_content_hash(file_path: str) -> str:
+    """
+    計算影像內容的雜湊值
+
+    JPEG 略過 APP0~APP15 與 COM segment，只雜湊量化表、霍夫曼表、
+    影格資訊與影像資料；其他格式或結構無法解析時雜湊整個檔案
+
+    Args:
+        file_path: 檔案路徑
+
+    Returns:
+        blake2b 十六進位字串
+    """
+    with open(file_path, "rb") as f:
+        data = f.read(2)
+        if data == b"\xff\xd8":
+            digest = _jpeg_scan_hash(f)
+            if digest is not None:
+                return digest
+
+        h = hashlib.blake2b(digest_size=16)
+        f.seek(0)
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+            h.update(chunk)
+        return h.hexdigest()
+
+
+def _jpeg_scan_hash(f) -> Optional[str]:
+    """雜湊 JPEG 中影響像素的 segment 與 SOS 之後的資料，結構損壞返回 None"""
+    h = hashlib.blake2b(digest_size=16)
+    while True:
+        marker = f.read(2)
+        if len(marker) != 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        while code == 0xFF:
+            byte = f.read(1)
+            if not byte:
+                return None
+            code = byte[0]
+
+        if code == 0xD9:
+            break
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+
+        length_bytes = f.read(2)
+        if len(length_bytes) != 2:
+            return None
+        length = struct.unpack(">H", length_bytes)[0] - 2
+        if length < 0:
+            return None
+
+        if 0xE0 <= code <= 0xEF or code == 0xFE:
+            # metadata segment，不影響像素
+            f.seek(length, 1)
+            continue
+
+        h.update(bytes((0xFF, code)))
+        h.update(length_bytes)
+        h.update(f.read(length))
+
+        if code == 0xDA:
+            # SOS 之後為影像資料，直接雜湊到檔案結尾
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                h.update(chunk)
+            break
+
+    return h.hexdigest()
+
+
+class OCRCache:
+    """OCR 結果快取"""
+
+    # 每累積多少筆寫入就 commit 一次
+    COMMIT_INTERVAL = 100
+
+    def __init__(self, db_path: str, max_entries: int = 100000, variant: str = ""):
+        """
+        初始化 OCR 快取
+
+        Args:
+            db_path: 快取 SQLite 檔案路徑
+            max_entries: 最多保留的筆數，超過時淘汰最久未使用的項目
+            variant: OCR 設定識別字串 (引擎、辨識區域)，設定不同的結果視為無效
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.variant = variant
+        self.connection = None
+        self.cursor = None
+        self.logger = logger
+
+        self.hits = 0
+        self.misses = 0
+        self._pending_writes = 0
+
+    def connect(self):
+        """連接快取資料庫"""
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+            self.connection = sqlite3.connect(self.db_path)
+            self.cursor = self.connection.cursor()
+            self.cursor.execute("PRAGMA journal_mode=WAL")
+            self.cursor.execute("PRAGMA synchronous=NORMAL")
+            self._create_table()
+            self.logger.info(f"Opened OCR cache: {self.db_path}")
+
+        except sqlite3.Error as e:
+            self.logger.error(f"Failed to open OCR cache: {str(e)}")
+            raise
+
+    def _create_table(self):
+        """建立快取資料表"""
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                content_hash TEXT,
+                variant TEXT,
+                text TEXT,
+                datetime TEXT,
+                last_used INTEGER,
+                PRIMARY KEY (content_hash, variant)
+            )
+            """
+        )
+        self.cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_ocr_cache_last_used "
+            "ON ocr_cache (last_used)"
+        )
+        self.connection.commit()
+
+    @property
+    def hit_rate(self) -> float:
+        """命中率 (0~1)"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, content_hash: str) -> Optional[Tuple[Optional[str], Optional[datetime]]]:
+        """
+        取得快取的 OCR 結果
+
+        Args:
+            content_hash: image_content_hash 的結果
+
+        Returns:
+            (辨識文字, 日期時間)，日期時間可能為 None (曾辨識失敗)；
+            不在快取中則返回 None
+        """
+        try:
+            row = self.cursor.execute(
+                "SELECT text, datetime FROM ocr_cache "
+                "WHERE content_hash = ? AND variant = ?",
+                (content_hash, self.variant),
+            ).fetchone()
+        except sqlite3.Error as e:
+            self.logger.debug(f"OCR cache lookup failed: {str(e)}")
+            self.misses += 1
+            return None
+
+        if row is None:
+            self.misses += 1
+            return None
+
+        self.cursor.execute(
+            "UPDATE ocr_cache SET last_used = ? WHERE content_hash = ? AND variant = ?",
+            (time.time_ns(), content_hash, self.variant),
+        )
+        self.hits += 1
+
+        text, dt = row
+        return text, datetime.fromisoformat(dt) if dt else None
+
+    def put(self, content_hash: str, text: Optional[str], dt: Optional[datetime]):
+        """
+        存入 OCR 結果
+
+        Args:
+            content_hash: image_content_hash 的結果
+            text: 辨識到的文字
+            dt: 解析出的日期時間，辨識失敗為 None
+        """
+        try:
+            self.cursor.execute(
+                "INSERT OR REPLACE INTO ocr_cache "
+                "(content_hash, variant, text, datetime, last_used) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    content_hash,
+                    self.variant,
+                    text,
+                    dt.isoformat() if dt else None,
+                    time.time_ns(),
+                ),
+            )
+            self._pending_writes += 1
+            if self._pending_writes >= self.COMMIT_INTERVAL:
+                self.connection.commit()
+                self._pending_writes = 0
+        except sqlite3.Error as e:
+            self.logger.debug(f"Failed to cache OCR result: {str(e)}")
+
+    def clear(self):
+        """清空快取"""
+        self.cursor.execute("DELETE FROM ocr_cache")
+        self.connection.commit()
+        self.logger.info("Cleared OCR cache")
+
+    def evict(self):
+        """超過 max_entries 時，淘汰最久未使用的項目"""
+        count = self.cursor.execute("SELECT COUNT(*) FROM ocr_cache").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+
+        self.cursor.execute(
+            "DELETE FROM ocr_cache WHERE rowid IN "
+            "(SELECT rowid FROM ocr_cache ORDER BY last_used ASC LIMIT ?)",
+            (excess,),
+        )
+        self.connection.commit()
+        self.logger.info(f"Evicted {excess} entries from OCR cache")
+
+    def close(self):
+        """寫入變更、淘汰多餘項目並關閉連接"""
+        if self.connection:
+            try:
+                self.connection.commit()
+                self.evict()
+            except sqlite3.Error as e:
+                self.logger.error(f"Failed to flush OCR cache: {str(e)}")
+        if self.cursor:
+            self.cursor.close()
+        if self.connection:
+            self.connection.close()
+        self.cursor = None
+        self.connection = None
+
+    def __enter__(self):
+        """支援 with 語句"""
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        """支援 with 語句"""
+        self.close()
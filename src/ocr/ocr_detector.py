@@ -4,36 +4,115 @@ OCR 日期偵測模組
 預設使用 EasyOCR，備用 Tesseract
 """
 import re
+import threading
+import time
 from datetime import datetime
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 from src.utils.logger import getUniqueLogger
 
 logger = getUniqueLogger()
 
+# 以比例表示的區域 (left, top, right, bottom)，數值介於 0~1
+Box = Tuple[float, float, float, float]
+
 
 class OCRDetector:
     """OCR 日期偵測器"""
 
-    def __init__(self, engine: str = "easyocr"):
+    # 辨識區域模式：auto 會依序嘗試下緣與上緣的日期帶
+    ROI_MODES = ("auto", "bottom", "top", "full")
+
+    def __init__(self, engine: str = "easyocr", roi_mode: str = "auto",
+                 band_fraction: float = 0.15, max_width: int = 1280,
+                 lazy: bool = True):
         """
         初始化 OCR 偵測器
 
         Args:
             engine: OCR 引擎，可選 'easyocr' 或 'tesseract'
+            roi_mode: 辨識區域，'auto' / 'bottom' / 'top' / 'full'
+                自動相機的日期戳記通常印在畫面上緣或下緣的窄帶內，
+                只辨識該區域可大幅縮短辨識時間，失敗時會改用整張圖片
+            band_fraction: 日期帶佔圖片高度的比例
+            max_width: 辨識前將區域縮小到的最大寬度，0 表示不縮小
+            lazy: 第一次需要 OCR 時才載入引擎 (EasyOCR 需載入 torch 與模型，
+                耗時數秒並佔用大量記憶體)，False 則立即載入
         """
         self.engine = engine.lower()
         self.logger = logger
-        self.ocr = None
-
-        if self.engine == "easyocr":
-            self._init_easyocr()
-        elif self.engine == "tesseract":
-            self._init_tesseract()
-        else:
+        self._ocr = None
+        self._initialized = False
+        self._init_lock = threading.Lock()
+        self._prewarm_thread = None
+
+        if roi_mode not in self.ROI_MODES:
+            self.logger.warning(f"Unknown OCR ROI mode: {roi_mode}, using auto")
+            roi_mode = "auto"
+        self.roi_mode = roi_mode
+        self.band_fraction = min(max(band_fraction, 0.01), 1.0)
+        self.max_width = max_width
+        # auto 模式下最近一次成功的日期帶，下次優先嘗試
+        self._preferred_band = "bottom"
+        # 各群組 (Camera_ID 或資料夾) 已知的日期文字框位置
+        self._learned_regions: Dict[str, List[Box]] = {}
+        self.learned_region_hits = 0
+        self.learned_region_misses = 0
+        # 每張圖片最後一次辨識到的文字（供 OCR 快取保存）
+        self.detected_texts: Dict[str, str] = {}
+
+        if self.engine not in ("easyocr", "tesseract"):
             self.logger.warning(f"Unknown OCR engine: {engine}, using easyocr")
             self.engine = "easyocr"
-            self._init_easyocr()
+
+        if not lazy:
+            self.ensure_initialized()
+
+    @property
+    def ocr(self):
+        """OCR 引擎，第一次存取時載入"""
+        if not self._initialized:
+            self.ensure_initialized()
+        return self._ocr
+
+    @ocr.setter
+    def ocr(self, value):
+        self._ocr = value
+        self._initialized = True
+
+    @property
+    def initialized(self) -> bool:
+        """引擎是否已載入（或已嘗試載入）"""
+        return self._initialized
+
+    def ensure_initialized(self):
+        """載入 OCR 引擎，已載入則直接返回；多執行緒同時呼叫時只會載入一次"""
+        with self._init_lock:
+            if self._initialized:
+                return self._ocr
+
+            start = time.perf_counter()
+            if self.engine == "easyocr":
+                self._init_easyocr()
+            else:
+                self._init_tesseract()
+            self._initialized = True
+            self.logger.info(
+                f"OCR engine {self.engine} loaded in "
+                f"{time.perf_counter() - start:.1f}s"
+            )
+        return self._ocr
+
+    def prewarm(self):
+        """在背景執行緒載入 OCR 引擎，讓載入與其餘檔案的處理同時進行"""
+        if self._initialized or self._prewarm_thread is not None:
+            return
+
+        self.logger.info(f"Pre-warming OCR engine {self.engine} in background")
+        self._prewarm_thread = threading.Thread(
+            target=self.ensure_initialized, name="ocr-prewarm", daemon=True
+        )
+        self._prewarm_thread.start()
 
     def _init_easyocr(self):
         """初始化 EasyOCR"""
@@ -72,12 +151,16 @@ class OCRDetector:
             self.logger.error(f"Failed to initialize Tesseract: {str(e)}")
             self.ocr = None
 
-    def detect_datetime_from_image(self, image_path: str) -> Optional[datetime]:
+    def detect_datetime_from_image(
+        self, image_path: str, region_key: Optional[str] = None
+    ) -> Optional[datetime]:
         """
         從圖片中偵測日期時間
 
         Args:
             image_path: 圖片路徑
+            region_key: 日期戳記位置相同的群組 (如 Camera_ID 或資料夾)，
+                同一群組成功偵測後會記住日期位置，之後只辨識該位置
 
         Returns:
             偵測到的日期時間，若失敗則返回 None
@@ -88,7 +171,7 @@ class OCRDetector:
 
         try:
             if self.engine == "easyocr":
-                return self._detect_with_easyocr(image_path)
+                return self._detect_with_easyocr(image_path, region_key)
             elif self.engine == "tesseract":
                 return self._detect_with_tesseract(image_path)
         except Exception as e:
@@ -97,44 +180,417 @@ class OCRDetector:
 
         return None
 
-    def _detect_with_easyocr(self, image_path: str) -> Optional[datetime]:
-        """使用 EasyOCR 偵測日期時間"""
-        try:
-            result = self.ocr.readtext(image_path)
+    def _candidate_bands(self) -> List[str]:
+        """依設定決定要嘗試的日期帶順序"""
+        if self.roi_mode == "full":
+            return []
+        if self.roi_mode in ("top", "bottom"):
+            return [self.roi_mode]
+        other = "top" if self._preferred_band == "bottom" else "bottom"
+        return [self._preferred_band, other]
+
+    def _band_box(self, band: str) -> Box:
+        """日期帶以比例表示的範圍 (left, top, right, bottom)"""
+        if band == "top":
+            return (0.0, 0.0, 1.0, self.band_fraction)
+        return (0.0, 1.0 - self.band_fraction, 1.0, 1.0)
+
+    def _load_crop(self, image_path: str, box: Box):
+        """
+        讀取圖片中的指定區域並縮小
+
+        整張圖片寬度會縮到 max_width，不論裁切哪個區域，文字大小都一致
 
-            if not result:
+        Args:
+            image_path: 圖片路徑
+            box: 以比例表示的區域 (left, top, right, bottom)
+
+        Returns:
+            灰階 PIL 圖片
+        """
+        from PIL import Image
+
+        with Image.open(image_path) as img:
+            width, height = img.size
+            scale = 1.0
+            if self.max_width and width > self.max_width:
+                scale = self.max_width / width
+                # JPEG 可在解碼時直接以 1/2、1/4、1/8 縮小，省下大部分解碼時間
+                img.draft("L", (int(width * scale), int(height * scale)))
+                scale = self.max_width / img.size[0]
+                width, height = img.size
+
+            left, top, right, bottom = box
+            x0, y0 = int(left * width), int(top * height)
+            x1 = max(int(right * width), x0 + 1)
+            y1 = max(int(bottom * height), y0 + 1)
+            region = img.crop((x0, y0, x1, y1)).convert("L")
+
+        if scale < 1.0:
+            region = region.resize(
+                (max(1, int(region.width * scale)), max(1, int(region.height * scale))),
+                Image.BILINEAR,
+            )
+        return region
+
+    def _load_band(self, image_path: str, band: str):
+        """讀取圖片的日期帶區域並縮小 ('top' 或 'bottom')，返回灰階 PIL 圖片"""
+        return self._load_crop(image_path, self._band_box(band))
+
+    def _detect_in_bands(
+        self, image_path: str, recognize, region_key: Optional[str] = None
+    ) -> Optional[datetime]:
+        """
+        依序在各日期帶中辨識，成功即返回
+
+        Args:
+            image_path: 圖片路徑
+            recognize: 接收 PIL 圖片並返回 [(文字框, 文字, ...)] 的函式，
+                文字框為 None 表示引擎不提供位置
+            region_key: 成功時記住日期位置的群組
+        """
+        for band in self._candidate_bands():
+            try:
+                region = self._load_band(image_path, band)
+                results = recognize(region)
+            except Exception as e:
+                self.logger.debug(f"OCR on {band} band of {image_path} failed: {str(e)}")
                 return None
 
-            # 收集所有識別到的文字
-            text_lines = [item[1] for item in result]
+            text = self._results_text(results)
+            self.detected_texts[image_path] = text
+            self.logger.debug(f"OCR {band} band text: {text}")
+            detected_dt = self._parse_datetime_from_text(text)
+            if detected_dt:
+                self._preferred_band = band
+                self._learn_region(region_key, results, self._band_box(band), region.size)
+                self.logger.info(f"OCR detected datetime in {band} band: {detected_dt}")
+                return detected_dt
 
-            # 合併文字並嘗試解析日期
-            full_text = " ".join(text_lines)
-            self.logger.debug(f"OCR detected text: {full_text}")
+        return None
 
-            detected_dt = self._parse_datetime_from_text(full_text)
+    def _detect_with_easyocr(
+        self, image_path: str, region_key: Optional[str] = None
+    ) -> Optional[datetime]:
+        """使用 EasyOCR 偵測日期時間"""
+        try:
+            # 已知日期位置時只做文字辨識，省去文字偵測
+            detected_dt = self._recognize_learned_region(image_path, region_key)
+            if detected_dt:
+                return detected_dt
 
+            # 先只辨識日期帶，失敗再辨識整張圖片
+            detected_dt = self._detect_in_bands(
+                image_path, self._easyocr_results, region_key
+            )
             if detected_dt:
-                self.logger.info(f"OCR detected datetime: {detected_dt}")
-            else:
-                self.logger.warning(
-                    f"Could not parse datetime from OCR text: {full_text}"
-                )
+                return detected_dt
 
-            return detected_dt
+            return self._easyocr_full_frame(image_path, region_key)
 
         except Exception as e:
             self.logger.error(f"EasyOCR detection error: {str(e)}")
             return None
 
+    def _easyocr_full_frame(
+        self, image_path: str, region_key: Optional[str] = None
+    ) -> Optional[datetime]:
+        """以 EasyOCR 辨識整張圖片"""
+        result = self.ocr.readtext(image_path)
+
+        if not result:
+            return None
+
+        # 合併文字並嘗試解析日期
+        full_text = self._results_text(result)
+        self.detected_texts[image_path] = full_text
+        self.logger.debug(f"OCR detected text: {full_text}")
+
+        detected_dt = self._parse_datetime_from_text(full_text)
+
+        if detected_dt:
+            self.logger.info(f"OCR detected datetime: {detected_dt}")
+            if region_key is not None:
+                from PIL import Image
+
+                with Image.open(image_path) as img:
+                    image_size = img.size
+                self._learn_region(region_key, result, (0.0, 0.0, 1.0, 1.0), image_size)
+        else:
+            self.logger.warning(
+                f"Could not parse datetime from OCR text: {full_text}"
+            )
+
+        return detected_dt
+
+    def detect_datetimes_batch(
+        self,
+        image_paths: List[str],
+        batch_size: int = 8,
+        region_keys: Optional[List[Optional[str]]] = None,
+    ) -> List[Optional[datetime]]:
+        """
+        批次偵測多張圖片的日期時間
+
+        EasyOCR 會先以已記住的日期位置做純文字辨識，其餘圖片的日期帶
+        一起送進模型 (readtext_batched)，日期帶辨識失敗的圖片再逐張辨識
+        整張圖片；Tesseract 則逐張處理。
+
+        Args:
+            image_paths: 圖片路徑列表
+            batch_size: 每批圖片數，依 GPU VRAM 調整
+            region_keys: 每張圖片的日期位置群組 (如 Camera_ID)，None 表示不記憶
+
+        Returns:
+            與 image_paths 順序相同的日期時間列表，失敗者為 None
+        """
+        results = [None] * len(image_paths)
+        if region_keys is None:
+            region_keys = [None] * len(image_paths)
+
+        if self.ocr is None:
+            self.logger.error("OCR engine not initialized")
+            return results
+
+        if self.engine != "easyocr":
+            return [self.detect_datetime_from_image(path) for path in image_paths]
+
+        batch_size = max(1, batch_size)
+        for start in range(0, len(image_paths), batch_size):
+            pending = []
+            for i in range(start, min(start + batch_size, len(image_paths))):
+                try:
+                    results[i] = self._recognize_learned_region(
+                        image_paths[i], region_keys[i]
+                    )
+                except Exception as e:
+                    self.logger.debug(f"Learned region OCR failed: {str(e)}")
+                if results[i] is None:
+                    pending.append(i)
+
+            for band in self._candidate_bands():
+                if not pending:
+                    break
+                band_results = self._easyocr_batch_results(
+                    [image_paths[i] for i in pending], band, batch_size
+                )
+                failed = []
+                for i, (ocr_results, region_size) in zip(pending, band_results):
+                    text = self._results_text(ocr_results)
+                    self.detected_texts[image_paths[i]] = text
+                    detected_dt = self._parse_datetime_from_text(text) if text else None
+                    if detected_dt:
+                        self._preferred_band = band
+                        self._learn_region(
+                            region_keys[i], ocr_results, self._band_box(band), region_size
+                        )
+                        self.logger.info(
+                            f"OCR detected datetime in {band} band: {detected_dt}"
+                        )
+                        results[i] = detected_dt
+                    else:
+                        failed.append(i)
+                pending = failed
+
+            # 日期帶都失敗，改用整張圖片
+            for i in pending:
+                try:
+                    results[i] = self._easyocr_full_frame(image_paths[i], region_keys[i])
+                except Exception as e:
+                    self.logger.error(
+                        f"OCR detection failed for {image_paths[i]}: {str(e)}"
+                    )
+
+        return results
+
+    def _easyocr_batch_results(
+        self, image_paths: List[str], band: str, batch_size: int
+    ) -> List[Tuple[list, Tuple[int, int]]]:
+        """
+        以 EasyOCR 批次辨識多張圖片的日期帶
+
+        Returns:
+            每張圖片的 (辨識結果, 日期帶圖片尺寸)，讀取失敗者結果為空列表
+        """
+        import numpy as np
+
+        outputs = [([], (0, 0))] * len(image_paths)
+        indices = []
+        arrays = []
+        for i, image_path in enumerate(image_paths):
+            try:
+                arrays.append(np.asarray(self._load_band(image_path, band)))
+                indices.append(i)
+            except Exception as e:
+                self.logger.debug(f"Failed to load {band} band of {image_path}: {str(e)}")
+
+        if not arrays:
+            return outputs
+
+        n_width = n_height = None
+        try:
+            if hasattr(self.ocr, "readtext_batched") and len(arrays) > 1:
+                # readtext_batched 需要同尺寸的圖片，尺寸不一時統一縮放
+                shapes = {arr.shape for arr in arrays}
+                if len(shapes) > 1:
+                    n_height = max(shape[0] for shape in shapes)
+                    n_width = max(shape[1] for shape in shapes)
+                batch_results = self.ocr.readtext_batched(
+                    arrays, n_width=n_width, n_height=n_height, batch_size=batch_size
+                )
+            else:
+                batch_results = [self.ocr.readtext(arr) for arr in arrays]
+        except Exception as e:
+            self.logger.warning(f"Batched OCR failed, falling back to single: {str(e)}")
+            n_width = n_height = None
+            batch_results = []
+            for arr in arrays:
+                try:
+                    batch_results.append(self.ocr.readtext(arr))
+                except Exception as single_error:
+                    self.logger.debug(f"OCR failed: {str(single_error)}")
+                    batch_results.append([])
+
+        for i, arr, result in zip(indices, arrays, batch_results):
+            # 文字框座標以送進模型時的尺寸為準
+            if n_width is not None:
+                region_size = (n_width, n_height)
+            else:
+                region_size = (arr.shape[1], arr.shape[0])
+            outputs[i] = (result, region_size)
+            self.logger.debug(f"OCR {band} band text: {self._results_text(result)}")
+
+        return outputs
+
+    def _easyocr_results(self, region) -> list:
+        """以 EasyOCR 辨識 PIL 圖片"""
+        import numpy as np
+
+        return self.ocr.readtext(np.asarray(region))
+
+    @staticmethod
+    def _results_text(results) -> str:
+        """合併辨識結果的文字"""
+        return " ".join(item[1] for item in results)
+
+    def _learn_region(
+        self, region_key: Optional[str], results, crop_box: Box,
+        region_size: Tuple[int, int],
+    ):
+        """
+        記住日期戳記的位置
+
+        將含有數字的文字框換算為整張圖片的比例座標，供同群組的後續圖片使用
+
+        Args:
+            region_key: 群組 (如 Camera_ID)，None 表示不記憶
+            results: 辨識結果 [(文字框四點座標, 文字, 信心值)]
+            crop_box: 辨識區域在整張圖片中的比例範圍
+            region_size: 辨識區域的像素尺寸 (寬, 高)
+        """
+        if region_key is None or self.engine != "easyocr":
+            return
+
+        left, top, right, bottom = crop_box
+        region_width, region_height = region_size
+        if region_width <= 0 or region_height <= 0:
+            return
+
+        boxes = []
+        for item in results:
+            points, text = item[0], item[1]
+            if points is None or not re.search(r"\d", text):
+                continue
+            xs = [point[0] for point in points]
+            ys = [point[1] for point in points]
+            boxes.append(
+                (
+                    left + min(xs) / region_width * (right - left),
+                    top + min(ys) / region_height * (bottom - top),
+                    left + max(xs) / region_width * (right - left),
+                    top + max(ys) / region_height * (bottom - top),
+                )
+            )
+
+        if boxes:
+            # 由上而下、由左而右，讓日期排在時間之前
+            boxes.sort(key=lambda b: (round(b[1], 2), b[0]))
+            self._learned_regions[region_key] = boxes
+            self.logger.debug(f"Learned OCR region for {region_key}: {boxes}")
+
+    def _recognize_learned_region(
+        self, image_path: str, region_key: Optional[str]
+    ) -> Optional[datetime]:
+        """
+        以已記住的日期位置做純文字辨識（不做文字偵測）
+
+        Returns:
+            偵測到的日期時間；沒有記住位置或解析失敗則返回 None
+        """
+        boxes = self._learned_regions.get(region_key) if region_key is not None else None
+        if not boxes or self.engine != "easyocr":
+            return None
+
+        import numpy as np
+
+        # 所有文字框的聯集，上下左右留一些邊界
+        pad_y = max(b[3] - b[1] for b in boxes) * 0.5
+        pad_x = 0.01
+        union = (
+            max(0.0, min(b[0] for b in boxes) - pad_x),
+            max(0.0, min(b[1] for b in boxes) - pad_y),
+            min(1.0, max(b[2] for b in boxes) + pad_x),
+            min(1.0, max(b[3] for b in boxes) + pad_y),
+        )
+        region = self._load_crop(image_path, union)
+
+        # 文字框換算為裁切後圖片的像素座標 [x_min, x_max, y_min, y_max]
+        scale_x = region.width / (union[2] - union[0])
+        scale_y = region.height / (union[3] - union[1])
+        horizontal_list = [
+            [
+                int((b[0] - union[0]) * scale_x),
+                int((b[2] - union[0]) * scale_x) + 1,
+                int((b[1] - union[1]) * scale_y),
+                int((b[3] - union[1]) * scale_y) + 1,
+            ]
+            for b in boxes
+        ]
+
+        results = self.ocr.recognize(
+            np.asarray(region), horizontal_list=horizontal_list, free_list=[]
+        )
+        text = self._results_text(results)
+        self.detected_texts[image_path] = text
+        detected_dt = self._parse_datetime_from_text(text)
+
+        if detected_dt:
+            self.learned_region_hits += 1
+            self.logger.info(f"OCR detected datetime in learned region: {detected_dt}")
+        else:
+            self.learned_region_misses += 1
+            self.logger.debug(
+                f"Learned region OCR failed for {region_key}: {text}, "
+                f"falling back to detection"
+            )
+        return detected_dt
+
     def _detect_with_tesseract(self, image_path: str) -> Optional[datetime]:
         """使用 Tesseract 偵測日期時間"""
         try:
             import pytesseract
             from PIL import Image
 
+            # 先只辨識日期帶，失敗再辨識整張圖片
+            detected_dt = self._detect_in_bands(
+                image_path, lambda region: [(None, pytesseract.image_to_string(region))]
+            )
+            if detected_dt:
+                return detected_dt
+
             img = Image.open(image_path)
             text = pytesseract.image_to_string(img)
+            self.detected_texts[image_path] = text
 
             self.logger.debug(f"OCR detected text: {text}")
 
@@ -200,9 +656,12 @@ class OCRDetector:
     def switch_engine(self, engine: str):
         """切換 OCR 引擎"""
         if engine != self.engine:
-            self.engine = engine.lower()
-            if self.engine == "easyocr":
-                self._init_easyocr()
-            elif self.engine == "tesseract":
-                self._init_tesseract()
+            # 等待背景載入結束（不另外載入舊引擎），再改為新引擎並於下次使用時載入
+            if self._prewarm_thread is not None:
+                self._prewarm_thread.join()
+                self._prewarm_thread = None
+            with self._init_lock:
+                self.engine = engine.lower()
+                self._ocr = None
+                self._initialized = False
             self.logger.info(f"Switched OCR engine to: {self.engine}")
@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+記錄後處理模組
+
+所有記錄轉為欄位陣列後，依 (Camera_ID, Species, 時間) 只排序一次，再依序計算:
+1. 每台相機的時間範圍 (period_start/period_end)
+2. 同相機同物種的有效照片 (IndependentPhoto)
+3. 同一照片最多貢獻 1 張有效照片 (OI 上限)
+最後一次寫回記錄，不再為每個步驟建立各自的分組字典與排序。
+"""
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+import pandas as pd
+
+from src.database.schema import PhotoRecord
+from src.utils.logger import getUniqueLogger
+
+logger = getUniqueLogger()
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class _StepTimer:
+    """記錄各步驟耗時"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+        self._last = time.perf_counter()
+
+    def lap(self, step: str):
+        now = time.perf_counter()
+        self.timings[step] = now - self._last
+        self._last = now
+
+
+def postprocess_records(records: List[PhotoRecord], time_interval: float,
+                        oi_max_one: bool = True) -> Dict[str, float]:
+    """
+    計算時間範圍、有效照片與 OI 上限，直接更新記錄
+
+    Args:
+        records: 記錄列表（DateTimeOriginal 皆已決定）
+        time_interval: 有效照片的時間間隔（分鐘）
+        oi_max_one: 同一照片的多筆記錄最多只有一筆 IndependentPhoto=1
+
+    Returns:
+        各步驟耗時（秒）: columns, sort, periods, independence, oi_cap, write_back
+    """
+    timer = _StepTimer()
+    n = len(records)
+    if n == 0:
+        return timer.timings
+
+    # 1. 欄位陣列，編號依首次出現順序
+    cameras: Dict[Optional[str], int] = {}
+    species: Dict[Optional[str], int] = {}
+    camera_codes = np.fromiter(
+        (cameras.setdefault(record.Camera_ID, len(cameras)) for record in records),
+        dtype=np.int64,
+        count=n,
+    )
+    species_codes = np.fromiter(
+        (species.setdefault(record.Species, len(species)) for record in records),
+        dtype=np.int64,
+        count=n,
+    )
+    # pandas 轉換 datetime 物件比 np.array(..., dtype="datetime64") 快
+    times = (
+        pd.DatetimeIndex([record.DateTimeOriginal for record in records])
+        .as_unit("us")
+        .asi8
+    )
+    timer.lap("columns")
+
+    # 2. 依 (Camera_ID, Species, 時間) 排序，同組同時間維持原本順序；
+    # 先依時間穩定排序，再依群組編號穩定排序（小整數可使用 radix sort）
+    group_codes = camera_codes * len(species) + species_codes
+    order = np.argsort(times, kind="stable")
+    sorted_groups = group_codes[order].astype(
+        np.min_scalar_type(int(group_codes.max()))
+    )
+    order = order[np.argsort(sorted_groups, kind="stable")]
+    sorted_times = times[order]
+    sorted_cameras = camera_codes[order]
+    sorted_groups = group_codes[order]
+    del times, species_codes, group_codes
+    timer.lap("sort")
+
+    # 3. 每台相機的時間範圍，同相機的記錄在排序後相鄰
+    camera_starts = _segment_starts(sorted_cameras)
+    period_starts = np.minimum.reduceat(sorted_times, camera_starts).tolist()
+    period_ends = np.maximum.reduceat(sorted_times, camera_starts).tolist()
+    periods = [
+        (_to_datetime(start), _to_datetime(end))
+        for start, end in zip(period_starts, period_ends)
+    ]
+    for camera_id, (period_start, period_end) in zip(cameras, periods):
+        logger.info(f"Camera {camera_id} period: {period_start} ~ {period_end}")
+    del sorted_cameras
+    timer.lap("periods")
+
+    # 4. 有效照片
+    interval = timedelta(minutes=time_interval) // timedelta(microseconds=1)
+    group_starts = _segment_starts(sorted_groups)
+    flags = np.empty(n, dtype=np.int8)
+    flags[order] = independent_flags(sorted_times, group_starts, interval)
+    del order, sorted_times, sorted_groups
+    timer.lap("independence")
+
+    # 5. 同一照片 (SourceFile) 只保留第一筆有效照片
+    if oi_max_one:
+        _cap_oi_per_photo(records, flags)
+    timer.lap("oi_cap")
+
+    # 6. 寫回記錄
+    for record, flag, camera_code in zip(
+        records, flags.tolist(), camera_codes.tolist()
+    ):
+        record.IndependentPhoto = flag
+        record.period_start, record.period_end = periods[camera_code]
+    timer.lap("write_back")
+
+    return timer.timings
+
+
+def independent_flags(times: np.ndarray, starts: np.ndarray, interval: int) -> np.ndarray:
+    """
+    依時間間隔標記有效照片
+
+    每組第一張為有效照片，之後與上一張有效照片相隔達 interval 的才是有效照片
+
+    Args:
+        times: int64 時間，每組內已排序
+        starts: 每組的起始位置（第一個為 0）
+        interval: 時間間隔，與 times 相同單位
+
+    Returns:
+        與 times 順序相同的 0/1 陣列
+    """
+    n = len(times)
+    ends = np.r_[starts[1:], n]
+
+    # 每筆記錄之後，同組第一筆相隔達 interval 的位置
+    next_index = np.empty(n, dtype=np.int64)
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        group_times = times[start:end]
+        next_index[start:end] = start + np.searchsorted(
+            group_times, group_times + interval
+        )
+    # interval <= 0 時每張都是有效照片
+    np.maximum(next_index, np.arange(1, n + 1), out=next_index)
+    # memoryview 逐筆取值不需先建立 n 個 Python int
+    next_index = memoryview(next_index)
+
+    # 只走訪有效照片
+    marked = bytearray(n)
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        i = start
+        while i < end:
+            marked[i] = 1
+            i = next_index[i]
+
+    return np.frombuffer(marked, dtype=np.int8)
+
+
+def _cap_oi_per_photo(records: List[PhotoRecord], flags: np.ndarray):
+    """
+    限制同一張照片的 OI 貢獻最大值為 1
+
+    當一張有效照片包含多種動物（產生多筆記錄）時，
+    只保留第一筆 IndependentPhoto=1，其餘設為 0（直接修改 flags）
+    """
+    seen: Set[str] = set()
+    # 有多筆有效記錄的照片: 有效記錄數
+    capped: Dict[str, int] = {}
+    dropped = []
+    for i in np.flatnonzero(flags).tolist():
+        source_file = records[i].SourceFile
+        if source_file in seen:
+            dropped.append(i)
+            capped[source_file] = capped.get(source_file, 1) + 1
+        else:
+            seen.add(source_file)
+
+    flags[dropped] = 0
+    for source_file, count in capped.items():
+        logger.info(
+            f"{source_file}: {count} independent records found, capping OI to 1"
+        )
+
+
+def _segment_starts(sorted_codes: np.ndarray) -> np.ndarray:
+    """排序後每段相同編號的起始位置"""
+    return np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+
+
+def _to_datetime(microseconds: int) -> datetime:
+    """int64 微秒轉回 datetime"""
+    return _EPOCH + timedelta(microseconds=microseconds)
@@ -2,14 +2,35 @@
 """
 照片處理核心模組
 """
+import itertools
+import json
 import os
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+from src.database.checkpoint_journal import CheckpointJournal, FileResult
 from src.database.csv_excel_writer import CSVExcelWriter
-from src.exif.exif_reader import ExifReader
+from src.database.csv_reference import CSVDatetimeIndex
+from src.database.record_spool import PathSpool, RecordSpool
+from src.database.schema import PhotoRecord
+from src.exif.exif_cache import ExifCache
+from src.exif.exif_reader import ExifReader, ScanEntry
+from src.ocr.ocr_cache import OCRCache, image_content_hash
 from src.ocr.ocr_detector import OCRDetector
+from src.postprocess import postprocess_records
 from src.utils.logger import getUniqueLogger
+from src.utils.progress import (
+    STAGE_OCR,
+    STAGE_POSTPROCESS,
+    STAGE_PROCESS,
+    BackgroundCount,
+    CancelToken,
+    ProgressInfo,
+    ProgressReporter,
+)
 
 logger = getUniqueLogger()
 
@@ -17,8 +38,26 @@ logger = getUniqueLogger()
 class PhotoProcessor:
     """照片處理器"""
 
+    # 平行讀取時，每個 worker 預先排入的檔案數
+    PREFETCH_PER_WORKER = 4
+
     def __init__(self, time_interval: int = 30, ocr_engine: str = "easyocr",
-                 oi_max_one: bool = True):
+                 oi_max_one: bool = True, num_workers: int = 1,
+                 worker_mode: str = "thread", fast_exif: bool = True,
+                 exif_cache_path: Optional[str] = None,
+                 exif_cache_max_entries: int = 1000000,
+                 ocr_options: Optional[Dict] = None,
+                 ocr_batch_size: int = 8,
+                 ocr_prewarm: bool = True,
+                 ocr_cache_path: Optional[str] = None,
+                 ocr_cache_max_entries: int = 100000,
+                 stream_chunk_size: int = 10000,
+                 spool_dir: Optional[str] = None,
+                 scan_options: Optional[Dict] = None,
+                 checkpoint_path: Optional[str] = None,
+                 checkpoint_interval: int = 5000,
+                 progress_callback: Optional[Callable[[ProgressInfo], None]] = None,
+                 cancel_token: Optional[CancelToken] = None):
         """
         初始化處理器
 
@@ -26,112 +65,776 @@ class PhotoProcessor:
             time_interval: 時間間隔(分鐘)，用於計算有效照片數
             ocr_engine: OCR 引擎，可選 'easyocr' 或 'tesseract'
             oi_max_one: 同一照片多物種時，OI 貢獻是否限制最大值為 1
+            num_workers: 平行讀取 EXIF 的 worker 數，1 表示依序處理
+            worker_mode: worker 類型，'thread'（I/O 為主）或 'process'（解析為主）
+            fast_exif: JPEG 是否使用只讀標頭的快速 EXIF/XMP 讀取
+            exif_cache_path: EXIF 快取 SQLite 路徑，None 表示不使用快取
+            exif_cache_max_entries: EXIF 快取最多保留的筆數
+            ocr_options: 傳給 OCRDetector 的其他參數（如 roi_mode、band_fraction）
+            ocr_batch_size: 缺少日期的檔案累積後一次送進 OCR 的批次大小，
+                依 GPU VRAM 調整，VRAM 較小時設小一點
+            ocr_prewarm: 發現第一個缺少日期且 OCR 快取未命中的檔案時，是否立即在背景載入 OCR 引擎
+                （OCR 引擎只在需要時才載入，全部檔案都有日期時不會載入）
+            ocr_cache_path: OCR 結果快取 SQLite 路徑，None 表示不使用快取
+            ocr_cache_max_entries: OCR 快取最多保留的筆數
+            stream_chunk_size: 串流處理 (iter_process) 時每批 OCR 並寫入暫存檔的記錄數
+            spool_dir: 串流處理的暫存檔目錄，None 則使用系統暫存目錄
+            scan_options: 傳給 ExifReader.iter_directory 的掃描條件
+                （include、exclude、max_depth）
+            checkpoint_path: 檢查點 journal SQLite 路徑，None 表示不保存檢查點
+            checkpoint_interval: 每處理多少個檔案保存一次檢查點
+            progress_callback: 進度回報函式，接收 ProgressInfo（可能由其他執行緒呼叫）；
+                設定時會在背景計算檔案總數，完成前總數為 None
+            cancel_token: 取消旗標，每個檔案之間檢查，None 則建立一個（self.cancel_token）
         """
         self.time_interval = time_interval
         self.oi_max_one = oi_max_one
-        self.exif_reader = ExifReader()
-        self.ocr_detector = OCRDetector(ocr_engine)
+        self.num_workers = max(1, num_workers)
+        if worker_mode not in ("thread", "process"):
+            logger.warning(f"Unknown worker mode: {worker_mode}, using thread")
+            worker_mode = "thread"
+        self.worker_mode = worker_mode
+        self.exif_reader = ExifReader(fast_path=fast_exif)
+        self.scan_options = scan_options or {}
+        self.exif_cache_path = exif_cache_path
+        self.exif_cache_max_entries = exif_cache_max_entries
+        self.exif_cache_variant = "fast" if fast_exif else "exifread"
+        self.exif_cache = None
+        # shared_workers() 期間共用的 worker pool
+        self._executor = None
+        self.ocr_detector = OCRDetector(ocr_engine, **(ocr_options or {}))
+        self.ocr_batch_size = max(1, ocr_batch_size)
+        self.ocr_prewarm = ocr_prewarm
+        self.ocr_cache_path = ocr_cache_path
+        self.ocr_cache_max_entries = ocr_cache_max_entries
+        self.ocr_cache: Optional[OCRCache] = None
+        # 本次處理的 OCR 快取統計 (hits, misses)，未使用快取則為 None
+        self.ocr_cache_stats: Optional[Tuple[int, int]] = None
+        # 本次處理中缺少日期、排入 OCR 的檔案數
+        self.ocr_file_count = 0
+        # 最近一次後處理各步驟耗時（秒），見 postprocess_records
+        self.postprocess_timings: Dict[str, float] = {}
+        self.stream_chunk_size = max(1, stream_chunk_size)
+        self.spool_dir = spool_dir
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = max(1, checkpoint_interval)
+        # 處理中的檢查點 journal
+        self.checkpoint = None
+        # 由檢查點讀回的記錄，處理時先產生
+        self._restored_records: List[PhotoRecord] = []
+        self.progress = ProgressReporter(progress_callback)
+        self.cancel_token = cancel_token or CancelToken()
+        # 本次處理是否因取消而只處理了部分檔案
+        self.cancelled = False
+        # 本次要處理的檔案數，在背景計算（有 progress_callback 時才計算）
+        self._file_count: Optional[BackgroundCount] = None
+        # 本次讀取的 EXIF 位元組數
+        self.exif_bytes_read = 0
         self.csv_writer = CSVExcelWriter()
         self.logger = logger
 
         # 儲存處理過的資料
         self.records = []
         self.warnings = []
-
-    def process_directory(self, directory: str) -> List[Dict]:
+        # 本次實際處理的檔案絕對路徑（增量處理用，串流處理時為 PathSpool）
+        self.processed_files = []
+        # processed_file 建立前已匯入的 (Camera_ID, 檔名)，讀取 EXIF 後略過（增量處理用）
+        self._legacy_imports: Set[Tuple[Optional[str], str]] = set()
+
+    def process_directory(
+        self, directory: str, skip_files: Optional[Set[str]] = None,
+        resume: bool = False
+    ) -> List[PhotoRecord]:
         """
         處理目錄下的所有照片
 
         Args:
             directory: 目錄路徑
+            skip_files: 要略過的檔案絕對路徑（已匯入過的檔案）
+            resume: 是否由上次中斷的檢查點繼續（需設定 checkpoint_path）
 
         Returns:
             處理後的記錄列表
         """
+        entries, csv_index = self._scan_files(directory, skip_files, resume)
+
+        # 掃描的同時處理每個檔案，全部處理完才批次 OCR（只有一批）
+        file_records = []
+        for chunk in self._iter_record_chunks(entries, csv_index):
+            file_records.extend(chunk)
+
+        if not self.processed_files:
+            self.logger.warning(f"No new supported files found in {directory}")
+            return []
+
+        # 計算時間範圍、有效照片數，並限制同一照片的 OI 貢獻最大為 1
+        self.progress.report(STAGE_POSTPROCESS, 0, 1, force=True)
+        self._postprocess(file_records)
+        self.progress.report(STAGE_POSTPROCESS, 1, 1, force=True)
+
+        self.records = file_records
+        self._log_run_summary(len(file_records), len(self.processed_files))
+        return self.records
+
+    def iter_process(
+        self, directory: str, skip_files: Optional[Set[str]] = None,
+        resume: bool = False
+    ) -> Iterator[PhotoRecord]:
+        """
+        串流處理目錄下的所有照片，依檔案順序逐筆產生記錄
+
+        結果與 process_directory 相同，但不在記憶體中保留所有記錄：
+        1. 每累積 stream_chunk_size 筆記錄就批次 OCR，並寫入暫存 SQLite
+        2. 逐台相機讀回，計算時間範圍與有效照片
+        3. 在暫存檔中套用 OI 上限，依檔案順序逐筆讀出
+        記憶體用量取決於記錄最多的一台相機，self.records 不會保留記錄，
+        self.processed_files 也暫存於檔案（PathSpool）。
+
+        Args:
+            directory: 目錄路徑
+            skip_files: 要略過的檔案絕對路徑（已匯入過的檔案）
+            resume: 是否由上次中斷的檢查點繼續（需設定 checkpoint_path）
+
+        Yields:
+            處理後的記錄
+        """
+        entries, csv_index = self._scan_files(
+            directory, skip_files, resume, stream=True
+        )
+
+        with RecordSpool(self.spool_dir) as spool:
+            # 1. 處理檔案並暫存
+            for chunk in self._iter_record_chunks(
+                entries, csv_index, self.stream_chunk_size
+            ):
+                spool.append(chunk)
+
+            if not self.processed_files:
+                self.logger.warning(f"No new supported files found in {directory}")
+                return
+
+            # 2. 逐台相機計算時間範圍與有效照片（OI 上限需依檔案順序，留到讀出時）
+            timings: Dict[str, float] = {}
+            camera_ids = spool.camera_ids()
+            for i, camera_id in enumerate(camera_ids):
+                self.progress.report(STAGE_POSTPROCESS, i, len(camera_ids), force=True)
+                seqs, records = spool.camera_records(camera_id)
+                self._postprocess(records, oi_max_one=False)
+                for step, seconds in self.postprocess_timings.items():
+                    timings[step] = timings.get(step, 0.0) + seconds
+                spool.update_derived(seqs, records)
+                del seqs, records
+            self.progress.report(
+                STAGE_POSTPROCESS, len(camera_ids), len(camera_ids), force=True
+            )
+            self.postprocess_timings = timings
+
+            self._log_run_summary(len(spool), len(self.processed_files))
+
+            # 3. 套用 OI 上限後依檔案順序讀出
+            if self.oi_max_one:
+                spool.cap_independent_per_file()
+            yield from spool
+
+    def _scan_files(
+        self, directory: str, skip_files: Optional[Set[str]] = None,
+        resume: bool = False, stream: bool = False
+    ) -> Tuple[Iterator[ScanEntry], CSVDatetimeIndex]:
+        """
+        清空上一次的結果，開始掃描要處理的檔案
+
+        掃描與處理同時進行，資料夾的 CSV 時間參考檔在產生其檔案前就載入索引
+
+        Args:
+            directory: 目錄路徑
+            skip_files: 要略過的檔案絕對路徑
+            resume: 是否由檢查點繼續，檢查點中已完成的檔案也會略過
+            stream: 串流處理，processed_files 暫存於檔案而非記憶體
+
+        Returns:
+            (檔案產生器, CSV 時間參考索引)
+        """
         self.logger.info(f"Processing directory: {directory}")
 
         # 清空之前的資料
         self.records = []
         self.warnings = []
+        if isinstance(self.processed_files, PathSpool):
+            self.processed_files.close()
+        self.processed_files = PathSpool(self.spool_dir) if stream else []
+        self.ocr_cache_stats = None
+        self.ocr_file_count = 0
+        self.cancelled = False
+        self.progress.reset()
+
+        completed = self._open_checkpoint(directory, resume, skip_files)
+        self._file_count = None
+        if self.progress.enabled:
+            # 不等計數完成，找到第一個檔案就開始處理
+            self._file_count = self._count_files(
+                directory, (skip_files or set()) | completed
+            )
+            self._file_count.start()
 
-        # 掃描所有檔案
-        files = self.exif_reader.scan_directory(directory)
+        csv_index = CSVDatetimeIndex(directory)
 
-        if not files:
-            self.logger.warning(f"No supported files found in {directory}")
-            return []
+        def add_csv_reference(folder: str, csv_path: str):
+            self.logger.info(f"Using CSV reference file: {csv_path}")
+            csv_index.add(folder, self.csv_writer.read_csv_datetime(csv_path))
+
+        entries = self.exif_reader.iter_directory(
+            directory, on_csv_reference=add_csv_reference, **self.scan_options
+        )
+        return self._iter_new_files(entries, skip_files, completed), csv_index
 
-        # 尋找 CSV 時間參考檔案
-        csv_datetime_map = self._find_csv_datetime_reference(directory)
+    def _count_files(self, directory: str, skip_files: Set[str]) -> BackgroundCount:
+        """另外掃描一次計算要處理的檔案數（進度回報用，不讀取檔案內容）"""
 
-        # 處理每個檔案
-        file_records = []
-        for i, file_path in enumerate(files):
+        def new_files():
+            for entry in self.exif_reader.iter_directory(directory, **self.scan_options):
+                if not skip_files or os.path.abspath(entry.path) not in skip_files:
+                    yield entry
+
+        return BackgroundCount(new_files, self.cancel_token)
+
+    @property
+    def _total_files(self) -> Optional[int]:
+        """要處理的檔案數，背景計數尚未完成時為 None"""
+        return self._file_count.total if self._file_count else None
+
+    def _open_checkpoint(
+        self, directory: str, resume: bool, skip_files: Optional[Set[str]] = None
+    ) -> Set[str]:
+        """
+        開啟檢查點 journal，繼續時讀回已完成的檔案、記錄與警告
+
+        skip_files 中的檔案（增量處理時，停止前已寫入 SQLite 的檔案）
+        不會再讀回，避免同一檔案的記錄重複寫入
+
+        Returns:
+            檢查點中已完成的檔案絕對路徑（包含 skip_files 中的檔案）
+        """
+        self._restored_records = []
+        if not self.checkpoint_path:
+            if resume:
+                self.logger.warning("Checkpoint is disabled, cannot resume")
+            return set()
+
+        journal = CheckpointJournal(self.checkpoint_path)
+        try:
+            journal.connect()
+            restored = journal.start(directory, self._checkpoint_signature(), resume)
+            if restored:
+                results = journal.load()
+        except Exception as e:
+            self.logger.warning(f"Checkpoint disabled: {str(e)}")
+            journal.close()
+            return set()
+
+        self.checkpoint = journal
+        if not restored:
+            return set()
+
+        completed = {path for path, _, _ in results}
+        if skip_files:
+            results = [result for result in results if result[0] not in skip_files]
+            if len(results) < len(completed):
+                self.logger.info(
+                    f"{len(completed) - len(results)} checkpoint files were "
+                    f"already imported, not restored"
+                )
+        for path, records, warnings in results:
+            self.processed_files.append(path)
+            self._restored_records.extend(records)
+            self.warnings.extend(warnings)
+        self.logger.info(
+            f"Resuming from checkpoint: {len(self.processed_files)} files, "
+            f"{len(self._restored_records)} records already processed"
+        )
+        return completed
+
+    def _checkpoint_signature(self) -> str:
+        """影響單檔結果的設定，設定不同時不由檢查點繼續"""
+        return json.dumps(
+            {
+                # 未設定的掃描條件 (None、空列表) 視為相同
+                "scan": {
+                    key: value
+                    for key, value in self.scan_options.items()
+                    if value is not None and value != []
+                },
+                "exif": self.exif_cache_variant,
+                "ocr": self._ocr_variant(),
+            },
+            sort_keys=True,
+        )
+
+    def clear_checkpoint(self, directory: str):
+        """
+        刪除資料夾的檢查點
+
+        處理結果都寫入輸出後呼叫；輸出失敗時保留檢查點，resume 可直接重新輸出
+        """
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return
+        try:
+            with CheckpointJournal(self.checkpoint_path) as journal:
+                journal.clear(directory)
+        except Exception as e:
+            self.logger.warning(f"Failed to clear checkpoint: {str(e)}")
+
+    def _iter_new_files(
+        self, entries: Iterable[ScanEntry], skip_files: Optional[Set[str]],
+        completed: Optional[Set[str]] = None
+    ) -> Iterator[ScanEntry]:
+        """略過已匯入與檢查點中已完成的檔案，並將產生的檔案記錄於 self.processed_files"""
+        skipped = 0
+        for entry in entries:
+            path = os.path.abspath(entry.path)
+            if completed and path in completed:
+                continue
+            if skip_files and path in skip_files:
+                skipped += 1
+                continue
+            self.processed_files.append(path)
+            yield entry
+
+        if skip_files:
             self.logger.info(
-                f"Processing file {i+1}/{len(files)}: {os.path.basename(file_path)}"
+                f"Skipping {skipped} already imported files, "
+                f"{len(self.processed_files)} new files to process"
             )
 
-            result = self._process_single_file(
-                file_path, csv_datetime_map, file_records
+    def _iter_record_chunks(
+        self,
+        entries: Iterable[ScanEntry],
+        csv_index: CSVDatetimeIndex,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[List[PhotoRecord]]:
+        """
+        依檔案順序處理檔案，分批產生日期時間皆已決定的記錄
+
+        缺少日期的檔案先排入 OCR 佇列，累積 chunk_size 筆記錄後才批次 OCR
+        並補上前一筆記錄的時間，前一筆的時間會延續到下一批，結果與一次處理相同。
+        有檢查點時先產生由檢查點讀回的記錄，每處理 checkpoint_interval 個檔案
+        也結束一批，每批記錄保存到檢查點後才產生。
+
+        Args:
+            entries: 掃描到的檔案
+            csv_index: CSV 時間參考索引
+            chunk_size: 每批的記錄數，None 表示全部處理完才批次 OCR（只有一批）
+
+        Yields:
+            依檔案順序排列的記錄列表
+        """
+        try:
+            yield from self._iter_checkpointed_chunks(entries, csv_index, chunk_size)
+        finally:
+            if self._file_count:
+                self._file_count.stop()
+            self._close_ocr_cache()
+            if self.checkpoint:
+                self.checkpoint.close()
+                self.checkpoint = None
+
+    def _iter_checkpointed_chunks(
+        self,
+        entries: Iterable[ScanEntry],
+        csv_index: CSVDatetimeIndex,
+        chunk_size: Optional[int] = None,
+    ) -> Iterator[List[PhotoRecord]]:
+        """_iter_record_chunks 的實作"""
+        # 前一批最後一筆記錄的時間
+        previous_dt = None
+        if self._restored_records:
+            restored, self._restored_records = self._restored_records, []
+            previous_dt = restored[-1].DateTimeOriginal
+            yield restored
+
+        if self.num_workers > 1:
+            self.logger.info(
+                f"Reading EXIF with {self.num_workers} {self.worker_mode} workers"
             )
 
-            if result:
-                # result 現在是列表（可能包含多筆記錄）
-                file_records.extend(result)
+        # 開啟 EXIF 快取（SQLite 連線需在同一執行緒使用）
+        if self.exif_cache_path:
+            self.exif_cache = ExifCache(
+                self.exif_cache_path,
+                max_entries=self.exif_cache_max_entries,
+                variant=self.exif_cache_variant,
+            )
+            try:
+                self.exif_cache.connect()
+            except Exception as e:
+                self.logger.warning(f"EXIF cache disabled: {str(e)}")
+                self.exif_cache = None
+        self._open_ocr_cache()
 
-        # 計算每個資料夾的時間範圍
-        self._calculate_period_ranges(file_records, directory)
+        # 處理每個檔案（EXIF 可平行讀取，但仍依檔案順序處理）
+        file_records = []
+        # 缺少 CSV/EXIF 日期的檔案，延後批次 OCR:
+        # (檔案路徑, 該檔案的記錄, 影像雜湊, 快取的 OCR 結果)
+        ocr_queue = []
+        ocr_queued = 0
+        # 是否已有快取未命中、需要實際 OCR 的檔案
+        ocr_needed = False
+        # 這批處理的檔案（保存檢查點用）: (絕對路徑, 記錄, 警告)
+        chunk_files = []
+        self.exif_bytes_read = 0
+        file_count = 0
+        legacy_count = 0
+        # processed_files 中由檢查點讀回的檔案數
+        restored_files = len(self.processed_files)
+        self.progress.report(STAGE_PROCESS, 0, self._total_files, force=True)
+        try:
+            for file_path, exif_data in self._iter_exif_data(entries):
+                if self.cancel_token.cancelled:
+                    self.logger.warning(
+                        f"Processing cancelled after {file_count} files"
+                    )
+                    self.cancelled = True
+                    # 預先讀取但未處理的檔案不算已處理
+                    del self.processed_files[restored_files + file_count:]
+                    break
+                file_count += 1
+                self.logger.info(
+                    f"Processing file {file_count}: {os.path.basename(file_path)}"
+                )
+                self.exif_bytes_read += exif_data.get("BytesRead", 0)
 
-        # 計算有效照片數
-        self._calculate_independent_photos(file_records)
+                warning_count = len(self.warnings)
+                if self._is_legacy_import(file_path, exif_data):
+                    # 舊資料庫中已有記錄，只標記為已匯入
+                    legacy_count += 1
+                    result = None
+                else:
+                    result = self._process_single_file(
+                        file_path, csv_index, exif_data
+                    )
+                chunk_files.append((
+                    os.path.abspath(file_path),
+                    result or [],
+                    self.warnings[warning_count:],
+                ))
+
+                if result:
+                    # result 現在是列表（可能包含多筆記錄）
+                    file_records.extend(result)
+                    if result[0].DateTimeOriginal is None:
+                        content_hash, cached = self._lookup_ocr_cache(file_path)
+                        if cached is None and not ocr_needed:
+                            ocr_needed = True
+                            if self.ocr_prewarm:
+                                # 其餘檔案處理時同時載入 OCR 模型
+                                self.ocr_detector.prewarm()
+                        ocr_queue.append((file_path, result, content_hash, cached))
+                        ocr_queued += 1
+
+                self.progress.report(STAGE_PROCESS, file_count, self._total_files)
+
+                if (
+                    chunk_size and len(file_records) >= chunk_size
+                ) or (
+                    self.checkpoint and len(chunk_files) >= self.checkpoint_interval
+                ):
+                    previous_dt, resolved = self._resolve_deferred_datetimes(
+                        file_records, ocr_queue, previous_dt
+                    )
+                    if resolved < len(file_records):
+                        # OCR 途中取消，下一個檔案前停止
+                        file_count -= self._drop_unresolved(
+                            chunk_files, file_records, resolved
+                        )
+                        del self.processed_files[restored_files + file_count:]
+                    self._save_checkpoint(chunk_files)
+                    yield file_records
+                    file_records = []
+                    ocr_queue = []
+                    chunk_files = []
+        finally:
+            if self.exif_cache:
+                self.logger.info(
+                    f"EXIF cache: {self.exif_cache.hits} hits, "
+                    f"{self.exif_cache.misses} misses"
+                )
+                self.exif_cache.close()
+                self.exif_cache = None
 
-        # 限制同一照片的 OI 貢獻最大為 1
+        # 全部處理完（或停止）時的總數即為處理的檔案數
+        self.progress.report(STAGE_PROCESS, file_count, file_count, force=True)
+        self.ocr_file_count = ocr_queued
+        if legacy_count:
+            self.logger.info(
+                f"Skipped {legacy_count} files already in the database "
+                f"(imported before processed_file existed)"
+            )
+        if csv_index.folder_count:
+            self.logger.info(
+                f"Loaded {len(csv_index)} CSV datetime entries from "
+                f"{csv_index.folder_count} folders"
+            )
+            self.logger.info(
+                f"CSV datetime used for {csv_index.hits}/{file_count} files, "
+                f"{ocr_queued} files queued for OCR"
+            )
+
+        # 批次 OCR，並補上仍無法決定的日期時間
+        _, resolved = self._resolve_deferred_datetimes(
+            file_records, ocr_queue, previous_dt
+        )
+        if resolved < len(file_records):
+            file_count -= self._drop_unresolved(chunk_files, file_records, resolved)
+            del self.processed_files[restored_files + file_count:]
+        self._save_checkpoint(chunk_files)
+        if file_records:
+            yield file_records
+
+    def _drop_unresolved(
+        self, chunk_files: List[FileResult], file_records: List[PhotoRecord],
+        resolved: int
+    ) -> int:
+        """
+        OCR 途中取消時，捨棄第一個未辨識的檔案及其後的檔案（直接修改列表），
+        這些檔案不算已處理，繼續處理時重新處理
+
+        Args:
+            chunk_files: 這批處理的檔案
+            file_records: 這批的記錄
+            resolved: 已決定日期時間的記錄數
+
+        Returns:
+            捨棄的檔案數
+        """
+        record_count = 0
+        for cut, (_, records, _) in enumerate(chunk_files):
+            if records and record_count >= resolved:
+                break
+            record_count += len(records)
+        dropped = chunk_files[cut:]
+        del chunk_files[cut:]
+        del file_records[resolved:]
+        warning_count = sum(len(warnings) for _, _, warnings in dropped)
+        if warning_count:
+            del self.warnings[-warning_count:]
+
+        self.cancelled = True
+        self.logger.warning(
+            f"Processing cancelled during OCR, {len(dropped)} files left for resume"
+        )
+        return len(dropped)
+
+    def _save_checkpoint(self, results: List[FileResult]):
+        """保存一批處理完成的檔案: (絕對路徑, 記錄, 處理時產生的警告)"""
+        if self.checkpoint is None or not results:
+            return
+        try:
+            self.checkpoint.append(results)
+        except Exception as e:
+            # 檢查點失敗不影響處理結果
+            self.logger.warning(f"Checkpoint disabled: {str(e)}")
+            self.checkpoint.close()
+            self.checkpoint = None
+            return
+        self.logger.info(
+            f"Checkpoint saved: {self.checkpoint.file_count} files, "
+            f"{self.checkpoint.record_count} records"
+        )
+
+    def _log_run_summary(self, record_count: int, file_count: int):
+        """記錄本次處理的統計"""
         if self.oi_max_one:
-            self._cap_oi_per_photo(file_records)
             self.logger.info("OI max one: enabled (同一照片最多貢獻 1)")
         else:
             self.logger.info("OI max one: disabled (使用實際個數)")
 
-        self.records = file_records
-        self.logger.info(f"Processed {len(file_records)} files successfully")
+        self.logger.info(f"Processed {record_count} files successfully")
+        self.logger.info(
+            f"EXIF bytes read: {self.exif_bytes_read} "
+            f"(avg {self.exif_bytes_read // file_count} per file)"
+        )
 
-        return self.records
+        # 本次處理的 OCR 檔案數（同一處理器處理多個資料夾時分別計算）
+        cache_hits = self.ocr_cache_stats[0] if self.ocr_cache_stats else 0
+        self.logger.info(
+            f"OCR: {self.ocr_file_count} files without date, "
+            f"{cache_hits} from OCR cache"
+        )
+        if self.ocr_file_count <= cache_hits:
+            self.logger.info("OCR engine was not needed for this run")
 
-    def _find_csv_datetime_reference(self, directory: str) -> Dict[str, str]:
-        """尋找 CSV 時間參考檔案"""
-        csv_datetime_map = {}
+    def process_directory_incremental(
+        self, directory: str, sqlite_db, resume: bool = False
+    ) -> Tuple[List[PhotoRecord], List[PhotoRecord]]:
+        """
+        增量處理：只處理 SQLite 中尚未匯入的檔案
 
-        # 尋找與資料夾同名的 CSV 檔
-        folder_name = os.path.basename(directory)
-        csv_path = os.path.join(directory, f"{folder_name}.csv")
+        新檔案處理完後，取出它們所屬相機的既有記錄一起重新計算
+        period_start/period_end、IndependentPhoto 與 OI 上限，
+        只有這些 (Camera_ID) 與 (Camera_ID, Species) 群組會被重算。
 
-        if os.path.exists(csv_path):
-            self.logger.info(f"Found CSV reference file: {csv_path}")
-            csv_datetime_map = self.csv_writer.read_csv_datetime(csv_path)
-        else:
-            # 尋找第一個 CSV 檔
-            for file in os.listdir(directory):
-                if file.lower().endswith(".csv"):
-                    csv_path = os.path.join(directory, file)
-                    self.logger.info(f"Using CSV reference file: {csv_path}")
-                    csv_datetime_map = self.csv_writer.read_csv_datetime(csv_path)
-                    break
+        Args:
+            directory: 目錄路徑
+            sqlite_db: 已連接的 SQLiteDB
+            resume: 是否由上次中斷的檢查點繼續
+
+        Returns:
+            (新記錄列表, 衍生欄位有變動的既有記錄列表)
+            呼叫端負責寫入新記錄、更新既有記錄並以 processed_files 標記已匯入檔案
+        """
+        imported_files = sqlite_db.get_processed_files()
+        self._legacy_imports = sqlite_db.get_legacy_imports()
+        try:
+            new_records = self.process_directory(
+                directory, skip_files=imported_files, resume=resume
+            )
+        finally:
+            self._legacy_imports = set()
+        if not new_records:
+            return [], []
+
+        touched_cameras = {record.Camera_ID for record in new_records}
+        existing_records = sqlite_db.get_records_by_cameras(touched_cameras)
+
+        # 記下既有記錄原本的衍生欄位，重算後只回傳有變動的
+        derived_fields = ("IndependentPhoto", "period_start", "period_end")
+        before = [
+            tuple(getattr(record, field) for field in derived_fields)
+            for record in existing_records
+        ]
+
+        combined = existing_records + new_records
+        self._postprocess(combined)
+
+        updated_records = [
+            record
+            for record, old_values in zip(existing_records, before)
+            if tuple(getattr(record, field) for field in derived_fields) != old_values
+        ]
+
+        self.logger.info(
+            f"Incremental: {len(new_records)} new records, "
+            f"{len(existing_records)} existing records in "
+            f"{len(touched_cameras)} cameras, {len(updated_records)} updated"
+        )
+        return new_records, updated_records
+
+    def _iter_exif_data(
+        self, entries: Iterable[ScanEntry]
+    ) -> Iterator[Tuple[str, Dict]]:
+        """
+        依檔案順序產生 (檔案路徑, EXIF 資訊)
+
+        有快取的檔案直接使用快取結果，其餘才實際讀取；快取使用掃描時的 stat 結果。
+        num_workers > 1 時以 worker pool 預先讀取後續檔案的 EXIF，
+        但輸出順序與輸入相同，「前一筆記錄」的時間補值結果與依序處理一致。
+        預讀數量有上限，不會一次把所有檔案送進 pool。
+        """
+        if self.num_workers <= 1:
+            for entry in entries:
+                exif_data = self._get_cached_exif(entry)
+                if exif_data is None:
+                    exif_data = self.exif_reader.read_exif(entry.path)
+                    self._put_cached_exif(entry, exif_data)
+                yield entry.path, exif_data
+            return
+
+        if self._executor is not None:
+            yield from self._prefetch_exif_data(self._executor, entries)
+            return
+
+        with self._create_executor() as executor:
+            yield from self._prefetch_exif_data(executor, entries)
+
+    def _create_executor(self):
+        """建立讀取 EXIF 的 worker pool"""
+        if self.worker_mode == "process":
+            return ProcessPoolExecutor(max_workers=self.num_workers)
+        return ThreadPoolExecutor(max_workers=self.num_workers)
+
+    @contextmanager
+    def shared_workers(self):
+        """
+        在 with 區塊內的多次處理共用同一個 worker pool（批次處理多個資料夾用）
+
+        num_workers 為 1 時不建立 pool
+        """
+        if self.num_workers <= 1 or self._executor is not None:
+            yield
+            return
 
-        return csv_datetime_map
+        self._executor = self._create_executor()
+        try:
+            yield
+        finally:
+            executor, self._executor = self._executor, None
+            executor.shutdown()
+
+    def _prefetch_exif_data(
+        self, executor, entries: Iterable[ScanEntry]
+    ) -> Iterator[Tuple[str, Dict]]:
+        """以 worker pool 預先讀取後續檔案的 EXIF，依檔案順序產生結果"""
+        window = self.num_workers * self.PREFETCH_PER_WORKER
+        entry_iter = iter(entries)
+
+        def submit(entry):
+            # 快取命中的檔案不送進 pool，以 (項目, 結果, None) 排隊
+            exif_data = self._get_cached_exif(entry)
+            if exif_data is not None:
+                return entry, exif_data, None
+            future = executor.submit(self.exif_reader.read_exif, entry.path)
+            return entry, None, future
+
+        pending = deque(
+            submit(entry) for entry in itertools.islice(entry_iter, window)
+        )
+        while pending:
+            entry, exif_data, future = pending.popleft()
+            next_entry = next(entry_iter, None)
+            if next_entry is not None:
+                pending.append(submit(next_entry))
+            if future is not None:
+                exif_data = future.result()
+                self._put_cached_exif(entry, exif_data)
+            yield entry.path, exif_data
+
+    def _get_cached_exif(self, entry: ScanEntry) -> Optional[Dict]:
+        """從 EXIF 快取取得資料，未啟用快取則返回 None"""
+        if self.exif_cache is None:
+            return None
+        return self.exif_cache.get(entry.path, entry.stat())
+
+    def _put_cached_exif(self, entry: ScanEntry, exif_data: Dict):
+        """將 EXIF 資料存入快取"""
+        if self.exif_cache is not None:
+            self.exif_cache.put(entry.path, exif_data, entry.stat())
+
+    def _is_legacy_import(self, file_path: str, exif_data: Dict) -> bool:
+        """
+        檔案是否在 processed_file 建立前已匯入 SQLite
+
+        舊資料庫只有檔名，以 (Camera_ID, 檔名) 比對；同一台相機重新編號後
+        產生的同名照片也會被視為已匯入
+        """
+        return bool(self._legacy_imports) and (
+            exif_data.get("Camera_ID"), os.path.basename(file_path)
+        ) in self._legacy_imports
 
     def _process_single_file(
         self,
         file_path: str,
-        csv_datetime_map: Dict[str, str],
-        previous_records: List[Dict],
-    ) -> Optional[List[Dict]]:
+        csv_index: CSVDatetimeIndex,
+        exif_data: Optional[Dict] = None,
+    ) -> Optional[List[PhotoRecord]]:
         """
         處理單一檔案（可能產生多筆記錄）
 
+        CSV 與 EXIF 都沒有日期時間時，記錄的 DateTimeOriginal 為 None，
+        由 _resolve_deferred_datetimes 以批次 OCR 或前一筆記錄補上。
+
         Args:
             file_path: 檔案路徑
-            csv_datetime_map: CSV 時間對應
-            previous_records: 之前處理過的記錄
+            csv_index: CSV 時間參考索引
+            exif_data: 已預先讀取的 EXIF 資訊，None 則在此讀取
 
         Returns:
             處理後的記錄列表（如果有多個動物標籤）或單一記錄
@@ -139,19 +842,14 @@ class PhotoProcessor:
         filename = os.path.basename(file_path)
 
         # 1. 讀取 EXIF 資訊
-        exif_data = self.exif_reader.read_exif(file_path)
+        if exif_data is None:
+            exif_data = self.exif_reader.read_exif(file_path)
 
-        # 2. 決定日期時間 (優先順序: CSV > EXIF > OCR > 前一筆)
+        # 2. 決定日期時間 (優先順序: CSV > EXIF，OCR 與前一筆延後批次處理)
         datetime_original = self._determine_datetime(
-            filename, exif_data, csv_datetime_map, file_path, previous_records
+            file_path, exif_data, csv_index
         )
 
-        if not datetime_original:
-            self.logger.warning(
-                f"Could not determine datetime for {filename}, using 2000/1/1"
-            )
-            datetime_original = datetime(2000, 1, 1)
-
         # 3. 檢查是否有多個動物標籤
         if exif_data.get("has_multiple_animals"):
             # 有多個動物標籤，產生多筆記錄
@@ -163,25 +861,19 @@ class PhotoProcessor:
             self.logger.warning(warning)
 
             for animal in multiple_animals:
-                record = {
-                    "SourceFile": filename,
-                    "DateTimeOriginal": datetime_original,
-                    "Date": datetime_original,  # Access DB 需要完整的 datetime 物件
-                    "Time": datetime_original,  # Access DB 需要完整的 datetime 物件
-                    "Site": exif_data.get("Site"),
-                    "Plot_ID": exif_data.get("Plot_ID"),
-                    "Camera_ID": exif_data.get("Camera_ID"),
-                    "Group": animal.get("Group", ""),
-                    "Species": animal.get("Species", ""),
-                    "Number": animal.get("Number", 1),
-                    "Note": "",
-                    "IndependentPhoto": 0,
-                    "period_start": None,
-                    "period_end": None,
-                }
+                record = PhotoRecord(
+                    SourceFile=filename,
+                    DateTimeOriginal=datetime_original,
+                    Site=exif_data.get("Site"),
+                    Plot_ID=exif_data.get("Plot_ID"),
+                    Camera_ID=exif_data.get("Camera_ID"),
+                    Group=animal.get("Group", ""),
+                    Species=animal.get("Species", ""),
+                    Number=animal.get("Number", 1),
+                )
 
                 # 檢查是否缺少 Camera_ID
-                if not record["Camera_ID"]:
+                if not record.Camera_ID:
                     if filename not in [
                         w for w in self.warnings if "no Camera_ID" in w
                     ]:
@@ -190,7 +882,7 @@ class PhotoProcessor:
                         self.logger.warning(warning)
 
                 # 只加入有效的記錄（有 Species 且不是 unknown）
-                if record["Species"] and record["Species"].lower() != "unknown":
+                if record.Species and record.Species.lower() != "unknown":
                     records.append(record)
                 else:
                     self.logger.info(
@@ -201,31 +893,25 @@ class PhotoProcessor:
 
         else:
             # 單一動物標籤，正常處理
-            record = {
-                "SourceFile": filename,
-                "DateTimeOriginal": datetime_original,
-                "Date": datetime_original,  # Access DB 需要完整的 datetime 物件
-                "Time": datetime_original,  # Access DB 需要完整的 datetime 物件
-                "Site": exif_data.get("Site"),
-                "Plot_ID": exif_data.get("Plot_ID"),
-                "Camera_ID": exif_data.get("Camera_ID"),
-                "Group": exif_data.get("Group"),
-                "Species": exif_data.get("Species"),
-                "Number": exif_data.get("Number", 1),
-                "Note": "",
-                "IndependentPhoto": 0,
-                "period_start": None,
-                "period_end": None,
-            }
+            record = PhotoRecord(
+                SourceFile=filename,
+                DateTimeOriginal=datetime_original,
+                Site=exif_data.get("Site"),
+                Plot_ID=exif_data.get("Plot_ID"),
+                Camera_ID=exif_data.get("Camera_ID"),
+                Group=exif_data.get("Group"),
+                Species=exif_data.get("Species"),
+                Number=exif_data.get("Number", 1),
+            )
 
             # 檢查是否缺少 Camera_ID
-            if not record["Camera_ID"]:
+            if not record.Camera_ID:
                 warning = f"WARN: {filename} has no Camera_ID tag"
                 self.warnings.append(warning)
                 self.logger.warning(warning)
 
             # 如果沒有 Species 或 Species 為 unknown，則忽略
-            if not record["Species"] or record["Species"].lower() == "unknown":
+            if not record.Species or record.Species.lower() == "unknown":
                 self.logger.info(f"Skipping {filename}: no valid species tag")
                 return None
 
@@ -233,11 +919,9 @@ class PhotoProcessor:
 
     def _determine_datetime(
         self,
-        filename: str,
-        exif_data: Dict,
-        csv_datetime_map: Dict[str, str],
         file_path: str,
-        previous_records: List[Dict],
+        exif_data: Dict,
+        csv_index: CSVDatetimeIndex,
     ) -> Optional[datetime]:
         """
         決定檔案的日期時間
@@ -245,189 +929,263 @@ class PhotoProcessor:
         優先順序:
         1. CSV 檔案
         2. EXIF CreateDate
-        3. OCR 偵測
-        4. 使用前一筆記錄的時間
+        3. OCR 偵測（延後批次處理）
+        4. 使用前一筆記錄的時間（OCR 批次完成後處理）
         """
-        # 1. 檢查 CSV
-        if filename in csv_datetime_map:
-            try:
-                dt = self._parse_datetime_string(csv_datetime_map[filename])
-                if dt:
-                    self.logger.debug(f"Using CSV datetime for {filename}: {dt}")
-                    return dt
-            except Exception as e:
-                self.logger.warning(
-                    f"Failed to parse CSV datetime for {filename}: {str(e)}"
-                )
+        filename = os.path.basename(file_path)
+
+        # 1. 檢查 CSV（所在資料夾或上層資料夾的參考檔，讀取時已解析）
+        dt = csv_index.lookup(file_path)
+        if dt is not None:
+            self.logger.debug(f"Using CSV datetime for {filename}: {dt}")
+            return dt
 
         # 2. 檢查 EXIF
         if exif_data.get("DateTimeOriginal"):
             return exif_data["DateTimeOriginal"]
 
-        # 3. 使用 OCR
-        self.logger.warning(f"{filename} has no EXIF CreateDate, using OCR")
-        try:
-            dt = self.ocr_detector.detect_datetime_from_image(file_path)
-            if dt:
-                self.logger.warning(f"OCR result: {dt}")
-                return dt
-            else:
-                self.logger.warning(f"OCR failed for {filename}")
-        except Exception as e:
-            self.logger.error(f"OCR error for {filename}: {str(e)}")
-
-        # 4. 使用前一筆記錄
-        if previous_records:
-            prev_dt = previous_records[-1]["DateTimeOriginal"]
-            self.logger.warning(f"Using previous datetime for {filename}: {prev_dt}")
-            return prev_dt
-
+        # 3. 排入 OCR 佇列
+        self.logger.warning(f"{filename} has no EXIF CreateDate, queued for OCR")
         return None
 
-    def _parse_datetime_string(self, datetime_str: str) -> Optional[datetime]:
-        """
-        解析日期時間字串
-
-        支援格式:
-        - 2020/6/22 09:40:5
-        - 2020/06/22 09:40
-        - 2020:06:22 09:40:12
+    def _resolve_deferred_datetimes(
+        self,
+        file_records: List[PhotoRecord],
+        ocr_queue: List[Tuple[str, List[PhotoRecord], Optional[str], Optional[Tuple]]],
+        previous_dt: Optional[datetime] = None,
+    ) -> Tuple[Optional[datetime], int]:
         """
-        import re
+        批次 OCR 缺少日期的檔案，並補上仍無法決定的日期時間
 
-        # 清理字串
-        datetime_str = datetime_str.strip()
+        OCR 失敗的記錄依檔案順序使用前一筆記錄的時間，
+        沒有前一筆時使用 2000/1/1，結果與逐檔處理相同。
+        OCR 途中取消時，第一個未辨識的檔案及其後的記錄不補上日期時間。
 
-        # 替換冒號為斜線 (處理 2020:06:22 格式)
-        datetime_str = re.sub(
-            r"^(\d{4}):(\d{1,2}):(\d{1,2})", r"\1/\2/\3", datetime_str
-        )
+        Args:
+            file_records: 依檔案順序排列的記錄
+            ocr_queue: (檔案路徑, 該檔案的記錄, 影像雜湊, 快取的 OCR 結果) 列表
+            previous_dt: file_records 之前最後一筆記錄的時間（分批處理時）
 
-        # 解析格式
-        formats = [
-            "%Y/%m/%d %H:%M:%S",
-            "%Y/%m/%d %H:%M",
-            "%Y-%m-%d %H:%M:%S",
-            "%Y-%m-%d %H:%M",
+        Returns:
+            (最後一筆完成記錄的時間，供下一批使用, 完成的記錄數)
+        """
+        if not ocr_queue:
+            if file_records:
+                previous_dt = file_records[-1].DateTimeOriginal
+            return previous_dt, len(file_records)
+
+        image_paths = [entry[0] for entry in ocr_queue]
+        # 同一相機的日期戳記位置相同，OCR 會記住位置並跳過後續圖片的文字偵測
+        region_keys = [
+            records[0].Camera_ID or os.path.dirname(file_path)
+            for file_path, records, _, _ in ocr_queue
         ]
+        results, done = self._run_ocr(
+            image_paths, region_keys,
+            [entry[2] for entry in ocr_queue], [entry[3] for entry in ocr_queue],
+        )
+        resolved = len(file_records)
+        if done < len(ocr_queue):
+            # 第一個未辨識檔案的第一筆記錄
+            first = ocr_queue[done][1][0]
+            resolved = next(i for i, record in enumerate(file_records) if record is first)
+            ocr_queue = ocr_queue[:done]
+
+        learned_hits = getattr(self.ocr_detector, "learned_region_hits", 0)
+        if learned_hits:
+            self.logger.info(
+                f"OCR learned region hits: {learned_hits}, "
+                f"misses: {self.ocr_detector.learned_region_misses}"
+            )
 
-        for fmt in formats:
-            try:
-                return datetime.strptime(datetime_str, fmt)
-            except ValueError:
-                continue
+        for (file_path, records, _, _), dt in zip(ocr_queue, results):
+            filename = os.path.basename(file_path)
+            if dt:
+                self.logger.warning(f"OCR result for {filename}: {dt}")
+                self._set_record_datetime(records, dt)
+            else:
+                self.logger.warning(f"OCR failed for {filename}")
 
-        return None
+        # 4. 使用前一筆記錄（依檔案順序）
+        for record in itertools.islice(file_records, resolved):
+            if record.DateTimeOriginal is None:
+                if previous_dt is not None:
+                    self.logger.warning(
+                        f"Using previous datetime for {record.SourceFile}: "
+                        f"{previous_dt}"
+                    )
+                    self._set_record_datetime([record], previous_dt)
+                else:
+                    self.logger.warning(
+                        f"Could not determine datetime for {record.SourceFile}, "
+                        f"using 2000/1/1"
+                    )
+                    self._set_record_datetime([record], datetime(2000, 1, 1))
+            previous_dt = record.DateTimeOriginal
+        return previous_dt, resolved
 
-    def _calculate_period_ranges(self, records: List[Dict], directory: str):
-        """計算時間範圍"""
-        if not records:
+    def _open_ocr_cache(self):
+        """開啟 OCR 結果快取（有設定 ocr_cache_path 時）"""
+        if not self.ocr_cache_path:
             return
+        self.ocr_cache = OCRCache(
+            self.ocr_cache_path,
+            max_entries=self.ocr_cache_max_entries,
+            variant=self._ocr_variant(),
+        )
+        try:
+            self.ocr_cache.connect()
+        except Exception as e:
+            self.logger.warning(f"OCR cache disabled: {str(e)}")
+            self.ocr_cache = None
 
-        # 按照 Camera_ID 分組
-        camera_groups = {}
-        for record in records:
-            camera_id = record.get("Camera_ID", "Unknown")
-            if camera_id not in camera_groups:
-                camera_groups[camera_id] = []
-            camera_groups[camera_id].append(record)
-
-        # 計算每組的時間範圍
-        for camera_id, group_records in camera_groups.items():
-            # 排序
-            group_records.sort(key=lambda x: x["DateTimeOriginal"])
-
-            # 設定範圍
-            period_start = group_records[0]["DateTimeOriginal"]
-            period_end = group_records[-1]["DateTimeOriginal"]
-
+    def _close_ocr_cache(self):
+        """關閉 OCR 快取並累計命中統計"""
+        cache, self.ocr_cache = self.ocr_cache, None
+        if cache is None:
+            return
+        if cache.hits + cache.misses:
+            # 批次處理多個資料夾時統計累加
+            hits, misses = self.ocr_cache_stats or (0, 0)
+            self.ocr_cache_stats = (hits + cache.hits, misses + cache.misses)
             self.logger.info(
-                f"Camera {camera_id} period: {period_start} ~ {period_end}"
+                f"OCR cache: {cache.hits} hits, {cache.misses} misses "
+                f"(hit rate {cache.hit_rate:.1%})"
             )
+        cache.close()
 
-            # 更新所有記錄
-            for record in group_records:
-                record["period_start"] = period_start
-                record["period_end"] = period_end
-
-    def _calculate_independent_photos(self, records: List[Dict]):
+    def _lookup_ocr_cache(
+        self, image_path: str
+    ) -> Tuple[Optional[str], Optional[Tuple[Optional[str], Optional[datetime]]]]:
         """
-        計算有效照片數
+        查詢圖片的 OCR 快取（排入 OCR 佇列時）
 
-        根據時間間隔，同一物種在指定時間內只算一張有效照片
+        Returns:
+            (影像雜湊，無快取或無法讀取時為 None, 快取的 (文字, 日期時間)，未命中為 None)
         """
-        if not records:
-            return
-
-        # 按照 Camera_ID 和 Species 分組
-        groups = {}
-        for record in records:
-            key = (record.get("Camera_ID"), record.get("Species"))
-            if key not in groups:
-                groups[key] = []
-            groups[key].append(record)
-
-        # 計算每組的有效照片數
-        for key, group_records in groups.items():
-            # 排序
-            group_records.sort(key=lambda x: x["DateTimeOriginal"])
-
-            # 第一張總是有效的
-            if group_records:
-                group_records[0]["IndependentPhoto"] = 1
-
-            # 計算後續的
-            last_independent_time = group_records[0]["DateTimeOriginal"]
-
-            for i in range(1, len(group_records)):
-                current_time = group_records[i]["DateTimeOriginal"]
-                time_diff = current_time - last_independent_time
-
-                # 如果時間差超過間隔，則為有效照片
-                if time_diff >= timedelta(minutes=self.time_interval):
-                    group_records[i]["IndependentPhoto"] = 1
-                    last_independent_time = current_time
-                else:
-                    group_records[i]["IndependentPhoto"] = 0
-
-    def _cap_oi_per_photo(self, records: List[Dict]):
+        if self.ocr_cache is None:
+            return None, None
+        try:
+            content_hash = image_content_hash(image_path)
+        except OSError as e:
+            self.logger.debug(f"Failed to hash {image_path}: {str(e)}")
+            return None, None
+        return content_hash, self.ocr_cache.get(content_hash)
+
+    def _run_ocr(
+        self, image_paths: List[str], region_keys: List[Optional[str]],
+        content_hashes: Optional[List[Optional[str]]] = None,
+        cached: Optional[List[Optional[Tuple]]] = None,
+    ) -> Tuple[List[Optional[datetime]], int]:
         """
-        限制同一張照片的 OI 貢獻最大值為 1
+        批次 OCR，已有快取結果的圖片不再辨識，辨識結果存入快取
 
-        當一張有效照片包含多種動物（產生多筆記錄）時，
-        只保留其中一筆 IndependentPhoto=1，其餘設為 0。
+        Args:
+            image_paths: 圖片路徑列表
+            region_keys: 每張圖片的日期位置群組
+            content_hashes: 每張圖片的影像雜湊（見 _lookup_ocr_cache），None 表示不快取
+            cached: 每張圖片快取的 (文字, 日期時間)，未命中為 None
+
+        Returns:
+            (與 image_paths 順序相同的日期時間列表，失敗者為 None,
+             已完成的圖片數：取消時批次之間停止，其後的圖片未辨識)
         """
-        if not records:
-            return
+        results = [None] * len(image_paths)
+        done = len(image_paths)
+        hashes = content_hashes or [None] * len(image_paths)
+        pending = []
+        for i, hit in enumerate(cached or [None] * len(image_paths)):
+            if hit is None:
+                pending.append(i)
+            else:
+                results[i] = hit[1]
+        if not pending:
+            return results, done
 
-        # 按照 SourceFile 分組，找出同一照片的所有記錄
-        photo_groups: Dict[str, List[Dict]] = {}
-        for record in records:
-            source_file = record.get("SourceFile", "")
-            if source_file not in photo_groups:
-                photo_groups[source_file] = []
-            photo_groups[source_file].append(record)
-
-        for source_file, group_records in photo_groups.items():
-            # 只處理有多筆記錄的照片
-            if len(group_records) <= 1:
+        self.logger.info(
+            f"Running OCR on {len(pending)} files "
+            f"(batch size {self.ocr_batch_size})"
+        )
+        self.ocr_detector.detected_texts.clear()
+        self.progress.report(STAGE_OCR, 0, len(pending), force=True)
+        # 每次送進一個批次，批次之間回報進度並檢查是否取消
+        for start in range(0, len(pending), self.ocr_batch_size):
+            batch = pending[start:start + self.ocr_batch_size]
+            if self.cancel_token.cancelled:
+                done = batch[0]
+                self.logger.warning(
+                    f"OCR cancelled after {start}/{len(pending)} files"
+                )
+                break
+            try:
+                detected = self.ocr_detector.detect_datetimes_batch(
+                    [image_paths[i] for i in batch],
+                    batch_size=self.ocr_batch_size,
+                    region_keys=[region_keys[i] for i in batch],
+                )
+            except Exception as e:
+                self.logger.error(f"Batch OCR error: {str(e)}")
+                detected = None
+            self.progress.report(
+                STAGE_OCR, start + len(batch), len(pending),
+                force=start + len(batch) == len(pending),
+            )
+            if detected is None:
                 continue
 
-            # 計算該照片中 IndependentPhoto=1 的數量
-            independent_records = [
-                r for r in group_records if r.get("IndependentPhoto") == 1
-            ]
+            for i, dt in zip(batch, detected):
+                results[i] = dt
+                if self.ocr_cache and hashes[i]:
+                    text = self.ocr_detector.detected_texts.get(image_paths[i])
+                    # 引擎未能執行 (未安裝、讀檔失敗) 的結果不快取
+                    if dt is not None or text is not None:
+                        self.ocr_cache.put(hashes[i], text, dt)
+
+        return results, done
+
+    def _ocr_variant(self) -> str:
+        """OCR 引擎與設定的識別字串，設定不同時辨識結果可能不同"""
+        detector = self.ocr_detector
+        return (
+            f"{detector.engine}:{detector.roi_mode}:"
+            f"{detector.band_fraction}:{detector.max_width}"
+        )
 
-            if len(independent_records) <= 1:
-                continue
+    @staticmethod
+    def _set_record_datetime(records: List[PhotoRecord], dt: datetime):
+        """設定記錄的 DateTimeOriginal（Date/Time 由此衍生）"""
+        for record in records:
+            record.DateTimeOriginal = dt
 
-            # 保留第一筆 IndependentPhoto=1，其餘設為 0
+    def _postprocess(self, records: List[PhotoRecord],
+                     oi_max_one: Optional[bool] = None):
+        """
+        計算時間範圍、有效照片數與 OI 上限，並記錄各步驟耗時
+
+        Args:
+            records: 記錄列表
+            oi_max_one: 是否套用 OI 上限，None 則依 self.oi_max_one
+        """
+        if oi_max_one is None:
+            oi_max_one = self.oi_max_one
+        self.postprocess_timings = postprocess_records(
+            records, self.time_interval, oi_max_one
+        )
+        if self.postprocess_timings:
+            steps = ", ".join(
+                f"{step} {seconds:.3f}s"
+                for step, seconds in self.postprocess_timings.items()
+            )
+            total = sum(self.postprocess_timings.values())
             self.logger.info(
-                f"{source_file}: {len(independent_records)} independent records "
-                f"found, capping OI to 1"
+                f"Post-processed {len(records)} records in {total:.3f}s ({steps})"
             )
-            for r in independent_records[1:]:
-                r["IndependentPhoto"] = 0
+
+    def set_progress_callback(
+        self, callback: Optional[Callable[[ProgressInfo], None]]
+    ):
+        """設定進度回報函式（見 __init__ 的 progress_callback）"""
+        self.progress.callback = callback
 
     def get_warnings(self) -> List[str]:
         """取得警告訊息列表"""
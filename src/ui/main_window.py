@@ -2,8 +2,11 @@
 """
 PyQt6 主視窗介面
 """
+import threading
+
 from PyQt6.QtCore import QThread, pyqtSignal
 from PyQt6.QtWidgets import (
+    QCheckBox,
     QComboBox,
     QFileDialog,
     QGroupBox,
@@ -22,19 +25,43 @@ from PyQt6.QtWidgets import (
 
 from src.utils.config import cfg
 from src.utils.logger import getUniqueLogger
+from src.utils.progress import (
+    STAGE_OCR,
+    STAGE_POSTPROCESS,
+    STAGE_PROCESS,
+    STAGE_WRITE,
+    ProgressInfo,
+)
 
 logger = getUniqueLogger()
 
+# 進度條顯示的階段名稱
+STAGE_LABELS = {
+    STAGE_PROCESS: "處理檔案",
+    STAGE_OCR: "OCR 辨識",
+    STAGE_POSTPROCESS: "計算有效照片",
+    STAGE_WRITE: "寫入輸出",
+}
+
+
+def _format_seconds(seconds: float) -> str:
+    """秒數轉為 h:mm:ss"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
 
 class ProcessThread(QThread):
     """處理執行緒"""
 
     progress = pyqtSignal(str)  # 進度訊息
+    progress_info = pyqtSignal(object)  # 各階段進度 (ProgressInfo)
     finished = pyqtSignal(bool, str)  # 完成訊號 (成功, 訊息)
 
     def __init__(
         self, processor, input_path, output_path, access_db_path, sqlite_db_path,
-        excel_path, csv_path, save_access_db=True, save_sqlite=True
+        excel_path, csv_path, save_access_db=True, save_sqlite=True,
+        incremental=False, resume=False
     ):
         super().__init__()
         self.processor = processor
@@ -46,65 +73,131 @@ class ProcessThread(QThread):
         self.csv_path = csv_path
         self.save_access_db = save_access_db
         self.save_sqlite = save_sqlite
+        # 增量處理需要 SQLite 記錄已匯入的檔案
+        self.incremental = incremental and save_sqlite
+        # 由上次中斷的檢查點繼續
+        self.resume = resume
+        # 處理器的進度由此執行緒呼叫，以訊號轉送到介面
+        self.processor.set_progress_callback(self.progress_info.emit)
+
+    def request_stop(self):
+        """處理完目前的檔案後停止，已處理的記錄照常寫入輸出"""
+        self.processor.cancel_token.cancel()
 
     def run(self):
         """執行處理"""
         try:
             self.progress.emit(f"開始處理目錄: {self.input_path}")
+            if self.resume:
+                self.progress.emit("由上次中斷的檢查點繼續，略過已處理的檔案")
 
             # 處理照片
-            records = self.processor.process_directory(self.input_path)
+            if self.incremental:
+                from src.database.sqlite_db import SQLiteDB
+
+                self.progress.emit("增量處理模式：只處理尚未匯入的新檔案")
+                with SQLiteDB(
+                    self.sqlite_db_path, chunk_size=cfg.database.sqlite_chunk_size
+                ) as db:
+                    records, updated_records = (
+                        self.processor.process_directory_incremental(
+                            self.input_path, db, resume=self.resume
+                        )
+                    )
+                    if records:
+                        db.insert_records_batch(records)
+                        db.update_derived_fields(updated_records)
+                    db.mark_files_processed(self.processor.processed_files)
+                    # CSV/Excel 匯出 SQLite 中的完整資料
+                    export_records = db.get_all_records() if records else []
+            else:
+                records = self.processor.process_directory(
+                    self.input_path, resume=self.resume
+                )
+                export_records = records
+                updated_records = []
 
+            cancelled = self.processor.cancelled
             if not records:
+                if cancelled:
+                    self.finished.emit(False, "已停止，沒有處理任何記錄")
+                    return
+                self.processor.clear_checkpoint(self.input_path)
                 self.finished.emit(False, "沒有找到任何可處理的檔案")
                 return
 
+            save_access_db = self.save_access_db
+            save_sqlite = self.save_sqlite and not self.incremental
+            if cancelled:
+                self.progress.emit(
+                    f"已停止，寫入已處理的 {len(self.processor.processed_files)} 個檔案"
+                )
+                if not self.incremental:
+                    # 資料庫留到繼續處理完後一次寫入，避免記錄重複
+                    save_access_db = save_sqlite = False
+                    self.progress.emit("資料庫待繼續處理完成後才寫入")
             self.progress.emit(f"找到 {len(records)} 筆記錄")
 
-            # 儲存到 CSV
-            from src.database.csv_excel_writer import CSVExcelWriter
-
-            writer = CSVExcelWriter()
-
-            self.progress.emit("儲存到 CSV...")
-            writer.write_to_csv(records, self.csv_path)
-
-            # 儲存到 Excel
-            self.progress.emit("儲存到 Excel...")
-            writer.write_to_excel(records, self.excel_path)
-
-            # 儲存到 Access DB
-            if self.save_access_db:
-                try:
-                    from src.database.access_db import AccessDB
-
-                    self.progress.emit("儲存到 Access DB...")
-
-                    with AccessDB(self.access_db_path) as db:
-                        db.insert_records_batch(records)
+            # 儲存資料：各輸出同時寫入，某個輸出失敗不影響其他輸出
+            from src.database.output_sinks import (
+                AccessSink,
+                build_output_sinks,
+                write_outputs,
+            )
 
-                    self.progress.emit("Access DB 儲存完成")
-                except Exception as e:
-                    self.progress.emit(f"Access DB 儲存失敗: {str(e)}")
-                    self.progress.emit("請確認已安裝 Microsoft Access Database Engine")
-            else:
+            if not self.save_access_db:
                 self.progress.emit("Access DB 儲存已停用")
+            if self.incremental:
+                self.progress.emit("SQLite 已於增量處理時更新")
+            elif not self.save_sqlite:
+                self.progress.emit("SQLite 儲存已停用")
 
-            # 儲存到 SQLite
-            if self.save_sqlite:
-                try:
-                    from src.database.sqlite_db import SQLiteDB
-
-                    self.progress.emit("儲存到 SQLite...")
+            sinks = build_output_sinks(
+                records,
+                export_records,
+                self.csv_path,
+                self.excel_path,
+                access_db_path=self.access_db_path if save_access_db else None,
+                access_options=cfg.database.access_options(),
+                sqlite_db_path=self.sqlite_db_path if save_sqlite else None,
+                sqlite_chunk_size=cfg.database.sqlite_chunk_size,
+                processed_files=self.processor.processed_files,
+                updated_records=updated_records,
+            )
+            self.progress.emit(
+                "儲存到 " + "、".join(sink.name for sink in sinks) + "..."
+            )
 
-                    with SQLiteDB(self.sqlite_db_path) as db:
-                        db.insert_records_batch(records)
+            written = 0
+            # report 由各輸出的 worker 執行緒呼叫
+            written_lock = threading.Lock()
+            self.progress_info.emit(ProgressInfo(STAGE_WRITE, 0, len(sinks)))
+
+            def report(result):
+                nonlocal written
+                with written_lock:
+                    written += 1
+                    done = written
+                self.progress_info.emit(ProgressInfo(STAGE_WRITE, done, len(sinks)))
+                if result.ok:
+                    self.progress.emit(
+                        f"{result.name} 儲存完成 ({result.seconds:.1f} 秒)"
+                    )
+                    if result.failed_rows:
+                        self.progress.emit(
+                            f"{result.name} 有 {result.failed_rows} 筆記錄寫入失敗"
+                        )
+                else:
+                    self.progress.emit(f"{result.name} 儲存失敗: {result.error}")
+                    if result.name == AccessSink.name:
+                        self.progress.emit(
+                            "請確認已安裝 Microsoft Access Database Engine"
+                        )
 
-                    self.progress.emit("SQLite 儲存完成")
-                except Exception as e:
-                    self.progress.emit(f"SQLite 儲存失敗: {str(e)}")
-            else:
-                self.progress.emit("SQLite 儲存已停用")
+            results = write_outputs(sinks, on_result=report)
+            if not cancelled and all(result.ok for result in results):
+                # 輸出都已寫入，不再需要檢查點；停止時保留，可由中斷處繼續
+                self.processor.clear_checkpoint(self.input_path)
 
             # 顯示警告訊息
             warnings = self.processor.get_warnings()
@@ -115,6 +208,20 @@ class ProcessThread(QThread):
                 if len(warnings) > 10:
                     self.progress.emit(f"... 還有 {len(warnings) - 10} 個警告")
 
+            if self.processor.ocr_cache_stats:
+                hits, misses = self.processor.ocr_cache_stats
+                self.progress.emit(
+                    f"OCR 快取: 命中 {hits} 筆，未命中 {misses} 筆 "
+                    f"(命中率 {hits / (hits + misses):.1%})"
+                )
+
+            if cancelled:
+                self.finished.emit(
+                    True,
+                    f"已停止！已寫入 {len(records)} 筆記錄，"
+                    f"其餘檔案可勾選「從中斷處繼續」再處理",
+                )
+                return
             self.finished.emit(True, f"處理完成！共處理 {len(records)} 筆記錄")
 
         except Exception as e:
@@ -128,6 +235,8 @@ class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.process_thread = None
+        # 關閉視窗時要求停止，處理結束後才關閉
+        self.close_requested = False
         self.init_ui()
 
     def init_ui(self):
@@ -190,6 +299,18 @@ class MainWindow(QMainWindow):
         self.ocr_combo.setToolTip("選擇 OCR 辨識引擎")
         settings_layout.addWidget(self.ocr_combo)
 
+        # 增量處理
+        self.incremental_check = QCheckBox("增量處理")
+        self.incremental_check.setChecked(cfg.processing.incremental)
+        self.incremental_check.setToolTip("只處理 SQLite 中尚未匯入的新檔案")
+        settings_layout.addWidget(self.incremental_check)
+
+        # 由檢查點繼續（每次處理前手動勾選，不儲存到設定）
+        self.resume_check = QCheckBox("從中斷處繼續")
+        self.resume_check.setEnabled(cfg.processing.checkpoint)
+        self.resume_check.setToolTip("由上次中斷的檢查點繼續，略過已處理的檔案")
+        settings_layout.addWidget(self.resume_check)
+
         settings_layout.addStretch()
         layout.addWidget(settings_group)
 
@@ -201,6 +322,13 @@ class MainWindow(QMainWindow):
         self.run_btn.clicked.connect(self.start_processing)
         button_layout.addWidget(self.run_btn)
 
+        self.stop_btn = QPushButton("停止")
+        self.stop_btn.setMinimumHeight(40)
+        self.stop_btn.setEnabled(False)
+        self.stop_btn.setToolTip("處理完目前的檔案後停止，並寫入已處理的結果")
+        self.stop_btn.clicked.connect(self.stop_processing)
+        button_layout.addWidget(self.stop_btn)
+
         self.clear_btn = QPushButton("清空資料表")
         self.clear_btn.setMinimumHeight(40)
         self.clear_btn.clicked.connect(self.clear_database)
@@ -249,6 +377,7 @@ class MainWindow(QMainWindow):
         cfg.path.output = self.output_path_edit.text()
         cfg.processing.default_time_interval = self.time_interval_spin.value()
         cfg.processing.ocr_engine = self.ocr_combo.currentText()
+        cfg.processing.incremental = self.incremental_check.isChecked()
         cfg.save()
 
         QMessageBox.information(self, "成功", "設定已儲存")
@@ -280,6 +409,15 @@ class MainWindow(QMainWindow):
         sqlite_db_path = os.path.join(db_dir, cfg.database.sqlite_db_name)
         excel_path = os.path.join(output_path, cfg.database.excel_file_name)
         csv_path = os.path.join(output_path, cfg.database.csv_file_name)
+        exif_cache_path = None
+        if cfg.processing.exif_cache:
+            exif_cache_path = os.path.join(db_dir, cfg.database.exif_cache_name)
+        ocr_cache_path = None
+        if cfg.processing.ocr_cache:
+            ocr_cache_path = os.path.join(db_dir, cfg.database.ocr_cache_name)
+        checkpoint_path = None
+        if cfg.processing.checkpoint:
+            checkpoint_path = os.path.join(db_dir, cfg.database.checkpoint_name)
 
         # 建立處理器
         from src.processor import PhotoProcessor
@@ -288,6 +426,19 @@ class MainWindow(QMainWindow):
             time_interval=self.time_interval_spin.value(),
             ocr_engine=self.ocr_combo.currentText(),
             oi_max_one=cfg.processing.oi_max_one,
+            num_workers=cfg.processing.num_workers,
+            worker_mode=cfg.processing.worker_mode,
+            fast_exif=cfg.processing.fast_exif,
+            exif_cache_path=exif_cache_path,
+            exif_cache_max_entries=cfg.processing.exif_cache_max_entries,
+            ocr_options=cfg.processing.ocr_options(),
+            ocr_batch_size=cfg.processing.ocr_batch_size,
+            ocr_prewarm=cfg.processing.ocr_prewarm,
+            ocr_cache_path=ocr_cache_path,
+            ocr_cache_max_entries=cfg.processing.ocr_cache_max_entries,
+            scan_options=cfg.processing.scan_options(),
+            checkpoint_path=checkpoint_path,
+            checkpoint_interval=cfg.processing.checkpoint_interval,
         )
 
         # 清空訊息
@@ -299,14 +450,18 @@ class MainWindow(QMainWindow):
             excel_path, csv_path,
             save_access_db=cfg.database.save_access_db,
             save_sqlite=cfg.database.save_sqlite,
+            incremental=self.incremental_check.isChecked(),
+            resume=self.resume_check.isChecked(),
         )
         self.process_thread.progress.connect(self.update_progress)
+        self.process_thread.progress_info.connect(self.update_progress_bar)
         self.process_thread.finished.connect(self.processing_finished)
 
         # 禁用按鈕
         self.run_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
         self.progress_bar.setVisible(True)
-        self.progress_bar.setRange(0, 0)  # 不確定的進度
+        self.progress_bar.setRange(0, 0)  # 計算檔案總數前不確定進度
 
         self.statusBar().showMessage("處理中...")
         self.process_thread.start()
@@ -319,10 +474,48 @@ class MainWindow(QMainWindow):
             self.message_text.verticalScrollBar().maximum()
         )
 
+    def update_progress_bar(self, info: ProgressInfo):
+        """更新進度條與狀態列"""
+        label = STAGE_LABELS.get(info.stage, info.stage)
+        if info.total is None:
+            self.progress_bar.setRange(0, 0)
+            self.statusBar().showMessage(f"{label}: {info.done}")
+            return
+
+        self.progress_bar.setRange(0, max(info.total, 1))
+        self.progress_bar.setValue(info.done)
+        self.progress_bar.setFormat(f"{label} %v/%m (%p%)")
+
+        status = f"{label}: {info.done}/{info.total}"
+        if info.stage == STAGE_PROCESS and info.rate > 0:
+            status += f"，{info.rate:.1f} 檔/秒"
+        if info.eta is not None and info.done < info.total:
+            status += f"，剩餘約 {_format_seconds(info.eta)}"
+        if self.process_thread and self.process_thread.processor.cancel_token.cancelled:
+            status = "停止中... " + status
+        self.statusBar().showMessage(status)
+
+    def stop_processing(self):
+        """處理完目前的檔案後停止"""
+        if not (self.process_thread and self.process_thread.isRunning()):
+            return
+        self.process_thread.request_stop()
+        self.stop_btn.setEnabled(False)
+        self.update_progress("將在目前的檔案處理完後停止，並寫入已處理的結果...")
+        self.statusBar().showMessage("停止中...")
+
     def processing_finished(self, success: bool, message: str):
         """處理完成"""
         self.progress_bar.setVisible(False)
         self.run_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+
+        if self.close_requested:
+            # 關閉視窗時要求的停止已完成；finished 在 run() 結束前發出，
+            # 等執行緒結束後 closeEvent 才不會再看到 isRunning()
+            self.process_thread.wait()
+            self.close()
+            return
 
         if success:
             QMessageBox.information(self, "完成", message)
@@ -386,18 +579,26 @@ class MainWindow(QMainWindow):
     def closeEvent(self, event):
         """關閉視窗事件"""
         if self.process_thread and self.process_thread.isRunning():
+            if self.close_requested:
+                # 已要求停止，等待目前的檔案與輸出寫入完成
+                event.ignore()
+                return
+
             reply = QMessageBox.question(
                 self,
                 "確認",
-                "處理尚未完成，確定要關閉嗎？",
+                "處理尚未完成，要在目前的檔案處理完後停止並關閉嗎？\n"
+                "已處理的結果會先寫入輸出。",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
                 QMessageBox.StandardButton.No,
             )
 
-            if reply == QMessageBox.StandardButton.No:
-                event.ignore()
-                return
-
-            self.process_thread.terminate()
+            # 不強制終止執行緒，以免 SQLite/Excel 只寫入一半
+            event.ignore()
+            if reply == QMessageBox.StandardButton.Yes:
+                self.close_requested = True
+                self.stop_processing()
+                self.statusBar().showMessage("停止中，完成後自動關閉...")
+            return
 
         event.accept()
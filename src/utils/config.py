@@ -3,6 +3,7 @@
 配置模組 — 使用 Pydantic BaseModel 多階層定義，模組層級單一實例 cfg
 """
 import os
+from typing import List
 
 from pydantic import BaseModel
 from ruamel.yaml import YAML
@@ -20,16 +21,68 @@ class PathConfig(BaseModel):
 class ProcessingConfig(BaseModel):
     default_time_interval: int = 30
     ocr_engine: str = "easyocr"
+    ocr_roi: str = "auto"
+    ocr_band_fraction: float = 0.15
+    ocr_max_width: int = 1280
+    ocr_batch_size: int = 8
+    ocr_prewarm: bool = True
     oi_max_one: bool = True
+    num_workers: int = 1
+    worker_mode: str = "thread"
+    fast_exif: bool = True
+    exif_cache: bool = True
+    exif_cache_max_entries: int = 1000000
+    ocr_cache: bool = True
+    ocr_cache_max_entries: int = 100000
+    incremental: bool = False
+    stream: bool = False
+    stream_chunk_size: int = 10000
+    scan_include: List[str] = []
+    scan_exclude: List[str] = []
+    scan_max_depth: int = -1
+    checkpoint: bool = True
+    checkpoint_interval: int = 5000
+
+    def ocr_options(self) -> dict:
+        """轉換為 OCRDetector 的參數"""
+        return {
+            "roi_mode": self.ocr_roi,
+            "band_fraction": self.ocr_band_fraction,
+            "max_width": self.ocr_max_width,
+        }
+
+    def scan_options(self) -> dict:
+        """轉換為 ExifReader.iter_directory 的參數"""
+        return {
+            "include": list(self.scan_include),
+            "exclude": list(self.scan_exclude),
+            "max_depth": self.scan_max_depth if self.scan_max_depth >= 0 else None,
+        }
 
 
 class DatabaseConfig(BaseModel):
     save_access_db: bool = True
     save_sqlite: bool = True
     access_db_name: str = "exif_data.accdb"
+    access_chunk_size: int = 1000
+    access_fast_executemany: bool = True
+    access_conn_str: str = ""
     sqlite_db_name: str = "exif_data.sqlite"
+    sqlite_chunk_size: int = 10000
     excel_file_name: str = "exif_data.xlsx"
     csv_file_name: str = "exif_data.csv"
+    exif_cache_name: str = "exif_cache.sqlite"
+    ocr_cache_name: str = "ocr_cache.sqlite"
+    batch_db_name: str = "batch_jobs.sqlite"
+    checkpoint_name: str = "checkpoint.sqlite"
+
+    def access_options(self) -> dict:
+        """轉換為 AccessDB 的參數"""
+        return {
+            "chunk_size": self.access_chunk_size,
+            "fast_executemany": self.access_fast_executemany,
+            "conn_str": self.access_conn_str or None,
+        }
 
 
 # ── 頂層 Model ──────────────────────────────────────────────
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+日期時間字串解析模組
+
+相機與 CSV 參考檔的時間格式固定，先以預先編譯的正規表示式轉為整數，
+無法處理的字串才交給 strptime，結果與原本逐一嘗試 strptime 相同。
+"""
+import re
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+
+# EXIF 與相機軟體輸出的固定寬度格式: 2020:03:15 15:38:10
+EXIF_FORMAT = "%Y:%m:%d %H:%M:%S"
+
+# CSV 參考檔支援的格式（日期以冒號分隔時先轉為斜線）
+CSV_FORMATS = (
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d %H:%M",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M",
+)
+
+_COLON_DATE = re.compile(r"^(\d{4}):(\d{1,2}):(\d{1,2})")
+# 固定寬度: 2020:03:15 15:38:10
+_EXIF_PATTERN = re.compile(
+    r"([0-9]{4}):([0-9]{2}):([0-9]{2}) ([0-9]{2}):([0-9]{2}):([0-9]{2})"
+)
+# 固定寬度，日期以 / - : 分隔 (分隔符號需一致)
+_FIXED_WIDTH = re.compile(
+    r"([0-9]{4})([/:-])([0-9]{2})\2([0-9]{2}) ([0-9]{2}):([0-9]{2}):([0-9]{2})"
+)
+# 2020/6/22 09:40:5、2020-06-22 09:40、2020:06:22 09:40:12
+_FLEXIBLE = re.compile(
+    r"([0-9]{4})([/:-])([0-9]{1,2})\2([0-9]{1,2}) "
+    r"([0-9]{1,2}):([0-9]{1,2})(?::([0-9]{1,2}))?"
+)
+
+
+def parse_exif_datetime(value: str) -> Optional[datetime]:
+    """
+    解析 EXIF 日期時間，等同 datetime.strptime(value, EXIF_FORMAT)
+
+    Args:
+        value: EXIF 標籤字串
+
+    Returns:
+        日期時間，格式不符則返回 None
+    """
+    match = _EXIF_PATTERN.fullmatch(value)
+    if match is not None:
+        try:
+            return datetime(*map(int, match.groups()))
+        except ValueError:
+            # 數值超出範圍 (如 13 月)，strptime 同樣會失敗
+            return None
+    try:
+        return datetime.strptime(value, EXIF_FORMAT)
+    except ValueError:
+        return None
+
+
+def _pattern_parser(pattern: re.Pattern) -> Callable[[str], Optional[datetime]]:
+    """建立以 pattern 解析的函式，pattern 的第 2 組為日期分隔符號，秒可省略"""
+
+    def parse(value: str) -> Optional[datetime]:
+        match = pattern.fullmatch(value)
+        if match is None:
+            return None
+        year, _, month, day, hour, minute, second = match.groups()
+        try:
+            return datetime(
+                int(year), int(month), int(day), int(hour), int(minute),
+                int(second or 0),
+            )
+        except ValueError:
+            return None
+
+    return parse
+
+
+class DateTimeParser:
+    """
+    CSV 參考檔的日期時間解析器
+
+    同一欄的格式通常相同，記住上一次成功的解析方式並優先嘗試；
+    每個 CSV 欄位使用各自的實例。
+
+    支援格式:
+    - 2020/6/22 09:40:5
+    - 2020/06/22 09:40
+    - 2020:06:22 09:40:12
+    - 2020-06-22 09:40:12
+    """
+
+    def __init__(self):
+        self._parsers: List[Callable[[str], Optional[datetime]]] = [
+            _pattern_parser(_FIXED_WIDTH),
+            _pattern_parser(_FLEXIBLE),
+        ]
+        self._formats = list(CSV_FORMATS)
+
+    def parse(self, value: str) -> Optional[datetime]:
+        """
+        解析日期時間字串
+
+        Args:
+            value: 日期時間字串，前後空白會被移除
+
+        Returns:
+            日期時間，無法解析則返回 None
+        """
+        value = value.strip()
+        for i, parser in enumerate(self._parsers):
+            dt = parser(value)
+            if dt is not None:
+                if i:
+                    # 將成功的解析方式移到最前面
+                    self._parsers.insert(0, self._parsers.pop(i))
+                return dt
+        # 快速路徑都不符合時（如兩個空白、空白補位的日），結果以 strptime 為準
+        return self._parse_with_strptime(value)
+
+    def _parse_with_strptime(self, value: str) -> Optional[datetime]:
+        """原本的解析方式: 日期的冒號轉為斜線後依序嘗試 CSV_FORMATS"""
+        value = _COLON_DATE.sub(r"\1/\2/\3", value)
+        for i, fmt in enumerate(self._formats):
+            try:
+                dt = datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if i:
+                self._formats.insert(0, self._formats.pop(i))
+            return dt
+        return None
+
+
+def parse_datetime_column(values: Iterable[str]) -> List[Optional[datetime]]:
+    """
+    解析整欄 CSV 日期時間字串，同一欄共用一個 DateTimeParser
+
+    pd.to_datetime 會將 60 秒進位、接受 0 年與非 ASCII 數字，結果與原本不同，
+    因此以預先編譯的正規表示式逐筆解析
+
+    Args:
+        values: 日期時間字串
+
+    Returns:
+        與 values 順序相同的日期時間列表，無法解析者為 None
+    """
+    parse = DateTimeParser().parse
+    return [parse(value) for value in values]
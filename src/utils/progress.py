@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+處理進度與取消模組
+
+PhotoProcessor 以 progress_callback 回報各階段進度（完成數/總數、速度、剩餘時間），
+並在每個檔案之間檢查 CancelToken，取消時處理完目前的檔案就停止，
+已處理的記錄照常完成後處理並寫入輸出。
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Optional
+
+# 處理階段
+STAGE_PROCESS = "process"
+STAGE_OCR = "ocr"
+STAGE_POSTPROCESS = "postprocess"
+# 寫入輸出（由呼叫端回報）
+STAGE_WRITE = "write"
+
+
+@dataclass
+class ProgressInfo:
+    """單一階段的進度"""
+
+    stage: str
+    done: int
+    # 總數未知（如背景計數尚未完成）時為 None
+    total: Optional[int] = None
+    # 此階段開始至今的秒數
+    elapsed: float = 0.0
+    # 每秒完成數
+    rate: float = 0.0
+    # 預估剩餘秒數，無法預估時為 None
+    eta: Optional[float] = None
+
+
+class CancelToken:
+    """跨執行緒的取消旗標"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        """要求停止（處理完目前的檔案後）"""
+        self._event.set()
+
+    def reset(self):
+        """清除取消要求"""
+        self._event.clear()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+class ProgressReporter:
+    """計算速度與剩餘時間並呼叫 progress_callback，未設定 callback 時不做任何事"""
+
+    def __init__(self, callback: Optional[Callable[[ProgressInfo], None]] = None,
+                 min_interval: float = 0.2):
+        """
+        Args:
+            callback: 進度回報函式
+            min_interval: 同一階段兩次回報的最短間隔（秒），避免每個檔案都更新介面
+        """
+        self.callback = callback
+        self.min_interval = min_interval
+        # 階段 -> 開始時間
+        self._starts: Dict[str, float] = {}
+        self._last_stage = None
+        self._last_time = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.callback is not None
+
+    def reset(self):
+        """開始新的處理"""
+        self._starts.clear()
+        self._last_stage = None
+
+    def report(self, stage: str, done: int, total: Optional[int] = None,
+               force: bool = False):
+        """
+        回報進度
+
+        Args:
+            stage: 處理階段
+            done: 已完成數
+            total: 總數，未知時為 None
+            force: 不受 min_interval 限制（階段開始、結束時）
+        """
+        if self.callback is None:
+            return
+
+        now = time.perf_counter()
+        if (
+            not force
+            and stage == self._last_stage
+            and now - self._last_time < self.min_interval
+        ):
+            return
+        self._last_stage = stage
+        self._last_time = now
+
+        elapsed = now - self._starts.setdefault(stage, now)
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if total is not None and rate > 0:
+            eta = max(0, total - done) / rate
+        self.callback(ProgressInfo(stage, done, total, elapsed, rate, eta))
+
+
+class BackgroundCount:
+    """在背景執行緒計算總數（如要處理的檔案數），完成前 total 為 None"""
+
+    def __init__(self, items: Callable[[], Iterable],
+                 cancel_token: Optional[CancelToken] = None):
+        """
+        Args:
+            items: 產生要計數項目的函式（在背景執行緒中呼叫）
+            cancel_token: 取消時停止計數
+        """
+        self.items = items
+        self.cancel_token = cancel_token
+        self.total: Optional[int] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        """開始計數"""
+        threading.Thread(target=self._run, name="count", daemon=True).start()
+
+    def stop(self):
+        """不再需要總數（處理已結束），計數中則停止"""
+        self._stop.set()
+
+    def _stopped(self) -> bool:
+        return self._stop.is_set() or (
+            self.cancel_token is not None and self.cancel_token.cancelled
+        )
+
+    def _run(self):
+        count = 0
+        for _ in self.items():
+            if self._stopped():
+                return
+            count += 1
+        self.total = count
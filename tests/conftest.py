@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+測試共用設定
+
+照片以空檔案代替，EXIF 由 fake_exif 提供，不需要實際的 JPEG 與 OCR 引擎
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from src.exif.exif_reader import ExifReader  # noqa: E402
+
+
+@pytest.fixture
+def fake_exif(monkeypatch):
+    """
+    以字典取代 ExifReader.read_exif
+
+    Returns:
+        {檔案絕對路徑: EXIF 欄位}，未列出的檔案只有預設欄位（缺少日期、Camera_ID）
+    """
+    exif_by_path = {}
+
+    def read_exif(self, file_path):
+        exif_data = {
+            "SourceFile": os.path.basename(file_path),
+            "FilePath": file_path,
+            "DateTimeOriginal": None,
+            "Camera_ID": None,
+            "Site": None,
+            "Plot_ID": None,
+            "Group": None,
+            "Species": None,
+            "Number": 1,
+            "BytesRead": 0,
+        }
+        exif_data.update(exif_by_path.get(os.path.abspath(file_path), {}))
+        return exif_data
+
+    monkeypatch.setattr(ExifReader, "read_exif", read_exif)
+    return exif_by_path
+
+
+@pytest.fixture
+def photo_tree(tmp_path, fake_exif):
+    """
+    建立相機資料夾與照片（空檔案）
+
+    Returns:
+        make(cameras) -> 根目錄；cameras 為 {相機: 照片數}，照片間隔 10 分鐘
+    """
+    root = tmp_path / "photos"
+
+    def make(cameras):
+        for camera_id, count in cameras.items():
+            folder = root / camera_id
+            folder.mkdir(parents=True, exist_ok=True)
+            for i in range(count):
+                path = folder / f"{camera_id}_{i:04d}.JPG"
+                path.write_bytes(b"")
+                fake_exif[str(path)] = {
+                    "DateTimeOriginal": datetime(2024, 1, 1, 8) + timedelta(minutes=10 * i),
+                    "Camera_ID": camera_id,
+                    "Site": "S1",
+                    "Plot_ID": "P1",
+                    "Group": "Mammal",
+                    "Species": "Muntjac" if i % 3 else "Sambar",
+                }
+        return str(root)
+
+    return make
+
+
+@pytest.fixture
+def cli_module(tmp_path, monkeypatch):
+    """
+    匯入 cli.py
+
+    設定檔在匯入時以目前目錄的 cfg/config.yaml 載入（不存在時建立），
+    先切換到暫存目錄，不影響專案目錄
+    """
+    monkeypatch.chdir(tmp_path)
+    import cli
+
+    return cli
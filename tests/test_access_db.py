@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+"""
+AccessDB 以假的 pyodbc 連接測試（實際寫入 SQLite 記憶體資料庫）
+
+未安裝 pyodbc 時以只有 Error 的模組代替，Access 的 SQL 方言由 FakeCursor 轉換
+"""
+import sqlite3
+import sys
+import types
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+
+if "pyodbc" not in sys.modules:
+    try:
+        import pyodbc  # noqa: F401
+    except ImportError:
+        fake_pyodbc = types.ModuleType("pyodbc")
+        fake_pyodbc.Error = type("Error", (Exception,), {})
+        sys.modules["pyodbc"] = fake_pyodbc
+
+from src.database import access_db  # noqa: E402
+from src.database.access_db import AccessDB  # noqa: E402
+from src.database.schema import PhotoRecord, record_to_row  # noqa: E402
+
+CREATE_TABLE_SQL = """
+CREATE TABLE file_record (
+    ID INTEGER PRIMARY KEY AUTOINCREMENT,
+    SourceFile TEXT, DateTimeOriginal TEXT, Date TEXT, Time TEXT, Site TEXT,
+    Plot_ID TEXT, Camera_ID TEXT, "Group" TEXT, Species TEXT, Number INTEGER,
+    Note TEXT, IndependentPhoto INTEGER, CreateDate TEXT, period_start TEXT,
+    period_end TEXT
+)
+"""
+
+
+class FakeCursor:
+    """pyodbc cursor 的替代，錯誤轉為 pyodbc.Error"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.cursor = connection.db.cursor()
+        self.fast_executemany = False
+
+    def execute(self, sql, params=()):
+        sql = sql.replace("SELECT TOP 1 *", "SELECT *")
+        self.connection.check(sql, [params])
+        try:
+            self.cursor.execute(sql, params)
+        except sqlite3.Error as e:
+            raise access_db.pyodbc.Error(str(e))
+
+    def executemany(self, sql, params):
+        params = list(params)
+        self.connection.calls.append((sql, len(params), self.fast_executemany))
+        if self.fast_executemany and self.connection.reject_fast_executemany:
+            raise access_db.pyodbc.Error("HYC00", "Optional feature not implemented")
+        if self.connection.transient_errors:
+            self.connection.transient_errors -= 1
+            raise access_db.pyodbc.Error("HY000", "Could not update; currently locked")
+        self.connection.check(sql, params)
+        try:
+            self.cursor.executemany(sql, params)
+        except sqlite3.Error as e:
+            raise access_db.pyodbc.Error(str(e))
+
+    def close(self):
+        self.cursor.close()
+
+
+class FakeConnection:
+    """
+    pyodbc connection 的替代
+
+    bad_files 中的 SourceFile 寫入時失敗；reject_fast_executemany 模擬不支援
+    參數陣列的 ODBC 驅動程式；前 transient_errors 次 executemany 模擬暫時性錯誤
+    """
+
+    def __init__(self, bad_files=(), reject_fast_executemany=False, transient_errors=0):
+        self.db = sqlite3.connect(":memory:", check_same_thread=False)
+        self.db.execute(CREATE_TABLE_SQL)
+        self.bad_files = set(bad_files)
+        self.reject_fast_executemany = reject_fast_executemany
+        self.transient_errors = transient_errors
+        # executemany 呼叫: (SQL, 列數, fast_executemany)
+        self.calls = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    def check(self, sql, params):
+        if "INSERT" in sql and any(row[0] in self.bad_files for row in params):
+            raise access_db.pyodbc.Error("bad row")
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.commits += 1
+        self.db.commit()
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.db.rollback()
+
+    def close(self):
+        pass
+
+    def rows(self, *columns):
+        names = ", ".join(f'"{column}"' for column in columns)
+        return self.db.execute(f"SELECT {names} FROM file_record ORDER BY ID").fetchall()
+
+
+def _record(name, camera_id="CAM1", species="Muntjac", minute=0):
+    return PhotoRecord(
+        SourceFile=name,
+        DateTimeOriginal=datetime(2024, 1, 1, 8, minute),
+        Camera_ID=camera_id,
+        Species=species,
+        IndependentPhoto=1,
+        period_start=datetime(2024, 1, 1, 8),
+        period_end=datetime(2024, 1, 1, 8, 30),
+    )
+
+
+def test_update_derived_fields_matches_null_camera_and_species():
+    records = [
+        _record("A.JPG"),
+        _record("B.JPG", camera_id=None),
+        _record("C.JPG", species=None),
+        _record("D.JPG", camera_id=None, species=None),
+        # 同名但不同相機，不應被更新
+        _record("A.JPG", camera_id="CAM2"),
+    ]
+    connection = FakeConnection()
+    with AccessDB("test.accdb", connection=connection) as db:
+        assert db.insert_records_batch(records) == []
+
+        updated = [
+            replace(record, IndependentPhoto=0, period_end=datetime(2024, 1, 2))
+            for record in records[:4]
+        ]
+        db.update_derived_fields(updated)
+
+    assert [row[0] for row in connection.rows("IndependentPhoto")] == [0, 0, 0, 0, 1]
+    assert [row[0][:10] for row in connection.rows("period_end")] == (
+        ["2024-01-02"] * 4 + ["2024-01-01"]
+    )
+
+
+def test_update_derived_fields_without_records_does_nothing():
+    connection = FakeConnection()
+    with AccessDB("test.accdb", connection=connection) as db:
+        db.update_derived_fields([])
+
+    assert connection.calls == []
+    assert connection.commits == 0
+
+
+@pytest.fixture
+def access_sink_connection(monkeypatch):
+    """讓 AccessSink 建立的 AccessDB 使用假的連接"""
+    connection = FakeConnection()
+    monkeypatch.setattr(access_db.pyodbc, "connect", lambda conn_str: connection,
+                        raising=False)
+    return connection
+
+
+def test_access_sink_applies_updated_records(access_sink_connection, tmp_path):
+    from src.database.output_sinks import build_output_sinks, write_outputs
+
+    existing = _record("A.JPG")
+    with AccessDB("test.accdb", conn_str="fake") as db:
+        db.insert_records_batch([existing])
+
+    new = _record("B.JPG", minute=5)
+    new.IndependentPhoto = 0
+    changed = replace(existing, period_end=datetime(2024, 1, 3))
+    sinks = build_output_sinks(
+        [new], [new], str(tmp_path / "out.csv"), str(tmp_path / "out.xlsx"),
+        access_db_path="test.accdb",
+        access_options={"conn_str": "fake"},
+        updated_records=[changed],
+    )
+    assert all(result.error is None for result in write_outputs(sinks))
+
+    rows = access_sink_connection.rows("SourceFile", "period_end")
+    assert [(name, end[:10]) for name, end in rows] == [
+        ("A.JPG", "2024-01-03"),
+        ("B.JPG", "2024-01-01"),
+    ]
+
+
+def _records(count, bad=()):
+    return [
+        _record(f"IMG_{i:04d}.JPG" if i not in bad else f"BAD_{i:04d}.JPG", minute=i % 60)
+        for i in range(count)
+    ]
+
+
+def _insert_calls(connection):
+    return [(rows, fast) for sql, rows, fast in connection.calls if "INSERT" in sql]
+
+
+def test_insert_batch_commits_each_chunk_with_fast_executemany():
+    connection = FakeConnection()
+    with AccessDB("test.accdb", chunk_size=4, connection=connection) as db:
+        assert db.insert_records_batch(_records(10)) == []
+
+    assert _insert_calls(connection) == [(4, True), (4, True), (2, True)]
+    assert connection.commits >= 3
+    assert connection.rollbacks == 0
+    assert [row[0] for row in connection.rows("SourceFile")] == [
+        f"IMG_{i:04d}.JPG" for i in range(10)
+    ]
+
+
+def test_insert_batch_chunk_size_argument_overrides_default():
+    connection = FakeConnection()
+    with AccessDB("test.accdb", chunk_size=4, connection=connection) as db:
+        db.insert_records_batch(_records(10), chunk_size=6)
+
+    assert _insert_calls(connection) == [(6, True), (4, True)]
+
+
+def test_fast_executemany_can_be_disabled():
+    connection = FakeConnection()
+    with AccessDB("test.accdb", chunk_size=4, fast_executemany=False,
+                  connection=connection) as db:
+        db.insert_records_batch(_records(5))
+
+    assert _insert_calls(connection) == [(4, False), (1, False)]
+
+
+def test_failed_chunk_is_retried_row_by_row():
+    records = _records(10, bad={5, 6})
+    connection = FakeConnection(bad_files={"BAD_0005.JPG", "BAD_0006.JPG"})
+    with AccessDB("test.accdb", chunk_size=4, connection=connection) as db:
+        failed = db.insert_records_batch(records)
+
+    # 只有壞掉的記錄寫入失敗，同一段的其他記錄逐筆重試後寫入
+    assert failed == [records[5], records[6]]
+    assert connection.rollbacks == 1
+    assert [row[0] for row in connection.rows("SourceFile")] == [
+        record.SourceFile for i, record in enumerate(records) if i not in (5, 6)
+    ]
+    # 重試中有失敗的記錄，表示不是驅動程式的問題，之後仍使用 fast_executemany
+    assert _insert_calls(connection) == [(4, True), (4, True), (2, True)]
+
+
+def test_driver_rejecting_fast_executemany_falls_back():
+    connection = FakeConnection(reject_fast_executemany=True)
+    with AccessDB("test.accdb", chunk_size=4, connection=connection) as db:
+        assert db.insert_rows([record_to_row(r) for r in _records(10)]) == []
+
+    # 驅動程式拒絕參數陣列時停用 fast_executemany，第一段以一般 executemany 重新寫入
+    assert _insert_calls(connection) == [(4, True), (4, False), (4, False), (2, False)]
+    assert connection.rollbacks == 1
+    assert len(connection.rows("SourceFile")) == 10
+
+
+def test_transient_error_keeps_fast_executemany():
+    connection = FakeConnection(transient_errors=1)
+    with AccessDB("test.accdb", chunk_size=4, connection=connection) as db:
+        assert db.insert_rows([record_to_row(r) for r in _records(10)]) == []
+
+    # 第一段逐筆重試全部成功，但錯誤不是拒絕參數陣列，之後仍使用 fast_executemany
+    assert _insert_calls(connection) == [(4, True), (4, True), (2, True)]
+    assert connection.rollbacks == 1
+    assert [row[0] for row in connection.rows("SourceFile")] == [
+        f"IMG_{i:04d}.JPG" for i in range(10)
+    ]
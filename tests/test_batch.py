@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+批次處理多個資料夾
+"""
+import argparse
+import csv
+import os
+import sqlite3
+
+from src.batch import SUMMARY_FILE_NAME, BatchJob, BatchJobTable, JobStats, run_batch
+from src.processor import PhotoProcessor
+
+
+def _csv_cameras(path):
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        return sorted(row["Camera_ID"] for row in csv.DictReader(f))
+
+
+def _summary(output_dir, field):
+    with open(os.path.join(output_dir, SUMMARY_FILE_NAME), encoding="utf-8-sig") as f:
+        return {
+            os.path.basename(row["input"]): row[field]
+            for row in csv.DictReader(f)
+        }
+
+
+def _run_cli_batch(cli, root, tmp_path, processor=None):
+    output_dir = str(tmp_path / "out")
+    db_dir = str(tmp_path / "db")
+    outputs = cli.DirectoryOutputs(
+        sqlite_db_path=os.path.join(db_dir, "photos.sqlite"),
+        access_db_path=None,
+        incremental=True,
+        stream=False,
+    )
+    args = argparse.Namespace(
+        batch=os.path.join(root, "Site*"), output=output_dir, batch_reset=False
+    )
+    failed = cli._run_batch(
+        processor or PhotoProcessor(), args, outputs, db_dir, cli.getUniqueLogger()
+    )
+    return failed, output_dir
+
+
+def test_incremental_batch_exports_only_each_folders_records(
+    cli_module, photo_tree, tmp_path
+):
+    cli = cli_module
+    root = photo_tree({"SiteA": 3, "SiteB": 1})
+
+    failed, output_dir = _run_cli_batch(cli, root, tmp_path)
+
+    assert failed == 0
+    csv_name = cli.cfg.database.csv_file_name
+    assert _csv_cameras(os.path.join(output_dir, "SiteA", csv_name)) == ["SiteA"] * 3
+    assert _csv_cameras(os.path.join(output_dir, "SiteB", csv_name)) == ["SiteB"]
+    assert _summary(output_dir, "records") == {"SiteA": "3", "SiteB": "1"}
+
+
+def test_batch_summary_counts_ocr_files(cli_module, photo_tree, fake_exif, tmp_path, caplog):
+    root = photo_tree({"SiteA": 2, "SiteB": 3})
+    # SiteB 有兩張照片缺少日期，需要 OCR
+    for i in (0, 2):
+        del fake_exif[os.path.join(root, "SiteB", f"SiteB_{i:04d}.JPG")]["DateTimeOriginal"]
+    processor = PhotoProcessor()
+    processor.ocr_detector.prewarm = lambda: None
+    processor.ocr_detector.detect_datetimes_batch = (
+        lambda image_paths, batch_size=None, region_keys=None: [None] * len(image_paths)
+    )
+
+    failed, output_dir = _run_cli_batch(cli_module, root, tmp_path, processor)
+
+    assert failed == 0
+    assert _summary(output_dir, "ocr_files") == {"SiteA": "0", "SiteB": "2"}
+    assert "1 of 2 folders needed no OCR" in caplog.text
+
+
+def test_job_table_from_older_version_gains_ocr_files(tmp_path):
+    table_path = str(tmp_path / "batch.sqlite")
+    connection = sqlite3.connect(table_path)
+    connection.execute(
+        "CREATE TABLE batch_job (batch_id TEXT, input TEXT, output TEXT, "
+        "position INTEGER, status TEXT, files INTEGER, records INTEGER, "
+        "warnings INTEGER, seconds REAL, error TEXT, started_at TEXT, "
+        "finished_at TEXT, PRIMARY KEY (batch_id, input))"
+    )
+    connection.commit()
+    connection.close()
+
+    jobs = [BatchJob("/photos/A", "/out/A"), BatchJob("/photos/B", "/out/B")]
+    with BatchJobTable(table_path) as table:
+        rows = run_batch(
+            jobs, table, "batch",
+            lambda job: JobStats(files=1, ocr_files=int(job.input.endswith("B"))),
+        )
+
+    assert [(row["status"], row["ocr_files"]) for row in rows] == [("done", 0), ("done", 1)]
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+停止後以 resume 繼續處理，資料庫中的記錄不可重複
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.database.checkpoint_journal import CheckpointJournal
+from src.database.sqlite_db import SQLiteDB
+from src.processor import PhotoProcessor
+
+CAMERAS = {"CAM1": 4, "CAM2": 4}
+FILE_COUNT = sum(CAMERAS.values())
+
+
+class StopAfter(PhotoProcessor):
+    """處理 stop_after 個檔案後要求停止（模擬介面上的停止按鈕）"""
+
+    stop_after = None
+
+    def _process_single_file(self, file_path, csv_index, exif_data=None):
+        result = super()._process_single_file(file_path, csv_index, exif_data)
+        self._stop_count = getattr(self, "_stop_count", 0) + 1
+        if self._stop_count == self.stop_after:
+            self.cancel_token.cancel()
+        return result
+
+
+def _outputs(cli, tmp_path, incremental, stream):
+    return cli.DirectoryOutputs(
+        sqlite_db_path=str(tmp_path / "db" / "photos.sqlite"),
+        access_db_path=None,
+        incremental=incremental,
+        stream=stream,
+    )
+
+
+def _rows(sqlite_db_path):
+    with SQLiteDB(sqlite_db_path) as db:
+        return sorted(
+            (record.Camera_ID, record.SourceFile, record.Species,
+             record.IndependentPhoto)
+            for record in db.get_all_records()
+        )
+
+
+def _run(cli, processor, input_dir, tmp_path, outputs):
+    return cli.run_directory(
+        processor, input_dir, str(tmp_path / "out"), outputs, cli.getUniqueLogger()
+    )
+
+
+@pytest.mark.parametrize(
+    "incremental,stream", [(True, False), (False, False), (False, True)]
+)
+@pytest.mark.parametrize("stop_after", [1, 3, 5])
+def test_resume_after_stop_writes_each_record_once(
+    cli_module, photo_tree, tmp_path, incremental, stream, stop_after
+):
+    cli = cli_module
+    input_dir = photo_tree(CAMERAS)
+    checkpoint_path = str(tmp_path / "db" / "checkpoint.sqlite")
+
+    # 未中斷的結果
+    clean = _outputs(cli, tmp_path / "clean", incremental, stream)
+    _run(cli, PhotoProcessor(), input_dir, tmp_path, clean)
+    expected = _rows(clean.sqlite_db_path)
+    assert len(expected) == FILE_COUNT
+
+    # 處理到一半停止，再由檢查點繼續
+    outputs = _outputs(cli, tmp_path, incremental, stream)
+    stopped = StopAfter(checkpoint_path=checkpoint_path, checkpoint_interval=2)
+    stopped.stop_after = stop_after
+    _run(cli, stopped, input_dir, tmp_path, outputs)
+    assert stopped.cancelled
+    assert len(stopped.processed_files) == stop_after
+
+    outputs.resume = True
+    resumed = PhotoProcessor(checkpoint_path=checkpoint_path, checkpoint_interval=2)
+    _run(cli, resumed, input_dir, tmp_path, outputs)
+    assert not resumed.cancelled
+
+    assert _rows(outputs.sqlite_db_path) == expected
+
+
+def test_restored_files_already_imported_are_skipped(photo_tree, tmp_path):
+    """增量處理時，檢查點中已寫入 SQLite 的檔案不會再讀回"""
+    input_dir = photo_tree(CAMERAS)
+    checkpoint_path = str(tmp_path / "checkpoint.sqlite")
+
+    stopped = StopAfter(checkpoint_path=checkpoint_path, checkpoint_interval=1)
+    stopped.stop_after = 3
+    with SQLiteDB(str(tmp_path / "photos.sqlite")) as db:
+        records, _ = stopped.process_directory_incremental(input_dir, db)
+        db.insert_records_batch(records)
+        db.mark_files_processed(stopped.processed_files)
+
+        resumed = PhotoProcessor(checkpoint_path=checkpoint_path)
+        new_records, _ = resumed.process_directory_incremental(
+            input_dir, db, resume=True
+        )
+
+    assert len(records) == 3
+    assert len(new_records) == FILE_COUNT - 3
+    assert not set(stopped.processed_files) & set(resumed.processed_files)
+
+
+def test_checkpoint_interval_counts_files(photo_tree, fake_exif, tmp_path, monkeypatch):
+    """檢查點依處理的檔案數保存，與每個檔案產生幾筆記錄無關"""
+    input_dir = photo_tree({"CAM1": 7})
+    animals = [{"Group": "Mammal", "Species": name} for name in ("Muntjac", "Sambar")]
+    for i, exif_data in enumerate(fake_exif.values()):
+        if i % 2:
+            # 一個檔案兩筆記錄
+            exif_data.update(has_multiple_animals=True, multiple_animals=animals)
+        elif i == 2:
+            # 沒有記錄的檔案
+            exif_data["Species"] = "unknown"
+
+    saved = []
+    append = CheckpointJournal.append
+    monkeypatch.setattr(
+        CheckpointJournal, "append",
+        lambda self, results: saved.append(len(results)) or append(self, results),
+    )
+
+    processor = PhotoProcessor(
+        checkpoint_path=str(tmp_path / "checkpoint.sqlite"), checkpoint_interval=3
+    )
+    records = processor.process_directory(input_dir)
+
+    assert len(records) == 9
+    assert saved == [3, 3, 1]
+
+
+def _fake_ocr(processor, stop_after_batches=None):
+    """以檔名編號當作 OCR 結果，stop_after_batches 個批次後要求停止"""
+    calls = []
+
+    def detect_datetimes_batch(image_paths, batch_size=8, region_keys=None):
+        calls.append(len(image_paths))
+        if len(calls) == stop_after_batches:
+            processor.cancel_token.cancel()
+        return [
+            datetime(2024, 2, 1) + timedelta(hours=int(path[-8:-4]))
+            for path in image_paths
+        ]
+
+    processor.ocr_detector.detect_datetimes_batch = detect_datetimes_batch
+    return calls
+
+
+def test_stop_during_ocr_keeps_finished_batches(photo_tree, fake_exif, tmp_path):
+    """OCR 佇列中停止時不等整個佇列，已辨識的檔案保存到檢查點"""
+    input_dir = photo_tree({"CAM1": 8})
+    for i, exif_data in enumerate(fake_exif.values()):
+        if i:
+            exif_data["DateTimeOriginal"] = None
+    checkpoint_path = str(tmp_path / "checkpoint.sqlite")
+    options = dict(
+        checkpoint_path=checkpoint_path, ocr_batch_size=2, ocr_prewarm=False
+    )
+
+    clean = PhotoProcessor(ocr_batch_size=2, ocr_prewarm=False)
+    _fake_ocr(clean)
+    expected = [
+        (r.SourceFile, r.DateTimeOriginal, r.IndependentPhoto)
+        for r in clean.process_directory(input_dir)
+    ]
+
+    stopped = PhotoProcessor(**options)
+    calls = _fake_ocr(stopped, stop_after_batches=1)
+    records = stopped.process_directory(input_dir)
+
+    assert calls == [2]
+    assert stopped.cancelled
+    # 有 EXIF 日期的第 1 個檔案與第 1 批 OCR 的 2 個檔案
+    assert [r.SourceFile for r in records] == [name for name, _, _ in expected[:3]]
+    assert len(stopped.processed_files) == 3
+
+    resumed = PhotoProcessor(**options)
+    calls = _fake_ocr(resumed)
+    records = resumed.process_directory(input_dir, resume=True)
+
+    assert calls == [2, 2, 1]
+    assert [
+        (r.SourceFile, r.DateTimeOriginal, r.IndependentPhoto) for r in records
+    ] == expected
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+datetime_parser 與原本 strptime 解析方式的差分測試
+
+_reference_* 取自 user-018 之前 PhotoProcessor._parse_datetime 與
+ExifReader 的 strptime 解析，作為結果正確性的參考
+"""
+import random
+import re
+from datetime import datetime
+
+import pytest
+
+from src.utils.datetime_parser import (
+    DateTimeParser,
+    parse_datetime_column,
+    parse_exif_datetime,
+)
+
+
+def _reference_csv(datetime_str: str):
+    datetime_str = datetime_str.strip()
+    datetime_str = re.sub(r"^(\d{4}):(\d{1,2}):(\d{1,2})", r"\1/\2/\3", datetime_str)
+    for fmt in (
+        "%Y/%m/%d %H:%M:%S",
+        "%Y/%m/%d %H:%M",
+        "%Y-%m-%d %H:%M:%S",
+        "%Y-%m-%d %H:%M",
+    ):
+        try:
+            return datetime.strptime(datetime_str, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _reference_exif(dt_str: str):
+    try:
+        return datetime.strptime(dt_str, "%Y:%m:%d %H:%M:%S")
+    except ValueError:
+        return None
+
+
+EDGE_CASES = [
+    # 一般格式
+    "2020:03:15 15:38:10",
+    "2020/06/22 09:40:05",
+    "2020-06-22 09:40:12",
+    "2020/06/22 09:40",
+    "2020-06-22 09:40",
+    # 個位數欄位
+    "2020/6/22 09:40:5",
+    "2020/6/2 9:4:5",
+    "2020:6:2 9:40:12",
+    "2020-6-2 9:40",
+    "2020:03:15 5:38:10",
+    # 前後空白與多餘字元
+    " 2020/06/22 09:40:05 ",
+    "2020/06/22 09:40:05\r\n",
+    "2020/06/22 09:40:05x",
+    "2020/06/22 09:40:05.5",
+    "2020:03:15 15:38:10Z",
+    "2020:03:15 15:38:10 ",
+    "2020/06/22 09:40:05:00",
+    # 不存在的日期與時間
+    "2020/02/30 09:40:05",
+    "2021/02/29 09:40",
+    "2020/13/01 09:40:05",
+    "2020/00/10 09:40:05",
+    "2020:03:15 24:00:00",
+    "2020:03:15 23:60:00",
+    "2020:03:15 23:59:60",
+    "0000:01:01 00:00:00",
+    # 分隔符號
+    "2020:06:22 09:40:12",
+    "2020/06:22 09:40:12",
+    "2020:06/22 09:40:12",
+    "2020-06/22 09:40:12",
+    "2020.06.22 09:40:12",
+    "2020/06/22T09:40:12",
+    "2020/06/22  09:40:12",
+    "2020/06/22\t09:40:12",
+    "2020/06/ 2 09:40:12",
+    # 截斷、空字串、非 ASCII 數字
+    "",
+    "2020",
+    "2020/06/22",
+    "2020/06/22 09",
+    "２０２０/06/22 09:40:12",
+    "20201/06/22 09:40:12",
+    "999/06/22 09:40:12",
+]
+
+
+@pytest.mark.parametrize("value", EDGE_CASES)
+def test_edge_cases_match_strptime(value):
+    assert DateTimeParser().parse(value) == _reference_csv(value)
+    assert parse_exif_datetime(value) == _reference_exif(value)
+
+
+def _random_value(rng: random.Random) -> str:
+    def num(lo, hi):
+        value = rng.randint(lo, hi)
+        return rng.choice([str(value), f"{value:02d}", f"{value:02d}", f"{value:2d}"])
+
+    sep = rng.choice("/-:/.")
+    sep2 = sep if rng.random() < 0.9 else rng.choice("/-:")
+    value = (
+        f"{rng.choice(['2020', '2024', '0000', '999'])}{sep}{num(0, 13)}{sep2}{num(0, 32)}"
+        f"{rng.choice([' ', ' ', ' ', '  ', 'T'])}{num(0, 25)}:{num(0, 61)}"
+    )
+    if rng.random() < 0.6:
+        value += f":{num(0, 61)}"
+    if rng.random() < 0.05:
+        value += rng.choice([".5", "Z", " ", "x"])
+    if rng.random() < 0.1:
+        value = rng.choice([" ", ""]) + value + rng.choice([" ", "\r\n", ""])
+    if rng.random() < 0.02:
+        value = value[: rng.randint(0, len(value))]
+    return value
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_values_match_strptime(seed):
+    rng = random.Random(seed)
+    values = [_random_value(rng) for _ in range(1000)]
+
+    # 同一欄共用一個解析器（會記住上一次成功的格式）
+    assert parse_datetime_column(values) == [_reference_csv(v) for v in values]
+    assert [parse_exif_datetime(v) for v in values] == [
+        _reference_exif(v) for v in values
+    ]
@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+"""
+EXIF 快取
+"""
+from src.exif.exif_cache import ExifCache
+from src.exif.exif_reader import ExifReader
+
+
+def test_failed_reads_are_not_cached(tmp_path, monkeypatch):
+    photo = tmp_path / "IMG_0001.JPG"
+    photo.write_bytes(b"\xff\xd8\xff\xd9")
+    reader = ExifReader(fast_path=False)
+
+    def broken_open(*args, **kwargs):
+        raise PermissionError("locked by another process")
+
+    monkeypatch.setattr("builtins.open", broken_open)
+    failed = reader.read_exif(str(photo))
+    monkeypatch.undo()
+    ok = reader.read_exif(str(photo))
+
+    assert "locked" in failed["Error"]
+    assert "Error" not in ok
+
+    with ExifCache(str(tmp_path / "cache.sqlite")) as cache:
+        cache.put(str(photo), failed)
+        cache.put(str(photo), {})
+        assert cache.get(str(photo)) is None
+
+        cache.put(str(photo), ok)
+        cached = cache.get(str(photo))
+        # 快取命中時不讀取檔案
+        assert cached.pop("BytesRead") == 0
+        assert cached == {key: value for key, value in ok.items() if key != "BytesRead"}
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+增量處理在沒有 processed_file 資料表的舊 SQLite 上的行為
+"""
+import os
+import sqlite3
+
+from src.database.sqlite_db import SQLiteDB
+from src.processor import PhotoProcessor
+
+
+def _make_legacy_db(db_path, records):
+    """寫入記錄後刪除 processed_file 與 legacy_import，模擬舊版建立的資料庫"""
+    with SQLiteDB(db_path) as db:
+        db.insert_records_batch(records)
+    connection = sqlite3.connect(db_path)
+    connection.execute("DROP TABLE processed_file")
+    connection.execute("DROP TABLE legacy_import")
+    connection.commit()
+    connection.close()
+
+
+def _file_names(db_path):
+    with SQLiteDB(db_path) as db:
+        return sorted(
+            (record.Camera_ID, record.SourceFile) for record in db.get_all_records()
+        )
+
+
+def test_first_incremental_run_skips_files_in_legacy_database(photo_tree, tmp_path):
+    root = photo_tree({"CAM1": 3, "CAM2": 2})
+    db_path = str(tmp_path / "db" / "photos.sqlite")
+    _make_legacy_db(db_path, PhotoProcessor().process_directory(root))
+
+    # 舊資料庫匯入後才新增的照片
+    photo_tree({"CAM1": 5, "CAM3": 1})
+
+    processor = PhotoProcessor()
+    with SQLiteDB(db_path) as db:
+        records, _ = processor.process_directory_incremental(root, db)
+        db.insert_records_batch(records)
+        db.mark_files_processed(processor.processed_files)
+
+    assert sorted((r.Camera_ID, r.SourceFile) for r in records) == [
+        ("CAM1", "CAM1_0003.JPG"),
+        ("CAM1", "CAM1_0004.JPG"),
+        ("CAM3", "CAM3_0000.JPG"),
+    ]
+    # 略過的舊檔案也標記為已匯入，之後以路徑比對
+    with SQLiteDB(db_path) as db:
+        assert len(db.get_processed_files()) == 8
+    assert len(_file_names(db_path)) == 8
+
+    processor = PhotoProcessor()
+    with SQLiteDB(db_path) as db:
+        records, _ = processor.process_directory_incremental(root, db)
+    assert records == []
+
+
+def test_legacy_match_uses_camera_id(photo_tree, fake_exif, tmp_path):
+    """不同相機的同名照片不是已匯入的檔案"""
+    root = photo_tree({"CAM1": 2})
+    db_path = str(tmp_path / "db" / "photos.sqlite")
+    _make_legacy_db(db_path, PhotoProcessor().process_directory(root))
+
+    # CAM2 資料夾中與 CAM1 同名的照片
+    folder = os.path.join(root, "CAM2")
+    os.makedirs(folder)
+    path = os.path.join(folder, "CAM1_0000.JPG")
+    open(path, "wb").close()
+    fake_exif[path] = {
+        **fake_exif[os.path.join(root, "CAM1", "CAM1_0000.JPG")],
+        "Camera_ID": "CAM2",
+    }
+
+    with SQLiteDB(db_path) as db:
+        records, _ = PhotoProcessor().process_directory_incremental(root, db)
+
+    assert [(r.Camera_ID, r.SourceFile) for r in records] == [("CAM2", "CAM1_0000.JPG")]
+
+
+def test_new_database_has_no_legacy_imports(tmp_path):
+    db_path = str(tmp_path / "db" / "photos.sqlite")
+    with SQLiteDB(db_path) as db:
+        assert db.get_legacy_imports() == set()
+
+
+def test_clear_table_forgets_legacy_imports(photo_tree, tmp_path):
+    root = photo_tree({"CAM1": 3})
+    db_path = str(tmp_path / "db" / "photos.sqlite")
+    _make_legacy_db(db_path, PhotoProcessor().process_directory(root))
+
+    with SQLiteDB(db_path) as db:
+        assert db.get_legacy_imports()
+        db.clear_table()
+        assert db.get_legacy_imports() == set()
+
+        records, _ = PhotoProcessor().process_directory_incremental(root, db)
+
+    assert sorted(r.SourceFile for r in records) == [
+        "CAM1_0000.JPG", "CAM1_0001.JPG", "CAM1_0002.JPG"
+    ]
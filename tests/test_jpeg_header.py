@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""
+JPEG 標頭快速讀取與 exifread 備援（以 PIL 產生的小圖片測試，不使用 fake_exif）
+"""
+import io
+import os
+import random
+import struct
+from datetime import datetime
+
+import exifread
+import pytest
+from PIL import Image
+
+from src.exif.exif_reader import ExifReader
+from src.exif.jpeg_header import EXIF_PREFIX, XMP_PREFIX, read_jpeg_header
+
+_TAG_DATETIME = 0x0132
+_TAG_EXIF_IFD = 0x8769
+_TAG_DATETIME_ORIGINAL = 0x9003
+_TAG_DATETIME_DIGITIZED = 0x9004
+
+
+def _jpeg(size=(16, 16), noise=False, exif=None) -> bytes:
+    """以 PIL 產生 JPEG（含 APP0 JFIF）"""
+    image = Image.new("RGB", size, (90, 120, 60))
+    if noise:
+        rng = random.Random(0)
+        image.putdata([
+            (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+            for _ in range(size[0] * size[1])
+        ])
+    buffer = io.BytesIO()
+    options = {"exif": exif} if exif is not None else {}
+    image.save(buffer, "JPEG", quality=95, **options)
+    return buffer.getvalue()
+
+
+def _insert_app1(jpeg: bytes, *payloads: bytes) -> bytes:
+    """在 SOI 之後插入 APP1 segment"""
+    segments = b"".join(
+        b"\xff\xe1" + struct.pack(">H", len(payload) + 2) + payload
+        for payload in payloads
+    )
+    return jpeg[:2] + segments + jpeg[2:]
+
+
+def _tiff(byte_order: bytes, ifd0=None, exif_ifd=None) -> bytes:
+    """
+    產生只有 ASCII 標籤的 TIFF 結構
+
+    Args:
+        byte_order: b"II" 或 b"MM"
+        ifd0: IFD0 的 {標籤: 字串}
+        exif_ifd: Exif sub-IFD 的 {標籤: 字串}，有值時 IFD0 加上指向它的標籤
+    """
+    endian = "<" if byte_order == b"II" else ">"
+    ifd0 = dict(ifd0 or {})
+    exif_ifd = dict(exif_ifd or {})
+
+    ifd0_size = 2 + 12 * (len(ifd0) + bool(exif_ifd)) + 4
+    exif_offset = 8 + ifd0_size
+    data_offset = exif_offset + (2 + 12 * len(exif_ifd) + 4 if exif_ifd else 0)
+    data = b""
+
+    def ifd(tags, extra=()):
+        nonlocal data
+        entries = []
+        for tag, text in sorted(tags.items()):
+            raw = text.encode("ascii") + b"\x00"
+            if len(raw) <= 4:
+                value = struct.unpack(endian + "I", raw.ljust(4, b"\x00"))[0]
+            else:
+                value = data_offset + len(data)
+                data += raw
+            entries.append(struct.pack(endian + "HHII", tag, 2, len(raw), value))
+        entries.extend(struct.pack(endian + "HHII", tag, 4, 1, value) for tag, value in extra)
+        return struct.pack(endian + "H", len(entries)) + b"".join(entries) + b"\x00" * 4
+
+    first = ifd(ifd0, [(_TAG_EXIF_IFD, exif_offset)] if exif_ifd else [])
+    second = ifd(exif_ifd) if exif_ifd else b""
+    header = byte_order + struct.pack(endian + "HI", 42, 8)
+    return header + first + second + data
+
+
+def _xmp(hierarchical_subject, subject=()) -> bytes:
+    def bag(element, items):
+        lis = "".join(f"<rdf:li>{item}</rdf:li>" for item in items)
+        return f"<{element}><rdf:Bag>{lis}</rdf:Bag></{element}>"
+
+    xml = (
+        '<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF><rdf:Description>'
+        + bag("dc:subject", subject)
+        + bag("lr:hierarchicalSubject", hierarchical_subject)
+        + "</rdf:Description></rdf:RDF></x:xmpmeta>"
+    )
+    return XMP_PREFIX + xml.encode("utf-8")
+
+
+def _write(tmp_path, data: bytes, name="photo.jpg") -> str:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+@pytest.mark.parametrize("byte_order", [b"II", b"MM"])
+def test_datetimes_from_ifd0_and_exif_sub_ifd(tmp_path, byte_order):
+    tiff = _tiff(
+        byte_order,
+        ifd0={_TAG_DATETIME: "2024:05:06 07:08:09"},
+        exif_ifd={
+            _TAG_DATETIME_ORIGINAL: "2024:01:02 03:04:05",
+            _TAG_DATETIME_DIGITIZED: "2024:01:02 03:04:06",
+        },
+    )
+    path = _write(tmp_path, _insert_app1(_jpeg(), EXIF_PREFIX + tiff))
+
+    header = read_jpeg_header(path)
+    assert header["tags"] == {
+        "Image DateTime": "2024:05:06 07:08:09",
+        "EXIF DateTimeOriginal": "2024:01:02 03:04:05",
+        "EXIF DateTimeDigitized": "2024:01:02 03:04:06",
+    }
+    # DateTimeOriginal 優先於 IFD0 的 DateTime
+    assert ExifReader().read_exif(path)["DateTimeOriginal"] == datetime(2024, 1, 2, 3, 4, 5)
+
+
+def test_short_ascii_value_stored_inline(tmp_path):
+    """4 個位元組以內的值直接存放在 IFD entry 中"""
+    tiff = _tiff(b"MM", ifd0={_TAG_DATETIME: "abc"})
+    path = _write(tmp_path, _insert_app1(_jpeg(), EXIF_PREFIX + tiff))
+
+    assert read_jpeg_header(path)["tags"] == {"Image DateTime": "abc"}
+
+
+def test_exif_written_by_pil(tmp_path):
+    exif = Image.Exif()
+    exif[_TAG_DATETIME] = "2023:12:31 23:59:58"
+    exif.get_ifd(_TAG_EXIF_IFD)[_TAG_DATETIME_ORIGINAL] = "2023:12:31 23:59:59"
+    path = _write(tmp_path, _jpeg(exif=exif))
+
+    tags = read_jpeg_header(path)["tags"]
+    assert tags["EXIF DateTimeOriginal"] == "2023:12:31 23:59:59"
+    assert tags["Image DateTime"] == "2023:12:31 23:59:58"
+
+
+def test_xmp_bags_with_xml_entities(tmp_path):
+    xmp = _xmp(
+        [
+            "1_Site ID|JC38",
+            "2_Animal|Mammal|Muntjac &amp; young",
+            "3_Number|2",
+            "4_Note|&lt;blurred&gt;",
+        ],
+        subject=["JC38", "Muntjac &amp; young"],
+    )
+    tiff = _tiff(b"II", exif_ifd={_TAG_DATETIME_ORIGINAL: "2024:01:02 03:04:05"})
+    path = _write(tmp_path, _insert_app1(_jpeg(), EXIF_PREFIX + tiff, xmp))
+
+    header = read_jpeg_header(path)
+    assert header["HierarchicalSubject"] == [
+        "1_Site ID|JC38",
+        "2_Animal|Mammal|Muntjac & young",
+        "3_Number|2",
+        "4_Note|<blurred>",
+    ]
+    assert header["Subject"] == ["JC38", "Muntjac & young"]
+
+    exif_data = ExifReader().read_exif(path)
+    assert (exif_data["Camera_ID"], exif_data["Site"], exif_data["Plot_ID"]) == (
+        "JC38", "JC", "38"
+    )
+    assert exif_data["Species"] == "Muntjac & young"
+
+
+def test_xmp_only(tmp_path):
+    path = _write(tmp_path, _insert_app1(_jpeg(), _xmp(["1_Site ID|AB12"])))
+
+    header = read_jpeg_header(path)
+    assert header["tags"] == {}
+    assert header["HierarchicalSubject"] == ["1_Site ID|AB12"]
+
+
+@pytest.fixture
+def exifread_calls(monkeypatch):
+    """記錄 exifread 備援被呼叫的檔案"""
+    calls = []
+    process_file = exifread.process_file
+
+    def spy(f, *args, **kwargs):
+        calls.append(f.name)
+        return process_file(f, *args, **kwargs)
+
+    monkeypatch.setattr(exifread, "process_file", spy)
+    return calls
+
+
+def test_jpeg_without_app1_falls_back_to_exifread(tmp_path, exifread_calls):
+    path = _write(tmp_path, _jpeg())
+
+    assert read_jpeg_header(path) is None
+    exif_data = ExifReader().read_exif(path)
+    assert exifread_calls == [path]
+    assert "Error" not in exif_data
+    assert exif_data["DateTimeOriginal"] is None
+
+
+def test_fast_path_does_not_call_exifread(tmp_path, exifread_calls):
+    tiff = _tiff(b"II", exif_ifd={_TAG_DATETIME_ORIGINAL: "2024:01:02 03:04:05"})
+    path = _write(tmp_path, _insert_app1(_jpeg(), EXIF_PREFIX + tiff))
+
+    ExifReader().read_exif(path)
+    assert exifread_calls == []
+
+
+@pytest.mark.parametrize("cut", [3, 5, 20])
+def test_truncated_segment_returns_none(tmp_path, exifread_calls, cut):
+    """segment 長度超過檔案結尾"""
+    tiff = _tiff(b"II", exif_ifd={_TAG_DATETIME_ORIGINAL: "2024:01:02 03:04:05"})
+    data = _insert_app1(_jpeg(), EXIF_PREFIX + tiff)
+    path = _write(tmp_path, data[:2 + 4 + len(EXIF_PREFIX) + cut])
+
+    assert read_jpeg_header(path) is None
+    # 快速路徑失敗時改用 exifread，不會拋出例外
+    ExifReader().read_exif(path)
+    assert exifread_calls == [path]
+
+
+def test_not_a_jpeg_returns_none(tmp_path):
+    assert read_jpeg_header(_write(tmp_path, b"GIF89a" + b"\x00" * 32)) is None
+    assert read_jpeg_header(_write(tmp_path, b"")) is None
+
+
+def test_bytes_read_stops_before_image_data(tmp_path):
+    tiff = _tiff(b"II", exif_ifd={_TAG_DATETIME_ORIGINAL: "2024:01:02 03:04:05"})
+    jpeg = _insert_app1(_jpeg((256, 256), noise=True), EXIF_PREFIX + tiff)
+    # APP1 之前有較大的 APP2 (如 ICC profile)，應以 seek 跳過而不讀取
+    icc = b"ICC_PROFILE\x00" + b"\x00" * 30000
+    jpeg = jpeg[:2] + b"\xff\xe2" + struct.pack(">H", len(icc) + 2) + icc + jpeg[2:]
+    path = _write(tmp_path, jpeg)
+    size = os.path.getsize(path)
+
+    header = read_jpeg_header(path)
+    assert header["tags"]["EXIF DateTimeOriginal"] == "2024:01:02 03:04:05"
+    assert 0 < header["bytes_read"] < 1000 < size
+    assert ExifReader().read_exif(path)["BytesRead"] == header["bytes_read"]
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 快取命中時不載入 OCR 引擎
+"""
+import os
+from datetime import datetime, timedelta
+
+from src.processor import PhotoProcessor
+
+
+def _no_date_photos(root, fake_exif, names):
+    """建立缺少日期的照片（內容不同，影像雜湊不同）"""
+    os.makedirs(root, exist_ok=True)
+    for name in names:
+        path = os.path.join(root, name)
+        with open(path, "wb") as f:
+            f.write(name.encode())
+        fake_exif[path] = {"Camera_ID": "CAM1", "Species": "Muntjac"}
+
+
+def _processor(cache_path):
+    """以假的 OCR 引擎處理，記錄 prewarm 與辨識的檔案"""
+    processor = PhotoProcessor(ocr_cache_path=cache_path)
+    detector = processor.ocr_detector
+    calls = {"prewarm": 0, "detected": []}
+
+    def prewarm():
+        calls["prewarm"] += 1
+
+    def detect_datetimes_batch(image_paths, batch_size=None, region_keys=None):
+        names = [os.path.basename(path) for path in image_paths]
+        calls["detected"] = sorted(calls["detected"] + names)
+        return [
+            datetime(2024, 1, 1) + timedelta(hours=int(name[4:8]))
+            for name in names
+        ]
+
+    detector.prewarm = prewarm
+    detector.detect_datetimes_batch = detect_datetimes_batch
+    return processor, calls
+
+
+def test_prewarm_only_after_cache_miss(tmp_path, fake_exif):
+    root = str(tmp_path / "photos")
+    cache_path = str(tmp_path / "cache" / "ocr.sqlite")
+    _no_date_photos(root, fake_exif, ["IMG_0001.JPG", "IMG_0002.JPG"])
+
+    processor, calls = _processor(cache_path)
+    first = processor.process_directory(root)
+    assert calls == {"prewarm": 1, "detected": ["IMG_0001.JPG", "IMG_0002.JPG"]}
+    assert processor.ocr_cache_stats == (0, 2)
+
+    # 全部命中快取，不載入也不執行 OCR
+    processor, calls = _processor(cache_path)
+    second = processor.process_directory(root)
+    assert calls == {"prewarm": 0, "detected": []}
+    assert processor.ocr_cache_stats == (2, 0)
+    assert sorted(r.DateTimeOriginal for r in second) == sorted(
+        r.DateTimeOriginal for r in first
+    )
+
+    # 新照片未命中時才載入
+    _no_date_photos(root, fake_exif, ["IMG_0003.JPG"])
+    processor, calls = _processor(cache_path)
+    third = processor.process_directory(root)
+    assert calls == {"prewarm": 1, "detected": ["IMG_0003.JPG"]}
+    assert processor.ocr_cache_stats == (2, 1)
+    assert sorted(r.DateTimeOriginal.hour for r in third) == [1, 2, 3]
+
+
+def test_prewarm_without_cache(tmp_path, fake_exif):
+    root = str(tmp_path / "photos")
+    _no_date_photos(root, fake_exif, ["IMG_0001.JPG", "IMG_0002.JPG"])
+
+    processor, calls = _processor(None)
+    processor.process_directory(root)
+
+    assert calls == {"prewarm": 1, "detected": ["IMG_0001.JPG", "IMG_0002.JPG"]}
+    assert processor.ocr_cache_stats is None
+
+
+def test_run_summary_reports_each_run(tmp_path, fake_exif, caplog):
+    """同一處理器處理多次時，OCR 統計只計算本次處理"""
+    root = str(tmp_path / "photos")
+    cache_path = str(tmp_path / "cache" / "ocr.sqlite")
+    _no_date_photos(root, fake_exif, ["IMG_0001.JPG", "IMG_0002.JPG"])
+    processor, _ = _processor(cache_path)
+
+    processor.process_directory(root)
+    assert "OCR: 2 files without date, 0 from OCR cache" in caplog.text
+    assert "OCR engine was not needed" not in caplog.text
+
+    caplog.clear()
+    processor.process_directory(root)
+    assert "OCR: 2 files without date, 2 from OCR cache" in caplog.text
+    assert "OCR engine was not needed for this run" in caplog.text
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+"""
+OCR 偵測器（不實際載入引擎）
+
+引擎的延遲載入與切換，以及以 StubOCR 代替 EasyOCR 測試日期帶順序、
+縮小、批次與已學習位置的座標換算
+"""
+import threading
+from datetime import datetime
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from src.ocr.ocr_detector import OCRDetector
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """
+    以記錄代替實際載入引擎
+
+    Returns:
+        (載入過的引擎列表, 允許載入完成的 Event)
+    """
+    loaded = []
+    release = threading.Event()
+    release.set()
+
+    def init(engine):
+        def load(self):
+            release.wait(5)
+            loaded.append(engine)
+            self._ocr = engine
+
+        return load
+
+    monkeypatch.setattr(OCRDetector, "_init_easyocr", init("easyocr"))
+    monkeypatch.setattr(OCRDetector, "_init_tesseract", init("tesseract"))
+    return loaded, release
+
+
+def test_switch_engine_does_not_load_the_old_engine(loads):
+    loads, _ = loads
+    detector = OCRDetector("easyocr")
+    detector.switch_engine("tesseract")
+
+    assert loads == []
+    assert detector.ocr == "tesseract"
+    assert loads == ["tesseract"]
+
+
+def test_switch_engine_waits_for_prewarm_and_allows_prewarm_again(loads):
+    loads, release = loads
+    detector = OCRDetector("easyocr")
+    release.clear()
+    detector.prewarm()
+    threading.Timer(0.05, release.set).start()
+
+    detector.switch_engine("tesseract")
+    assert loads == ["easyocr"]
+    assert not detector.initialized
+
+    # 新引擎也能在背景載入
+    detector.prewarm()
+    detector._prewarm_thread.join()
+    assert loads == ["easyocr", "tesseract"]
+    assert detector.ocr == "tesseract"
+
+
+class StubOCR:
+    """
+    代替 EasyOCR Reader，記錄收到的圖片
+
+    圖片中白色 (>230) 的區域視為日期戳記，返回其文字框與 text；
+    區域依平均灰階標記為 top (暗) / bottom (亮) / full (整張圖片的路徑)
+    """
+
+    def __init__(self, text="2024/01/02 03:04:05", recognize_text=None):
+        self.text = text
+        self.recognize_text = text if recognize_text is None else recognize_text
+        # (標記, 陣列尺寸)
+        self.reads = []
+        # readtext_batched 每次的 (圖片數, batch_size)
+        self.batches = []
+        # recognize 收到的 (陣列, horizontal_list)
+        self.recognized = []
+
+    def _read(self, image):
+        if isinstance(image, str):
+            with Image.open(image) as img:
+                array = np.asarray(img.convert("L"))
+            label = "full"
+        else:
+            array = image
+            mean = float(np.median(array))
+            label = "top" if mean < 90 else "bottom" if mean > 150 else "middle"
+        self.reads.append((label, array.shape))
+        ys, xs = np.nonzero(array > 230)
+        if not len(xs):
+            return []
+        x0, x1, y0, y1 = int(xs.min()), int(xs.max()), int(ys.min()), int(ys.max())
+        return [([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], self.text, 0.9)]
+
+    def readtext(self, image):
+        return self._read(image)
+
+    def readtext_batched(self, arrays, n_width=None, n_height=None, batch_size=1):
+        self.batches.append((len(arrays), batch_size))
+        return [self._read(array) for array in arrays]
+
+    def recognize(self, image, horizontal_list, free_list):
+        self.recognized.append((image, horizontal_list))
+        return [(None, self.recognize_text, 0.9)]
+
+    @property
+    def labels(self):
+        return [label for label, _ in self.reads]
+
+
+def _stamp_image(path, size=(400, 200), stamp=None):
+    """
+    上緣日期帶暗、下緣亮、中間灰的圖片，stamp 為白色日期戳記的像素範圍
+
+    Args:
+        stamp: (left, top, right, bottom)，None 表示沒有日期戳記
+    """
+    width, height = size
+    band = int(height * 0.15)
+    image = Image.new("L", size, 120)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, width, band - 1), fill=40)
+    draw.rectangle((0, height - band, width, height), fill=190)
+    if stamp:
+        draw.rectangle(stamp, fill=255)
+    image.convert("RGB").save(path, quality=95)
+    return str(path)
+
+
+def _detector(stub, **options):
+    detector = OCRDetector("easyocr", **options)
+    detector.ocr = stub
+    return detector
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_auto_mode_tries_bottom_then_top_then_full_frame(tmp_path, batched):
+    # 日期戳記在中間，日期帶都辨識不到
+    path = _stamp_image(tmp_path / "a.jpg", stamp=(150, 90, 250, 110))
+    stub = StubOCR()
+    detector = _detector(stub)
+
+    if batched:
+        result = detector.detect_datetimes_batch([path])[0]
+    else:
+        result = detector.detect_datetime_from_image(path)
+
+    assert result == datetime(2024, 1, 2, 3, 4, 5)
+    assert stub.labels == ["bottom", "top", "full"]
+
+
+def test_successful_band_is_tried_first(tmp_path):
+    top = _stamp_image(tmp_path / "top.jpg", stamp=(20, 5, 120, 20))
+    stub = StubOCR()
+    detector = _detector(stub)
+
+    detector.detect_datetime_from_image(top)
+    assert stub.labels == ["bottom", "top"]
+
+    stub.reads.clear()
+    detector.detect_datetime_from_image(top)
+    assert stub.labels == ["top"]
+
+
+@pytest.mark.parametrize("roi_mode, expected", [
+    ("bottom", ["bottom", "full"]),
+    ("top", ["top", "full"]),
+    ("full", ["full"]),
+])
+def test_fixed_roi_modes(tmp_path, roi_mode, expected):
+    path = _stamp_image(tmp_path / "a.jpg", stamp=(150, 90, 250, 110))
+    stub = StubOCR()
+
+    _detector(stub, roi_mode=roi_mode).detect_datetime_from_image(path)
+
+    assert stub.labels == expected
+
+
+def test_no_stamp_returns_none(tmp_path):
+    path = _stamp_image(tmp_path / "a.jpg")
+    stub = StubOCR()
+
+    assert _detector(stub).detect_datetimes_batch([path]) == [None]
+    assert stub.labels == ["bottom", "top", "full"]
+
+
+def test_band_crops_are_sent_in_batches(tmp_path):
+    paths = [
+        _stamp_image(tmp_path / f"{i}.jpg", stamp=(20, 180, 120, 195))
+        for i in range(5)
+    ]
+    stub = StubOCR()
+
+    results = _detector(stub).detect_datetimes_batch(paths, batch_size=2)
+
+    assert results == [datetime(2024, 1, 2, 3, 4, 5)] * 5
+    # 最後一批只有一張，直接以 readtext 辨識
+    assert stub.batches == [(2, 2), (2, 2)]
+    assert stub.labels == ["bottom"] * 5
+
+
+@pytest.mark.parametrize("suffix", [".jpg", ".png"])
+def test_large_image_is_downscaled_to_max_width(tmp_path, monkeypatch, suffix):
+    from PIL import JpegImagePlugin
+
+    drafts = []
+    draft = JpegImagePlugin.JpegImageFile.draft
+
+    def spy(self, mode, size):
+        drafts.append((mode, size))
+        return draft(self, mode, size)
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", spy)
+    path = _stamp_image(tmp_path / f"a{suffix}", size=(2000, 1000))
+    stub = StubOCR()
+
+    _detector(stub, roi_mode="bottom", max_width=500).detect_datetime_from_image(path)
+
+    # JPEG 解碼時即縮小，其他格式讀入後縮小
+    assert drafts == ([("L", (500, 250))] if suffix == ".jpg" else [])
+    label, (height, width) = stub.reads[0]
+    assert label == "bottom"
+    assert width == 500
+    assert abs(height - 1000 * 0.15 / 4) <= 2
+
+
+@pytest.mark.parametrize("suffix", [".jpg", ".png"])
+def test_learned_region_maps_back_to_the_same_pixels(tmp_path, suffix):
+    """在縮小後的日期帶學到的文字框，換算回另一張圖片後仍框住同一位置"""
+    stamp = (1210, 900, 1690, 950)
+    first = _stamp_image(tmp_path / f"first{suffix}", size=(2000, 1000), stamp=stamp)
+    second = _stamp_image(tmp_path / f"second{suffix}", size=(2000, 1000), stamp=stamp)
+    stub = StubOCR()
+    detector = _detector(stub, max_width=500)
+
+    assert detector.detect_datetimes_batch([first], region_keys=["CAM1"]) == [
+        datetime(2024, 1, 2, 3, 4, 5)
+    ]
+    stub.reads.clear()
+    assert detector.detect_datetimes_batch([second], region_keys=["CAM1"]) == [
+        datetime(2024, 1, 2, 3, 4, 5)
+    ]
+
+    # 只做文字辨識，不再偵測
+    assert stub.reads == []
+    assert detector.learned_region_hits == 1
+    (array, horizontal_list), = stub.recognized
+    # 裁切區域與整張圖片同樣縮小為 1/4
+    assert array.shape[1] < 2000 / 4
+    ys, xs = np.nonzero(array > 230)
+    expected = [xs.min(), xs.max() + 1, ys.min(), ys.max() + 1]
+    for got, want in zip(horizontal_list[0], expected):
+        assert abs(got - want) <= 2
+
+
+def test_learned_region_parse_failure_falls_back_to_detection(tmp_path):
+    stamp = (20, 180, 120, 195)
+    first = _stamp_image(tmp_path / "first.jpg", stamp=stamp)
+    second = _stamp_image(tmp_path / "second.jpg", stamp=stamp)
+    stub = StubOCR(recognize_text="--:--")
+    detector = _detector(stub)
+
+    detector.detect_datetime_from_image(first, region_key="CAM1")
+    stub.reads.clear()
+    result = detector.detect_datetime_from_image(second, region_key="CAM1")
+
+    assert result == datetime(2024, 1, 2, 3, 4, 5)
+    assert len(stub.recognized) == 1
+    assert detector.learned_region_misses == 1
+    assert stub.labels == ["bottom"]
+
+
+def test_learned_regions_are_per_group(tmp_path):
+    path = _stamp_image(tmp_path / "a.jpg", stamp=(20, 180, 120, 195))
+    stub = StubOCR()
+    detector = _detector(stub)
+
+    detector.detect_datetime_from_image(path, region_key="CAM1")
+    detector.detect_datetime_from_image(path, region_key="CAM2")
+    detector.detect_datetime_from_image(path)
+
+    # 只有 CAM1 第一張之後的同群組圖片才會直接辨識
+    assert stub.recognized == []
+    detector.detect_datetime_from_image(path, region_key="CAM2")
+    assert len(stub.recognized) == 1
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+postprocess_records 與改寫前的逐組迴圈比較（隨機記錄集合）
+
+_reference_* 取自 user-016 之前 PhotoProcessor 的
+_calculate_period_ranges、_calculate_independent_photos、_cap_oi_per_photo，
+作為結果正確性的參考，不要隨 postprocess.py 修改
+"""
+import copy
+import random
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from src.database.record_spool import RecordSpool
+from src.database.schema import PhotoRecord
+from src.postprocess import independent_flags, postprocess_records
+
+
+def _reference_periods(records: List[PhotoRecord]):
+    camera_groups = {}
+    for record in records:
+        camera_groups.setdefault(record.Camera_ID, []).append(record)
+    for group_records in camera_groups.values():
+        group_records.sort(key=lambda x: x.DateTimeOriginal)
+        period_start = group_records[0].DateTimeOriginal
+        period_end = group_records[-1].DateTimeOriginal
+        for record in group_records:
+            record.period_start = period_start
+            record.period_end = period_end
+
+
+def _reference_independent(records: List[PhotoRecord], time_interval: float):
+    groups = {}
+    for record in records:
+        groups.setdefault((record.Camera_ID, record.Species), []).append(record)
+    for group_records in groups.values():
+        group_records.sort(key=lambda x: x.DateTimeOriginal)
+        group_records[0].IndependentPhoto = 1
+        last_independent_time = group_records[0].DateTimeOriginal
+        for i in range(1, len(group_records)):
+            current_time = group_records[i].DateTimeOriginal
+            if current_time - last_independent_time >= timedelta(minutes=time_interval):
+                group_records[i].IndependentPhoto = 1
+                last_independent_time = current_time
+            else:
+                group_records[i].IndependentPhoto = 0
+
+
+def _reference_cap_oi(records: List[PhotoRecord]):
+    photo_groups: Dict[str, List[PhotoRecord]] = {}
+    for record in records:
+        photo_groups.setdefault(record.SourceFile, []).append(record)
+    for group_records in photo_groups.values():
+        independent_records = [r for r in group_records if r.IndependentPhoto == 1]
+        for r in independent_records[1:]:
+            r.IndependentPhoto = 0
+
+
+def _reference(records: List[PhotoRecord], time_interval: float, oi_max_one: bool):
+    _reference_periods(records)
+    _reference_independent(records, time_interval)
+    if oi_max_one:
+        _reference_cap_oi(records)
+
+
+def _random_records(rng: random.Random) -> List[PhotoRecord]:
+    """少量相機/物種/檔名，時間集中以產生大量同時間與間隔邊界的記錄"""
+    n = rng.randint(1, 200)
+    cameras = [None, "CAM1", "CAM2", "CAM3"][: rng.randint(1, 4)]
+    species = [None, "Muntjac", "Sambar", "Boar"][: rng.randint(1, 4)]
+    files = [f"IMG_{i:04d}.JPG" for i in range(rng.randint(1, n))]
+    start = datetime(2024, 1, 1)
+    step = rng.choice([timedelta(seconds=1), timedelta(minutes=1), timedelta(minutes=10)])
+    records = []
+    for _ in range(n):
+        dt = start + step * rng.randint(0, 300)
+        if rng.random() < 0.1:
+            dt += timedelta(microseconds=rng.randint(1, 999999))
+        records.append(PhotoRecord(
+            SourceFile=rng.choice(files),
+            DateTimeOriginal=dt,
+            Camera_ID=rng.choice(cameras),
+            Species=rng.choice(species),
+        ))
+    return records
+
+
+def _derived(records: List[PhotoRecord]):
+    return [
+        (record.IndependentPhoto, record.period_start, record.period_end)
+        for record in records
+    ]
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_postprocess_matches_reference_loops(seed):
+    rng = random.Random(seed)
+    records = _random_records(rng)
+    time_interval = rng.choice([0, 0.5, 1, 5, 30, 1440])
+    oi_max_one = rng.random() < 0.7
+
+    expected = copy.deepcopy(records)
+    _reference(expected, time_interval, oi_max_one)
+    postprocess_records(records, time_interval, oi_max_one=oi_max_one)
+
+    assert _derived(records) == _derived(expected)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_streaming_oi_cap_matches_reference(seed, tmp_path):
+    """串流處理先不限制 OI，全部寫入暫存檔後再於暫存檔中套用"""
+    rng = random.Random(seed)
+    records = _random_records(rng)
+
+    expected = copy.deepcopy(records)
+    _reference(expected, 30, oi_max_one=True)
+    postprocess_records(records, 30, oi_max_one=False)
+    with RecordSpool(str(tmp_path)) as spool:
+        spool.append(records)
+        spool.cap_independent_per_file()
+        capped = [record.IndependentPhoto for record in spool]
+
+    assert capped == [record.IndependentPhoto for record in expected]
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_independent_flags_matches_reference(seed):
+    rng = random.Random(seed)
+    group_sizes = [rng.randint(1, 50) for _ in range(rng.randint(1, 5))]
+    interval = rng.choice([0, 1, 7, 30])
+    groups = [sorted(rng.randint(0, 100) for _ in range(size)) for size in group_sizes]
+
+    expected = []
+    for times in groups:
+        last = times[0]
+        expected.append(1)
+        for t in times[1:]:
+            if t - last >= interval:
+                expected.append(1)
+                last = t
+            else:
+                expected.append(0)
+
+    starts = np.cumsum([0] + group_sizes[:-1])
+    times = np.array([t for group in groups for t in group], dtype=np.int64)
+    assert independent_flags(times, starts, interval).tolist() == expected
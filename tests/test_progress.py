@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+進度回報與停止
+"""
+import threading
+import time
+
+from src.processor import PhotoProcessor
+from src.utils.progress import STAGE_PROCESS, BackgroundCount, CancelToken
+
+
+def _wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_background_count():
+    release = threading.Event()
+
+    def items():
+        release.wait(5)
+        yield from range(3)
+
+    count = BackgroundCount(items)
+    count.start()
+    assert count.total is None
+    release.set()
+    _wait_for(lambda: count.total is not None)
+    assert count.total == 3
+
+
+def test_background_count_stops_on_cancel():
+    token = CancelToken()
+    token.cancel()
+    count = BackgroundCount(lambda: iter(range(3)), token)
+    count._run()
+    assert count.total is None
+
+
+def test_processing_starts_before_files_are_counted(photo_tree, monkeypatch):
+    """不等檔案計數完成就開始處理，計數完成後回報總數"""
+    input_dir = photo_tree({"CAM1": 6})
+    infos = []
+    counted = threading.Event()
+
+    def on_progress(info):
+        infos.append(info)
+        if info.stage == STAGE_PROCESS and info.done == 3:
+            counted.set()
+
+    count_files = PhotoProcessor._count_files
+
+    def slow_count_files(self, directory, skip_files):
+        count = count_files(self, directory, skip_files)
+        items = count.items
+
+        def wait_then_count():
+            counted.wait(5)
+            yield from items()
+
+        count.items = wait_then_count
+        return count
+
+    monkeypatch.setattr(PhotoProcessor, "_count_files", slow_count_files)
+    processor = PhotoProcessor(progress_callback=on_progress)
+    processor.progress.min_interval = 0
+
+    original = processor._process_single_file
+
+    def process_single_file(*args, **kwargs):
+        if counted.is_set():
+            # 等背景計數完成，確定之後的回報有總數
+            _wait_for(lambda: processor._file_count.total is not None)
+        return original(*args, **kwargs)
+
+    processor._process_single_file = process_single_file
+    records = processor.process_directory(input_dir)
+
+    assert len(records) == 6
+    process = [(info.done, info.total) for info in infos if info.stage == STAGE_PROCESS]
+    assert process[:4] == [(0, None), (1, None), (2, None), (3, None)]
+    assert (4, 6) in process
+    assert process[-1] == (6, 6)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+串流處理的暫存檔
+"""
+import os
+
+from src.database.record_spool import PathSpool
+from src.processor import PhotoProcessor
+
+
+def test_path_spool_behaves_like_list(tmp_path, monkeypatch):
+    monkeypatch.setattr(PathSpool, "FLUSH_SIZE", 3)
+    spool = PathSpool(str(tmp_path))
+    paths = [f"/photos/IMG_{i:04d}.JPG" for i in range(10)]
+    for path in paths:
+        spool.append(path)
+
+    assert len(spool) == 10
+    assert list(spool) == paths
+
+    # 未寫入的與已寫入的路徑都可捨棄
+    del spool[8:]
+    assert list(spool) == paths[:8]
+    del spool[2:]
+    spool.append(paths[9])
+    assert list(spool) == paths[:2] + paths[9:]
+    assert len(spool) == 3
+
+    path = spool.path
+    spool.close()
+    assert not os.path.exists(path)
+
+
+def test_stream_processed_files_match_full_processing(photo_tree, tmp_path):
+    root = photo_tree({"CAM1": 4, "CAM2": 3})
+
+    processor = PhotoProcessor(spool_dir=str(tmp_path / "spool"))
+    list(processor.iter_process(root))
+    streamed = processor.processed_files
+    assert isinstance(streamed, PathSpool)
+    full = PhotoProcessor()
+    full.process_directory(root)
+    assert list(streamed) == full.processed_files
+
+    # 下一次處理時刪除上一次的暫存檔
+    path = streamed.path
+    list(processor.iter_process(root))
+    assert not os.path.exists(path)